@@ -1,7 +1,27 @@
 from django.contrib import admin
-from .models import Dataset
+from .models import Dataset, AuthToken, IngestJob, AlertRule, UploadSession
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
     list_display = ('name', 'uploaded_at', 'file')
     search_fields = ('name',)
+
+@admin.register(AuthToken)
+class AuthTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created', 'expires_at')
+    search_fields = ('user__username',)
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'dataset', 'stage', 'percent', 'rows_parsed', 'updated_at')
+    list_filter = ('stage',)
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'equipment_type', 'enabled', 'updated_at')
+    list_filter = ('enabled',)
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'name', 'size', 'consumed', 'state', 'updated_at')
+    list_filter = ('state',)
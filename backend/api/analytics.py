@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from .models import Dataset
+from .storage import load_frame
+from .schema import decimal_values, metric_values
+
+# Aggregates are stored in a mergeable form (count/sum/min/max per metric) and
+# turned into the summary payload on read.
+METRICS = ['Flowrate', 'Pressure', 'Temperature']
+CRITICAL_PRESSURE = 1200
+CRITICAL_TEMPERATURE = 100
+
+# parquet reads and pandas aggregation release the GIL, so missing stats for a
+# batch of datasets are computed side by side
+STATS_WORKERS = 4
+
+
+def _native(value):
+    return value.item() if hasattr(value, 'item') else value
+
+
+def compute_stats(df):
+    stats = {
+        "count": len(df),
+        "metrics": {},
+        "type_counts": {},
+        "critical_alerts": 0,
+    }
+
+    for col in METRICS:
+        if col not in df.columns:
+            continue
+        values = pd.Series(metric_values(df[col])).dropna()
+        if values.empty:
+            stats["metrics"][col] = {"count": 0, "sum": 0.0, "min": None, "max": None}
+            continue
+        low, high = values.min(), values.max()
+        if df[col].dtype == np.float32:
+            # extremes are readings, so they are reported as written rather than widened
+            low, high = decimal_values(np.array([low, high], dtype='float32'))
+        stats["metrics"][col] = {
+            "count": int(values.count()),
+            "sum": float(values.sum()),
+            "min": _native(low),
+            "max": _native(high),
+        }
+
+    if 'Type' in df.columns:
+        stats["type_counts"] = {str(k): int(v) for k, v in df['Type'].value_counts().items()}
+
+    if 'Pressure' in df.columns and 'Temperature' in df.columns:
+        pressure = metric_values(df['Pressure'])
+        temperature = metric_values(df['Temperature'])
+        stats["critical_alerts"] = int(((pressure > CRITICAL_PRESSURE) | (temperature > CRITICAL_TEMPERATURE)).sum())
+
+    return stats
+
+
+def merge_stats(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+
+    metrics = {}
+    for col in set(a["metrics"]) | set(b["metrics"]):
+        left, right = a["metrics"].get(col), b["metrics"].get(col)
+        if left is None or right is None:
+            metrics[col] = left or right
+            continue
+        mins = [v for v in (left["min"], right["min"]) if v is not None]
+        maxs = [v for v in (left["max"], right["max"]) if v is not None]
+        metrics[col] = {
+            "count": left["count"] + right["count"],
+            "sum": left["sum"] + right["sum"],
+            "min": min(mins) if mins else None,
+            "max": max(maxs) if maxs else None,
+        }
+
+    type_counts = dict(a["type_counts"])
+    for k, v in b["type_counts"].items():
+        type_counts[k] = type_counts.get(k, 0) + v
+
+    return {
+        "count": a["count"] + b["count"],
+        "metrics": metrics,
+        "type_counts": type_counts,
+        "critical_alerts": a["critical_alerts"] + b["critical_alerts"],
+    }
+
+
+def metric_mean(stats, col, digits=2):
+    m = stats["metrics"].get(col)
+    if not m or not m["count"]:
+        return 0
+    return round(m["sum"] / m["count"], digits)
+
+
+def summarize(stats):
+    temperature = stats["metrics"].get('Temperature')
+    type_counts = sorted(stats["type_counts"].items(), key=lambda kv: kv[1], reverse=True)
+    return {
+        "total_count": stats["count"],
+        "avg_flowrate": metric_mean(stats, 'Flowrate'),
+        "avg_pressure": metric_mean(stats, 'Pressure'),
+        "max_temperature": temperature["max"] if temperature and temperature["max"] is not None else 0,
+        "critical_alerts": stats["critical_alerts"],
+        "equipment_count_by_type": dict(type_counts),
+        "metrics": {
+            col: {"min": m["min"], "max": m["max"], "mean": metric_mean(stats, col)}
+            for col, m in stats["metrics"].items()
+        },
+    }
+
+
+def ensure_stats(dataset):
+    if dataset.stats is None:
+        dataset.stats = compute_stats(load_frame(dataset))
+        dataset.save(update_fields=['stats'])
+    return dataset.stats
+
+
+def ensure_stats_many(datasets):
+    """Fills in missing stats for several datasets at once.
+
+    Returns {dataset id: error message} for the ones that could not be computed.
+    """
+    missing = [d for d in datasets if d.stats is None]
+    errors = {}
+    if not missing:
+        return errors
+
+    def compute(dataset):
+        try:
+            return compute_stats(load_frame(dataset)), None
+        except Exception as e:
+            return None, str(e)
+
+    with ThreadPoolExecutor(max_workers=min(STATS_WORKERS, len(missing))) as pool:
+        results = list(pool.map(compute, missing))
+
+    computed = []
+    for dataset, (stats, error) in zip(missing, results):
+        if error is not None:
+            errors[dataset.id] = error
+            continue
+        dataset.stats = stats
+        computed.append(dataset)
+    Dataset.objects.bulk_update(computed, ['stats'])
+    return errors
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import uuid
+import pyarrow.parquet as pq
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from .models import Dataset
+from .analytics import compute_stats, merge_stats
+from .ingest import ingest_segment, read_header, validate_header
+from .schema import mixed_float_columns, widen_schema, widen_table
+from .storage import SEGMENT_DIR, ensure_columnar, file_digest, load_frame
+
+# Rows appended to an existing dataset. Each append becomes its own Parquet segment and
+# is folded into the stored aggregates, so the cost is proportional to the rows added,
+# not to the dataset. Segments are compacted once there are more than MAX_SEGMENTS.
+MAX_SEGMENTS = 32
+
+
+def _segment_name(dataset):
+    return f"{SEGMENT_DIR}/{dataset.id}-{uuid.uuid4().hex}.parquet"
+
+
+def chain_hash(previous, digest):
+    # content identity of base + appends; keeps ETags and cache keys moving with the data
+    return hashlib.sha256(f"{previous}:{digest}".encode()).hexdigest()
+
+
+def _merge(names, merged):
+    # row group by row group, so memory is bounded by one group rather than the segments
+    segments = [pq.ParquetFile(default_storage.path(name)) for name in names]
+    # a segment stored as float64 for precision widens the whole merged file
+    mixed = mixed_float_columns([segment.schema_arrow for segment in segments])
+    schema = widen_schema(segments[0].schema_arrow, mixed)
+    tmp = default_storage.path(merged) + '.tmp'
+    try:
+        with pq.ParquetWriter(tmp, schema, compression='zstd') as writer:
+            for segment in segments:
+                for i in range(segment.num_row_groups):
+                    writer.write_table(widen_table(segment.read_row_group(i), mixed))
+        os.replace(tmp, default_storage.path(merged))
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def compact_segments(dataset):
+    """Merge the segments of dataset into one. The merge runs without the row lock, which
+    is taken only to swap the list; segments appended meanwhile stay after the merged one.
+    Returns False if another compaction swapped the list first."""
+    names = list(Dataset.objects.values_list('segments', flat=True).get(id=dataset.id) or [])
+    if len(names) < 2:
+        return False
+    merged = _segment_name(dataset)
+    _merge(names, merged)
+
+    with transaction.atomic():
+        locked = Dataset.objects.select_for_update().get(id=dataset.id)
+        current = list(locked.segments or [])
+        swapped = current[:len(names)] == names
+        if swapped:
+            locked.segments = [merged] + current[len(names):]
+            locked.save(update_fields=['segments'])
+    for name in names if swapped else [merged]:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+    return swapped
+
+
+def append_rows(dataset, uploaded_file):
+    """Append the CSV rows in uploaded_file to dataset; returns the number of rows added."""
+    validate_header(read_header(uploaded_file))
+    digest = file_digest(uploaded_file.chunks())
+    uploaded_file.seek(0)
+
+    schema = pq.read_schema(ensure_columnar(dataset))
+    name = _segment_name(dataset)
+    os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+    # rows that need more precision than the dataset's float32 columns are stored as float64
+    stats, types = ingest_segment(uploaded_file, default_storage.path(name), schema)
+
+    try:
+        with transaction.atomic():
+            # serialise concurrent appends to the same dataset
+            locked = Dataset.objects.select_for_update().get(id=dataset.id)
+            locked.segments = list(locked.segments or []) + [name]
+            locked.size = (locked.size or 0) + uploaded_file.size
+            locked.content_hash = chain_hash(locked.content_hash, digest)
+            if locked.stats is None:
+                # stored before stats were precomputed: merging into nothing would leave
+                # stats for the appended rows only, so the whole dataset is summarised once
+                locked.stats = compute_stats(load_frame(locked))
+            else:
+                locked.stats = merge_stats(locked.stats, stats)
+            if locked.column_types:
+                locked.column_types = {
+                    column: 'float64' if types.get(column) == 'float64' else kind for column, kind in locked.column_types.items()
+                }
+            locked.updated_at = timezone.now()
+            locked.save(update_fields=['segments', 'stats', 'size', 'content_hash', 'column_types', 'updated_at'])
+    except Exception:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        raise
+
+    if len(locked.segments) > MAX_SEGMENTS:
+        compact_segments(dataset)
+    dataset.refresh_from_db()
+    return stats["count"] if stats else 0
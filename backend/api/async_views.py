@@ -0,0 +1,192 @@
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .models import Dataset, IngestJob
+from .analytics import compute_stats, summarize
+from .storage import load_frame, read_rows
+from .renderers import ArrowStreamRenderer, MessagePackRenderer
+from .charts import DEFAULT_POINTS, MAX_POINTS, DEFAULT_BINS, UnknownMetric, build_series
+from .rows import STREAM_TYPES, parse_row_query, check_stream_query, stream_rows
+from .conditional import etag_for, revalidate_privately
+
+# Async counterparts of the dataset read endpoints, for ASGI deployments. The event
+# loop only awaits: ORM calls use the async query API and file reads / pandas work run
+# on a bounded pool, so slow clients hold a coroutine rather than a worker thread.
+executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ASYNC_VIEW_WORKERS', 4), thread_name_prefix='async-view')
+
+BINARY_RENDERERS = {r.media_type: r for r in (ArrowStreamRenderer(), MessagePackRenderer())}
+
+
+async def offload(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args, **kwargs))
+
+
+async def authenticate(request):
+    # the same authenticators as the DRF views; token checks may hit cache or DB and Basic
+    # auth runs the password hasher, so they go to the pool rather than the one thread
+    # every thread-sensitive sync_to_async call shares
+    drf_request = Request(request, authenticators=[cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = await offload(lambda: drf_request.user)
+    except exceptions.APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+async def offload_stream(chunks):
+    # pull each batch of a sync generator on the pool
+    it = iter(chunks)
+    while True:
+        chunk = await offload(next, it, None)
+        if chunk is None:
+            return
+        yield chunk.encode()
+
+
+async def gzip_stream(chunks):
+    # compressed here because the compression middleware cannot wrap async iterators
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class AsyncDatasetView(View):
+    http_method_names = ['get', 'head', 'options']
+
+    async def load(self, request, id):
+        """Returns (dataset, None) or (None, error response)."""
+        user = await authenticate(request)
+        if user is None:
+            return None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        try:
+            dataset = await Dataset.objects.aget(id=id, owner=user)
+        except Dataset.DoesNotExist:
+            return None, JsonResponse({"error": "Dataset not found"}, status=404)
+
+        if dataset.stats is None:
+            job = await dataset.ingest_jobs.filter(stage__in=IngestJob.ACTIVE_STAGES).afirst()
+            if job is not None:
+                return None, JsonResponse({"error": "Dataset is still being processed", "job_id": job.id, "stage": job.stage, "percent": job.percent}, status=409)
+
+        self.etag = etag_for(request, dataset)
+        self.etag = quote_etag(self.etag) if self.etag else None
+        self.last_modified = int((dataset.updated_at or dataset.uploaded_at).timestamp())
+        not_modified = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if not_modified is not None:
+            return None, self.finalize(not_modified)
+        return dataset, None
+
+    def finalize(self, response):
+        if self.etag:
+            response.headers.setdefault('ETag', self.etag)
+        response.headers.setdefault('Last-Modified', http_date(self.last_modified))
+        return revalidate_privately(response)
+
+    async def ensure_stats(self, dataset):
+        if dataset.stats is None:
+            dataset.stats = await offload(lambda: compute_stats(load_frame(dataset)))
+            await dataset.asave(update_fields=['stats'])
+        return dataset.stats
+
+
+class AsyncDatasetSummaryView(AsyncDatasetView):
+    async def get(self, request, id):
+        dataset, error = await self.load(request, id)
+        if error:
+            return error
+        try:
+            analytics = summarize(await self.ensure_stats(dataset))
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return self.finalize(JsonResponse({"dataset_id": dataset.id, "name": dataset.name, "analytics": analytics}))
+
+
+class AsyncDatasetRawDataView(AsyncDatasetView):
+    async def get(self, request, id):
+        dataset, error = await self.load(request, id)
+        if error:
+            return error
+        try:
+            offset, limit, columns, sort, descending = parse_row_query(request.GET, dataset.columns)
+
+            mode = request.GET.get('stream')
+            if mode:
+                check_stream_query(mode, offset, limit, sort)
+                body = offload_stream(stream_rows(dataset, columns, mode))
+                response = StreamingHttpResponse(body, content_type=STREAM_TYPES[mode])
+                accept_encoding = request.headers.get('Accept-Encoding', '')
+                if 'gzip' in accept_encoding:
+                    response.streaming_content = gzip_stream(body)
+                    response['Content-Encoding'] = 'gzip'
+                elif accept_encoding:
+                    # keeps the middleware from wrapping the async iterator in a sync compressor
+                    response['Content-Encoding'] = 'identity'
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return self.finalize(response)
+
+            table, total = await offload(read_rows, dataset, offset, limit, columns, sort, descending)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        end = offset + table.num_rows
+        next_offset = end if end < total else None
+
+        accept = request.headers.get('Accept', '')
+        renderer = next((r for media, r in BINARY_RENDERERS.items() if media in accept), None)
+        if renderer is not None:
+            response = HttpResponse(await offload(renderer.render, table), content_type=renderer.media_type)
+            response['X-Total-Count'] = str(total)
+            response['X-Next-Offset'] = "" if next_offset is None else str(next_offset)
+            return self.finalize(response)
+
+        data = await offload(table.to_pylist)
+        return self.finalize(JsonResponse({
+            "dataset_id": dataset.id,
+            "name": dataset.name,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset,
+            "columns": table.column_names,
+            "data": data,
+        }))
+
+
+class AsyncDatasetChartView(AsyncDatasetView):
+    async def get(self, request, id, metric):
+        dataset, error = await self.load(request, id)
+        if error:
+            return error
+        metric = metric.lower()
+        try:
+            if metric == 'type':
+                await self.ensure_stats(dataset)
+            kind, series = await offload(
+                build_series, dataset, metric,
+                kind=request.GET.get('kind'),
+                points=min(int(request.GET.get('points', DEFAULT_POINTS)), MAX_POINTS),
+                bins=int(request.GET.get('bins', DEFAULT_BINS)),
+            )
+        except UnknownMetric as e:
+            return JsonResponse({"error": str(e)}, status=404)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return self.finalize(JsonResponse({
+            "dataset_id": dataset.id,
+            "metric": metric,
+            "kind": kind,
+            "points": len(series["values"]),
+            **series
+        }))
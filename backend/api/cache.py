@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+
+class FrameCache:
+    """Process-wide LRU of parsed DataFrames, bounded by estimated bytes rather than entry count.
+
+    Cached frames are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_or_load(self, key, loader):
+        frame = self.peek(key)
+        if frame is not None:
+            return frame
+
+        with self._lock:
+            self.misses += 1
+        frame = loader()
+        nbytes = int(frame.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return frame
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (frame, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return frame
+
+    def invalidate(self, path):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+frame_cache = FrameCache(getattr(settings, 'DATASET_CACHE_BYTES', 256 * 1024 * 1024))
@@ -0,0 +1,138 @@
+import numpy as np
+from .storage import load_frame
+from .schema import decimal_values
+
+# Render-ready chart series. Every payload is bounded by a point budget so the
+# response size does not depend on the number of rows in the dataset.
+METRIC_COLUMNS = {
+    'flowrate': 'Flowrate',
+    'pressure': 'Pressure',
+    'temperature': 'Temperature',
+}
+KINDS = ('line', 'bar', 'histogram')
+TYPE_KINDS = ('pie', 'doughnut', 'bar')
+DEFAULT_POINTS = 200
+MAX_POINTS = 2000
+DEFAULT_BINS = 10
+OTHER_LABEL = 'Other'
+
+
+class UnknownMetric(LookupError):
+    pass
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices to keep."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    keep = np.zeros(threshold, dtype=np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    keep[-1] = n - 1
+    return keep
+
+
+def _load_metric(dataset, column):
+    df = load_frame(dataset, columns=['Equipment Name', column])
+    # float32 columns stay float32 here; only the points sent out are widened
+    values = df[column].to_numpy(dtype=np.float32 if df[column].dtype == np.float32 else 'float64', na_value=np.nan)
+    names = df['Equipment Name'].fillna('').astype(str).to_numpy()
+    mask = ~np.isnan(values)
+    return names[mask], values[mask], np.flatnonzero(mask)
+
+
+def line_series(dataset, column, points):
+    names, values, rows = _load_metric(dataset, column)
+    keep = lttb(rows.astype('float64'), values, points)
+    return {
+        "labels": names[keep].tolist(),
+        "values": decimal_values(values[keep]).tolist(),
+        "rows": rows[keep].tolist(),
+        "total": int(len(values)),
+    }
+
+
+def bar_series(dataset, column, points):
+    names, values, _ = _load_metric(dataset, column)
+    total = len(values)
+    top = max(points - 1, 1)
+    if total <= points:
+        order = np.arange(total)
+    else:
+        # top-N by value, the remainder folded into a single averaged bucket
+        order = np.argpartition(-values, top - 1)[:top]
+        order = order[np.argsort(-values[order], kind='stable')]
+
+    labels = names[order].tolist()
+    series = decimal_values(values[order]).tolist()
+    other = None
+    rest = total - len(order)
+    if rest:
+        other = {"count": int(rest), "mean": float((values.sum(dtype='float64') - values[order].sum(dtype='float64')) / rest)}
+        labels.append(OTHER_LABEL)
+        series.append(other["mean"])
+    return {"labels": labels, "values": series, "other": other, "total": int(total)}
+
+
+def histogram_series(dataset, column, bins):
+    _, values, _ = _load_metric(dataset, column)
+    if not len(values):
+        return {"labels": [], "values": [], "edges": [], "total": 0}
+    counts, edges = np.histogram(values, bins=bins)
+    labels = [f"{edges[i]:.1f} - {edges[i + 1]:.1f}" for i in range(len(counts))]
+    return {"labels": labels, "values": counts.tolist(), "edges": edges.tolist(), "total": int(len(values))}
+
+
+def type_series(stats, points):
+    # served from the stored per-Type counts, no file access
+    counts = sorted(stats["type_counts"].items(), key=lambda kv: kv[1], reverse=True)
+    top, rest = counts[:points - 1], counts[points - 1:]
+    if len(rest) <= 1:
+        top, rest = counts, []
+    labels = [k for k, _ in top]
+    values = [v for _, v in top]
+    other = None
+    if rest:
+        other = {"count": len(rest), "sum": sum(v for _, v in rest)}
+        labels.append(OTHER_LABEL)
+        values.append(other["sum"])
+    return {"labels": labels, "values": values, "other": other, "total": stats["count"]}
+
+
+def build_series(dataset, metric, kind=None, points=DEFAULT_POINTS, bins=DEFAULT_BINS):
+    """Returns (kind, series); 'type' is read from dataset.stats, which must be present."""
+    if points < 3:
+        raise ValueError("points must be at least 3")
+    if metric == 'type':
+        kind = kind or 'pie'
+        if kind not in TYPE_KINDS:
+            raise ValueError(f"kind must be one of: {', '.join(TYPE_KINDS)}")
+        return kind, type_series(dataset.stats, points)
+
+    column = METRIC_COLUMNS.get(metric)
+    if column is None:
+        raise UnknownMetric(f"Unknown metric: {metric}")
+    kind = kind or 'line'
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(KINDS)}")
+    if kind == 'line':
+        return kind, line_series(dataset, column, points)
+    if kind == 'bar':
+        return kind, bar_series(dataset, column, points)
+    return kind, histogram_series(dataset, column, max(min(bins, points), 1))
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from .analytics import METRICS
+from .storage import load_frame
+from .schema import metric_values
+
+# Row-level diff of two uploads of the same unit list. Rows are aligned on Equipment
+# Name with a hash join and every delta is computed column-wise.
+KEY = 'Equipment Name'
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 5000
+
+
+def _frame(dataset):
+    wanted = [KEY, 'Type'] + METRICS
+    df = load_frame(dataset, columns=[c for c in wanted if c in (dataset.columns or wanted)])
+    # a repeated name is treated as an update: the last row wins, as in a re-export
+    return df.drop_duplicates(KEY, keep='last')
+
+
+def _values(series):
+    return metric_values(series) if series is not None else None
+
+
+def _round(value):
+    return None if value is None or pd.isna(value) else round(float(value), 4)
+
+
+def _per_type(df, metrics):
+    groups = df.groupby('Type', dropna=False, observed=True)
+    out = groups[metrics].mean()
+    out['count'] = groups.size()
+    return out
+
+
+def type_shifts(left, right):
+    metrics = [m for m in METRICS if m in left and m in right]
+    if 'Type' not in left or 'Type' not in right:
+        return []
+    joined = _per_type(left, metrics).join(_per_type(right, metrics), how='outer', lsuffix='_a', rsuffix='_b')
+    shifts = []
+    for type_name, row in joined.iterrows():
+        count_a = 0 if pd.isna(row['count_a']) else int(row['count_a'])
+        count_b = 0 if pd.isna(row['count_b']) else int(row['count_b'])
+        mean = {}
+        for metric in metrics:
+            a, b = _round(row[f"{metric}_a"]), _round(row[f"{metric}_b"])
+            mean[metric] = {"a": a, "b": b, "delta": None if a is None or b is None else round(b - a, 4)}
+        shifts.append({
+            "type": None if pd.isna(type_name) else str(type_name),
+            "count_a": count_a,
+            "count_b": count_b,
+            "count_delta": count_b - count_a,
+            "mean": mean,
+        })
+    shifts.sort(key=lambda s: abs(s["count_delta"]), reverse=True)
+    return shifts
+
+
+def compare_datasets(dataset_a, dataset_b, limit=DEFAULT_LIMIT, sort=None):
+    """Deltas are b - a. Changed rows are ordered by their largest relative change
+    across metrics, or by the absolute change of one metric when sort is given."""
+    left, right = _frame(dataset_a), _frame(dataset_b)
+    merged = left.merge(right, on=KEY, how='outer', suffixes=('_a', '_b'), indicator=True)
+    side = merged['_merge']
+    both = merged[side == 'both']
+
+    metrics = [m for m in METRICS if m in left and m in right]
+    a = {m: _values(both[f"{m}_a"]) for m in metrics}
+    b = {m: _values(both[f"{m}_b"]) for m in metrics}
+    delta = {m: b[m] - a[m] for m in metrics}
+
+    if metrics:
+        # NaN-safe: a value appearing or disappearing counts as a change
+        changed = np.zeros(len(both), dtype=bool)
+        score = np.zeros(len(both))
+        for m in metrics:
+            moved = ((delta[m] != 0) & ~np.isnan(delta[m])) | (np.isnan(a[m]) != np.isnan(b[m]))
+            changed |= moved
+            if sort is None:
+                relative = np.abs(np.nan_to_num(delta[m])) / np.maximum(np.abs(np.nan_to_num(a[m])), 1e-9)
+                score = np.maximum(score, np.where(moved, relative, 0))
+        if sort is not None:
+            score = np.abs(np.nan_to_num(delta[sort]))
+        idx = np.flatnonzero(changed)
+        if len(idx) > limit:
+            idx = idx[np.argpartition(-score[idx], limit - 1)[:limit]]
+        idx = idx[np.argsort(-score[idx], kind='stable')]
+    else:
+        changed = np.zeros(len(both), dtype=bool)
+        idx = np.array([], dtype=np.int64)
+
+    names = both[KEY].to_numpy()
+    types = both['Type_b'].to_numpy() if 'Type_b' in both else None
+    deltas = []
+    for i in idx:
+        row = {KEY: str(names[i]), "Type": None if types is None or pd.isna(types[i]) else str(types[i])}
+        for m in metrics:
+            row[m] = {"a": _round(a[m][i]), "b": _round(b[m][i]), "delta": _round(delta[m][i])}
+        deltas.append(row)
+
+    added = merged.loc[side == 'right_only', KEY]
+    removed = merged.loc[side == 'left_only', KEY]
+    return {
+        "matched": int(len(both)),
+        "changed": int(changed.sum()),
+        "added": {"count": int(len(added)), "names": added.head(limit).astype(str).tolist()},
+        "removed": {"count": int(len(removed)), "names": removed.head(limit).astype(str).tolist()},
+        "deltas": deltas,
+        "type_shifts": type_shifts(left, right),
+    }
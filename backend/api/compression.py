@@ -0,0 +1,49 @@
+import gzip
+import io
+import zipfile
+from contextlib import contextmanager
+import zstandard
+
+# Compressed CSV uploads are stored as sent and inflated on the fly while parsing, so
+# the decompressed file never exists on disk or in memory.
+SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd', '.zip': 'zip'}
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def compression_of(name):
+    lower = name.lower()
+    return next((kind for suffix, kind in SUFFIXES.items() if lower.endswith(suffix)), None)
+
+
+def _zip_member(archive):
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+    ]
+    if len(members) != 1:
+        raise ArchiveError("A .zip upload must contain exactly one CSV file")
+    return members[0]
+
+
+@contextmanager
+def open_stream(f, name):
+    """The decompressed contents of binary file f, read as a stream."""
+    kind = compression_of(name)
+    if kind is None:
+        yield f
+    elif kind == 'gzip':
+        with gzip.GzipFile(fileobj=f, mode='rb') as stream:
+            yield stream
+    elif kind == 'zstd':
+        with io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, closefd=False)) as stream:
+            yield stream
+    else:
+        try:
+            archive = zipfile.ZipFile(f)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Not a readable .zip file: {e}")
+        with archive, archive.open(_zip_member(archive)) as stream:
+            yield stream
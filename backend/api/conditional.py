@@ -0,0 +1,103 @@
+import hashlib
+from functools import wraps
+from compression_middleware.middleware import compressor
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Dataset
+from .jobs import pending_job
+
+# Bump when the shape of dataset responses changes so clients drop stale copies
+API_VERSION = '1'
+
+
+def get_owned_dataset(request, id):
+    # memoised on the request so the conditional checks and the view share one query
+    cached = getattr(request, '_owned_dataset', None)
+    if cached is None or cached.id != id:
+        cached = Dataset.objects.get(id=id, owner=request.user)
+        request._owned_dataset = cached
+    return cached
+
+
+def content_coding(request):
+    # the coding the compression middleware will pick for this request
+    return compressor(request.META.get('HTTP_ACCEPT_ENCODING', ''))[0] or 'identity'
+
+
+def etag_for(request, dataset, version=API_VERSION):
+    if not dataset.content_hash:
+        return None
+    # one dataset serves many representations (pages, projections, formats, and the
+    # encoded bodies of each), so every ETag names exactly one byte sequence and can stay
+    # strong through compression
+    variant = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}|{content_coding(request)}"
+    return f"{dataset.content_hash}-{version}-{hashlib.sha1(variant.encode()).hexdigest()[:16]}"
+
+
+def dataset_last_modified(request, id, **kwargs):
+    try:
+        dataset = get_owned_dataset(request, id)
+        return dataset.updated_at or dataset.uploaded_at
+    except Dataset.DoesNotExist:
+        return None
+
+
+def revalidate_privately(response):
+    if response.has_header('ETag'):
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding', 'Authorization'))
+        # see api.middleware.CompressionMiddleware
+        response.encoded_etag = True
+    return response
+
+
+def _revalidate_privately(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            # condition() tags every response; a 202 or an error is not the representation
+            # the ETag names, and a client keeping it would be answered 304 later
+            for header in ('ETag', 'Last-Modified'):
+                if response.has_header(header):
+                    del response[header]
+        return revalidate_privately(response)
+    return wrapper
+
+
+def _reject_pending(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            job = pending_job(get_owned_dataset(request, kwargs['id']))
+        except Dataset.DoesNotExist:
+            job = None
+        if job is not None:
+            return Response({"error": "Dataset is still being processed", "job_id": job.id, "stage": job.stage, "percent": job.percent}, status=status.HTTP_409_CONFLICT)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def dataset_conditional(version=API_VERSION):
+    """Conditional-GET decorator for dataset views; pass a longer version for views
+    whose output also depends on a template."""
+    def etag(request, id, **kwargs):
+        try:
+            return etag_for(request, get_owned_dataset(request, id), version)
+        except Dataset.DoesNotExist:
+            return None
+
+    return method_decorator([
+        _revalidate_privately,
+        _reject_pending,
+        condition(etag_func=etag, last_modified_func=dataset_last_modified),
+    ])
+
+
+# The ETag follows content_hash and Last-Modified follows updated_at, and appends move
+# both, so a matching If-None-Match / If-Modified-Since is answered with 304 from the
+# DB row alone, before any file is opened
+conditional_dataset = dataset_conditional()
@@ -0,0 +1,93 @@
+import hashlib
+import zipfile
+import openpyxl
+import pandas as pd
+from openpyxl.utils.exceptions import InvalidFileException
+
+# Excel workbooks are read with openpyxl's read-only row iterator, so a sheet is streamed
+# row by row into the same chunked Parquet pipeline as a CSV and never held whole.
+EXCEL_SUFFIXES = ('.xlsx', '.xlsm')
+
+
+class SheetError(ValueError):
+    def __init__(self, message, sheets=()):
+        super().__init__(message)
+        self.sheets = list(sheets)
+
+
+def is_excel(name):
+    return name.lower().endswith(EXCEL_SUFFIXES)
+
+
+def sheet_hash(digest, sheet):
+    # one workbook uploaded for two different sheets is two datasets
+    return hashlib.sha256(f"{digest}:sheet:{sheet}".encode()).hexdigest()
+
+
+def _open(f):
+    try:
+        return openpyxl.load_workbook(f, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+        raise SheetError(f"Not a readable Excel workbook: {e}")
+
+
+def _header(ws):
+    row = next(ws.iter_rows(max_row=1, values_only=True), ())
+    header = ["" if v is None else str(v).strip() for v in row]
+    while header and not header[-1]:
+        header.pop()
+    return [name or f"Unnamed: {i}" for i, name in enumerate(header)]
+
+
+def pick_sheet(f, sheet=None, required=()):
+    """Returns (sheet title, header). Without a sheet, the first one whose header has
+    every required column is used."""
+    f.seek(0)
+    wb = _open(f)
+    try:
+        titles = wb.sheetnames
+        if sheet is not None:
+            if sheet not in titles:
+                raise SheetError(f"Unknown sheet: {sheet}", titles)
+            candidates = [sheet]
+        else:
+            candidates = titles
+        for title in candidates:
+            header = _header(wb[title])
+            if sheet is not None or all(col in header for col in required):
+                return title, header
+        raise SheetError("No sheet has the required columns; pick one with 'sheet'", titles)
+    finally:
+        wb.close()
+        f.seek(0)
+
+
+def iter_chunks(path, sheet, chunk_rows, progress=None):
+    """DataFrame chunks of a sheet. progress gets (rows so far, share of the sheet read)."""
+    wb = _open(path)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        header = _header(ws)
+        width = len(header)
+        # workbooks written without a dimension record give no row count up front
+        total = ws.max_row - 1 if ws.max_row else None
+        rows = []
+        done = 0
+        for row in ws.iter_rows(min_row=2, values_only=True):
+            row = row[:width]
+            if all(v is None for v in row):
+                continue
+            rows.append(row + (None,) * (width - len(row)))
+            if len(rows) >= chunk_rows:
+                done += len(rows)
+                yield pd.DataFrame(rows, columns=header)
+                rows = []
+                if progress:
+                    progress(done, min(done / total, 1.0) if total else done / (done + chunk_rows))
+        if rows or not done:
+            done += len(rows)
+            yield pd.DataFrame(rows, columns=header)
+            if progress:
+                progress(done, 1.0)
+    finally:
+        wb.close()
@@ -0,0 +1,204 @@
+import csv
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .analytics import compute_stats, merge_stats
+from .storage import columnar_path
+from .schema import arrow_schema, lossy_columns, resolve_types, types_of, widen_schema, widen_table
+from . import excel
+from .compression import open_stream
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# rows parsed per chunk; peak memory during ingest is bounded by this, not by file size
+CHUNK_ROWS = 100_000
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def read_header(f, name=''):
+    # name decides whether f is read through a decompressor
+    f.seek(0)
+    with open_stream(f, name) as stream:
+        line = stream.readline()
+    f.seek(0)
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig')
+    return next(csv.reader([line]), [])
+
+
+def validate_header(columns):
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise SchemaError(f"Invalid Schema. Missing required columns: {', '.join(missing)}")
+
+
+def numeric_columns(types=None):
+    # the metrics plus any extra column declared as a float type
+    return set(NUMERIC_COLUMNS) | {c for c, name in (types or {}).items() if name in ('float32', 'float64')}
+
+
+def text_dtypes(header, types=None):
+    """read_csv dtypes for a header: every column that is not numeric is read as text.
+    Left to inference, an optional column that is empty or numeric in the first chunk
+    would no longer fit the file's schema once text shows up in a later one."""
+    numeric = numeric_columns(types)
+    return {col: 'string' for col in header if col not in numeric}
+
+
+def peek_header(stream):
+    # the header line of a buffered stream, left unconsumed for the parser
+    line = stream.peek(64 * 1024).split(b'\n', 1)[0]
+    return next(csv.reader([line.decode('utf-8-sig', errors='replace').rstrip('\r')]), [])
+
+
+def read_csv_chunks(stream, chunk_rows=CHUNK_ROWS, types=None):
+    header = peek_header(stream) if hasattr(stream, 'peek') else read_header(stream)
+    return pd.read_csv(stream, chunksize=chunk_rows, dtype=text_dtypes(header, types))
+
+
+def normalize_chunk(chunk, numeric=NUMERIC_COLUMNS):
+    if not isinstance(chunk.index, pd.RangeIndex):
+        # pandas turns the leading fields into an index when the first row is longer
+        # than the header, shifting every value one column to the right
+        raise SchemaError("Rows have more fields than the header")
+    # every chunk must map to the same Arrow schema, so a column's dtype follows from
+    # its name, never from the values in one chunk
+    for col in chunk.columns:
+        if col in numeric:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+        else:
+            chunk[col] = chunk[col].astype('string')
+    return chunk
+
+
+def conform(table, schema):
+    # appended rows take the base dataset's schema: unknown columns are dropped and
+    # missing ones become nulls
+    arrays = []
+    for field in schema:
+        if field.name not in table.column_names:
+            arrays.append(pa.nulls(table.num_rows, field.type))
+            continue
+        try:
+            arrays.append(table.column(field.name).cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            name = types_of(pa.schema([field]))[field.name]
+            raise SchemaError(f"{field.name} values can't be stored as {name}")
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _chunks(chunks):
+    try:
+        yield from chunks
+    except pd.errors.ParserError as e:
+        raise SchemaError(f"Malformed CSV: {str(e).replace('Error tokenizing data. C error: ', '')}")
+
+
+def _rewrite(writer, tmp, schema, columns):
+    # a chunk needs float64 where earlier ones were written as float32: the rows so far
+    # are copied, a row group at a time, into a file with the wider schema
+    writer.close()
+    narrow = tmp + '.narrow'
+    os.replace(tmp, narrow)
+    wider = pq.ParquetWriter(tmp, schema, compression='zstd')
+    try:
+        for batch in pq.ParquetFile(narrow).iter_batches():
+            wider.write_table(conform(widen_table(pa.Table.from_batches([batch]), columns), schema))
+    except Exception:
+        wider.close()
+        raise
+    finally:
+        os.remove(narrow)
+    return wider
+
+
+def write_parquet(chunks, target, schema=None, types=None):
+    """Stream DataFrame chunks into a Parquet file at target.
+
+    Without a schema one is resolved from the first chunk, using the registry for the
+    equipment columns and types for any extra ones. A float32 column, resolved or given,
+    whose values in a later chunk don't survive narrowing is widened to float64, rows
+    already written included. Returns the merged stats and the column types of the file.
+    """
+    tmp = target + '.tmp'
+    writer = None
+    stats = None
+    numeric = numeric_columns(types if schema is None else types_of(schema))
+    try:
+        for chunk in _chunks(chunks):
+            chunk = normalize_chunk(chunk, numeric)
+            # stats come from the parsed float64 values, before any narrowing
+            stats = merge_stats(stats, compute_stats(chunk))
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if schema is None:
+                schema = arrow_schema(resolve_types(table, types))
+            lossy = lossy_columns(table, schema)
+            if lossy:
+                schema = widen_schema(schema, lossy)
+                if writer is not None:
+                    writer = _rewrite(writer, tmp, schema, lossy)
+            table = conform(table, schema)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, schema, compression='zstd')
+            writer.write_table(table)
+    except Exception:
+        if writer is not None:
+            writer.close()
+            writer = None
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        if schema is None:
+            raise ValueError("No rows to parse from file")
+        # nothing but a header: an empty segment keeps the bookkeeping uniform
+        pq.write_table(schema.empty_table(), tmp, compression='zstd')
+    os.replace(tmp, target)
+    return stats, types_of(schema)
+
+
+def write_chunks(chunks, path, types=None):
+    """Stream DataFrame chunks into the columnar copy of path."""
+    return write_parquet(chunks, columnar_path(path), types=types)
+
+
+def _track(chunks, f, progress):
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        yield chunk
+        # called once the chunk has been written: (rows so far, bytes of input consumed)
+        progress(rows, f.tell())
+
+
+def ingest_csv(path, chunk_rows=CHUNK_ROWS, progress=None, types=None):
+    # progress is measured on the stored (possibly compressed) bytes
+    with open(path, 'rb') as f, open_stream(f, path) as stream, read_csv_chunks(stream, chunk_rows, types) as reader:
+        return write_chunks(_track(reader, f, progress) if progress else reader, path, types)
+
+
+def ingest_excel(path, sheet=None, chunk_rows=CHUNK_ROWS, progress=None, types=None):
+    size = os.path.getsize(path)
+    # progress in the same (rows, bytes) terms as a CSV, estimated from rows read
+    track = (lambda rows, share: progress(rows, int(share * size))) if progress else None
+    return write_chunks(excel.iter_chunks(path, sheet, chunk_rows, track), path, types)
+
+
+def ingest_file(path, sheet=None, progress=None, types=None):
+    if excel.is_excel(path):
+        return ingest_excel(path, sheet, progress=progress, types=types)
+    return ingest_csv(path, progress=progress, types=types)
+
+
+def ingest_segment(f, target, schema, chunk_rows=CHUNK_ROWS):
+    with read_csv_chunks(f, chunk_rows, types_of(schema)) as reader:
+        return write_parquet(reader, target, schema)
@@ -0,0 +1,169 @@
+import logging
+import os
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .models import Dataset, IngestJob, UploadSession
+from .ingest import ingest_file
+from .uploads import ingest_upload
+from .retention import release_dataset, enforce_quota
+from .reports import report_path, write_report
+
+logger = logging.getLogger(__name__)
+
+# Uploads are parsed off the request path. With INGEST_IN_PROCESS the web process runs
+# jobs on a small thread pool; otherwise they stay queued for `manage.py ingest_worker`.
+IN_PROCESS = getattr(settings, 'INGEST_IN_PROCESS', True)
+executor = ThreadPoolExecutor(max_workers=getattr(settings, 'INGEST_WORKERS', 2), thread_name_prefix='ingest')
+# a chunked upload is parsed as its chunks arrive and waits for the next one, so its job
+# runs on threads of its own rather than holding an ingest thread for the whole transfer
+upload_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'UPLOAD_WORKERS', 4), thread_name_prefix='upload')
+# a job that has not reported progress for this long was lost with the process running it
+STALE_SECONDS = getattr(settings, 'INGEST_STALE_SECONDS', 1800)
+
+
+def is_upload_job(job_id):
+    return UploadSession.objects.filter(job_id=job_id).exists()
+
+
+def submit(job_id):
+    (upload_executor if is_upload_job(job_id) else executor).submit(run_job, job_id)
+
+
+def enqueue(job):
+    if IN_PROCESS:
+        def on_commit():
+            reclaim_stale_jobs()
+            submit(job.id)
+        transaction.on_commit(on_commit)
+
+
+def reclaim_stale_jobs(older_than=None, requeue=IN_PROCESS, now=None):
+    """Recover jobs stranded by a crash or restart. Queued jobs go back on the in-process
+    pool (requeue; a worker finds them by itself). Jobs stopped mid-parse are failed,
+    since the chunks of a resumable upload are gone once parsed; ones whose dataset was
+    already parsed are marked done. Returns (requeued, failed) job ids."""
+    older_than = STALE_SECONDS if older_than is None else older_than
+    cutoff = (now or timezone.now()) - timedelta(seconds=older_than)
+    stale = IngestJob.objects.filter(updated_at__lt=cutoff)
+
+    requeued = list(stale.filter(stage=IngestJob.QUEUED).values_list('id', flat=True))
+    if requeue and requeued:
+        # touched so they are not submitted again while they wait for a free thread
+        IngestJob.objects.filter(id__in=requeued).update(updated_at=timezone.now())
+        for job_id in requeued:
+            submit(job_id)
+
+    failed = []
+    for job in stale.filter(stage__in=(IngestJob.PARSING, IngestJob.FINALIZING)):
+        dataset = Dataset.objects.filter(id=job.dataset_id).first()
+        if job.kind == IngestJob.REPORT:
+            parsed = dataset is not None and os.path.exists(report_path(dataset.content_hash))
+            error = "Rendering was interrupted; request the report again"
+        else:
+            parsed = dataset is not None and dataset.stats is not None
+            error = "Processing was interrupted; upload the file again"
+        fields = {"stage": IngestJob.DONE, "percent": 100} if parsed else {"stage": IngestJob.FAILED, "error": error}
+        # conditional, so a job that reports progress in the meantime is left alone
+        if not IngestJob.objects.filter(id=job.id, stage=job.stage, updated_at=job.updated_at).update(updated_at=timezone.now(), **fields):
+            continue
+        if not parsed:
+            logger.warning("Job %s stalled in %s; marked failed", job.id, job.stage)
+            failed.append(job.id)
+            # a failed report leaves its dataset as it was
+            if dataset is not None and job.kind == IngestJob.INGEST:
+                release_dataset(dataset)
+    return requeued, failed
+
+
+def claim(job_id):
+    # the conditional update makes a job run once even if a thread and a worker both see it
+    return IngestJob.objects.filter(id=job_id, stage=IngestJob.QUEUED).update(stage=IngestJob.PARSING, updated_at=timezone.now()) == 1
+
+
+def _update(job_id, **fields):
+    IngestJob.objects.filter(id=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def _process(job):
+    dataset = job.dataset
+    if dataset is None:
+        raise RuntimeError("Dataset was removed before processing started")
+
+    if job.kind == IngestJob.REPORT:
+        write_report(dataset)
+        _update(job.id, stage=IngestJob.DONE, percent=100)
+        return
+
+    if dataset.stats is None:
+        total = dataset.size or os.path.getsize(dataset.file.path) or 1
+
+        def progress(rows, position):
+            _update(job.id, rows_parsed=rows, percent=min(99, position * 100 // total))
+
+        session = dataset.upload_sessions.first()
+        if session is not None:
+            # a chunked upload: parse chunks as they arrive rather than the stored file
+            stats, types = ingest_upload(session, progress=progress)
+        else:
+            stats, types = ingest_file(dataset.file.path, dataset.sheet or None, progress=progress, types=dataset.column_types)
+        if not Dataset.objects.filter(id=dataset.id).update(stats=stats, columns=list(types), column_types=types):
+            raise RuntimeError("Dataset was removed before processing finished")
+    else:
+        stats = dataset.stats
+
+    _update(job.id, stage=IngestJob.FINALIZING, rows_parsed=stats['count'], percent=99)
+    enforce_quota(job.owner)
+    _update(job.id, stage=IngestJob.DONE, percent=100)
+
+
+def run_job(job_id):
+    close_old_connections()
+    try:
+        if not claim(job_id):
+            return
+        job = IngestJob.objects.select_related('dataset', 'owner').get(id=job_id)
+        try:
+            _process(job)
+        except Exception as e:
+            logger.warning("Job %s failed: %s", job_id, e)
+            if job.kind == IngestJob.REPORT:
+                _update(job_id, stage=IngestJob.FAILED, error=f"Report failed: {e}")
+                return
+            _update(job_id, stage=IngestJob.FAILED, error=f"Invalid CSV: {e}")
+            dataset = Dataset.objects.filter(id=job.dataset_id).first()
+            if dataset is not None:
+                release_dataset(dataset)
+    finally:
+        connection.close()
+
+
+def pending_job(dataset):
+    if dataset.stats is not None:
+        return None
+    return dataset.ingest_jobs.filter(kind=IngestJob.INGEST, stage__in=IngestJob.ACTIVE_STAGES).first()
+
+
+def request_report(dataset):
+    """The report job still running for dataset, or a newly queued one."""
+    job = dataset.ingest_jobs.filter(kind=IngestJob.REPORT, stage__in=IngestJob.ACTIVE_STAGES).first()
+    if job is None:
+        job = IngestJob.objects.create(dataset=dataset, owner_id=dataset.owner_id, kind=IngestJob.REPORT)
+        enqueue(job)
+    return job
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "dataset_id": job.dataset_id,
+        "stage": job.stage,
+        "percent": job.percent,
+        "rows_parsed": job.rows_parsed,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
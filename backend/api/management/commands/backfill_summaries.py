@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from api.models import Dataset, IngestJob
+from api.analytics import compute_stats
+from api.storage import load_frame, file_digest, iter_file, ensure_columnar
+from api.schema import types_of
+import pyarrow.parquet as pq
+import os
+
+
+class Command(BaseCommand):
+    help = "Compute stored analytics and file metadata for datasets uploaded before they were precomputed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute every dataset, not only missing ones")
+
+    def handle(self, *args, **options):
+        # rows still being ingested are left to their job
+        datasets = Dataset.objects.exclude(ingest_jobs__stage__in=IngestJob.ACTIVE_STAGES)
+        if not options['all']:
+            datasets = datasets.filter(Q(stats__isnull=True) | Q(size__isnull=True) | Q(columns__isnull=True) | Q(column_types__isnull=True) | Q(content_hash=''))
+        done = failed = 0
+        for dataset in datasets.iterator():
+            try:
+                path = dataset.file.path
+                df = load_frame(dataset)
+                dataset.stats = compute_stats(df)
+                dataset.columns = list(df.columns)
+                dataset.column_types = types_of(pq.read_schema(ensure_columnar(dataset)))
+                if not dataset.segments:
+                    # appended datasets keep their running size and chained hash
+                    dataset.size = os.path.getsize(path)
+                    dataset.content_hash = file_digest(iter_file(path))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{dataset.id} ({dataset.name}): {e}")
+                continue
+            dataset.save(update_fields=['stats', 'columns', 'column_types', 'size', 'content_hash'])
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {done} dataset(s), {failed} failed"))
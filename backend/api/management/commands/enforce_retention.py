@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from api.retention import run_retention
+
+
+class Command(BaseCommand):
+    help = "Delete datasets outside the per-user retention limits and stored files no dataset refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List what would be removed without deleting it")
+
+    def handle(self, *args, **options):
+        expired, orphans = run_retention(dry_run=options['dry_run'])
+        verb = "would remove" if options['dry_run'] else "removed"
+        for dataset in expired:
+            self.stdout.write(f"dataset {dataset.id} ({dataset.owner_id}): {dataset.name}")
+        for path in orphans:
+            self.stdout.write(f"orphan: {path}")
+        self.stdout.write(f"{verb} {len(expired)} datasets and {len(orphans)} orphaned files")
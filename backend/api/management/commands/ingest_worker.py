@@ -0,0 +1,54 @@
+import time
+from django.core.management.base import BaseCommand
+from api.models import IngestJob
+from api.jobs import is_upload_job, reclaim_stale_jobs, run_job, upload_executor
+from api.retention import run_retention
+
+# how often stalled jobs are looked for
+RECLAIM_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = "Process queued upload ingest jobs (for deployments with INGEST_IN_PROCESS disabled)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls of an empty queue")
+        parser.add_argument('--retention-interval', type=float, default=3600, help="Seconds between retention sweeps; 0 disables them")
+
+    def handle(self, *args, **options):
+        last_sweep = last_reclaim = None
+        uploads = {}
+        while True:
+            if options['retention_interval'] and (last_sweep is None or time.monotonic() - last_sweep >= options['retention_interval']):
+                expired, orphans = run_retention()
+                last_sweep = time.monotonic()
+                if expired or orphans:
+                    self.stdout.write(f"retention: removed {len(expired)} datasets and {len(orphans)} orphaned files")
+            if last_reclaim is None or time.monotonic() - last_reclaim >= RECLAIM_SECONDS:
+                # jobs left mid-parse by a crashed worker or web process; queued ones are
+                # picked up by the poll below
+                _, failed = reclaim_stale_jobs(requeue=False)
+                last_reclaim = time.monotonic()
+                for job_id in failed:
+                    self.stdout.write(f"job {job_id}: stalled, marked failed")
+
+            for job_id in [job_id for job_id, future in uploads.items() if future.done()]:
+                del uploads[job_id]
+                self.stdout.write(f"job {job_id}: {IngestJob.objects.get(id=job_id).stage}")
+
+            queued = IngestJob.objects.filter(stage=IngestJob.QUEUED).exclude(id__in=list(uploads)).order_by('created_at')
+            ran = False
+            for job_id in queued.values_list('id', flat=True)[:50]:
+                if is_upload_job(job_id):
+                    # chunked uploads wait for their chunks on threads of their own, so a
+                    # slow transfer does not hold up the rest of the queue
+                    uploads[job_id] = upload_executor.submit(run_job, job_id)
+                    continue
+                run_job(job_id)
+                ran = True
+                self.stdout.write(f"job {job_id}: {IngestJob.objects.get(id=job_id).stage}")
+            if not ran:
+                if options['once'] and not uploads:
+                    break
+                time.sleep(options['interval'])
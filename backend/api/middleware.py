@@ -0,0 +1,14 @@
+from compression_middleware.middleware import CompressionMiddleware as BaseCompressionMiddleware
+
+# The stock middleware weakens every ETag it compresses under (W/"..."), since one tag
+# would otherwise name both the identity and the encoded bytes. Dataset views already
+# put the negotiated coding into their ETags (api/conditional.py), so theirs stay strong.
+
+
+class CompressionMiddleware(BaseCompressionMiddleware):
+    def process_response(self, request, response):
+        etag = response.get('ETag') if getattr(response, 'encoded_etag', False) else None
+        response = super().process_response(request, response)
+        if etag:
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_dataset_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='stats',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
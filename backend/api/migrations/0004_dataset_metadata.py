@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_dataset_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='columns',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
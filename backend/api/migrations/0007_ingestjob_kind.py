@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='kind',
+            field=models.CharField(choices=[('ingest', 'ingest'), ('report', 'report')], default='ingest', max_length=16),
+        ),
+    ]
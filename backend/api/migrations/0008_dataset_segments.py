@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_ingestjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='segments',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_alertrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='column_types',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
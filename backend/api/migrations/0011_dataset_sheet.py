@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_dataset_column_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='sheet',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
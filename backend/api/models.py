@@ -6,6 +6,92 @@ class Dataset(models.Model):
     file = models.FileField(upload_to='datasets/')
     uploaded_at = models.DateTimeField(default=timezone.now)
     owner = models.ForeignKey('auth.User', on_delete=models.CASCADE, null=True, blank=True)
+    stats = models.JSONField(null=True, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    columns = models.JSONField(null=True, blank=True)
+    column_types = models.JSONField(null=True, blank=True)
+    # worksheet an Excel upload was read from
+    sheet = models.CharField(max_length=100, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    segments = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.name
+
+class AuthToken(models.Model):
+    # SHA-256 of the token key; the key itself is only ever held by the client
+    digest = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='auth_tokens')
+    created = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user} ({self.digest[:8]})"
+
+class IngestJob(models.Model):
+    QUEUED = 'queued'
+    PARSING = 'parsing'
+    FINALIZING = 'finalizing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STAGES = [(s, s) for s in (QUEUED, PARSING, FINALIZING, DONE, FAILED)]
+    ACTIVE_STAGES = (QUEUED, PARSING, FINALIZING)
+    # the same queue renders PDF reports, off the request path
+    INGEST = 'ingest'
+    REPORT = 'report'
+    KINDS = [(k, k) for k in (INGEST, REPORT)]
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='ingest_jobs')
+    owner = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16, choices=KINDS, default=INGEST)
+    stage = models.CharField(max_length=16, choices=STAGES, default=QUEUED, db_index=True)
+    percent = models.PositiveSmallIntegerField(default=0)
+    rows_parsed = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.stage})"
+
+class AlertRule(models.Model):
+    owner = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='alert_rules')
+    name = models.CharField(max_length=100)
+    condition = models.JSONField()
+    equipment_type = models.CharField(max_length=100, blank=True)
+    overrides = models.JSONField(default=dict, blank=True)
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+class UploadSession(models.Model):
+    OPEN = 'open'
+    FINALIZED = 'finalized'
+    ABORTED = 'aborted'
+    STATES = [(s, s) for s in (OPEN, FINALIZED, ABORTED)]
+
+    owner = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='upload_sessions')
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_sessions')
+    job = models.ForeignKey(IngestJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # leading chunks already handed to the parser (their part files are gone)
+    consumed = models.PositiveIntegerField(default=0)
+    state = models.CharField(max_length=16, choices=STATES, default=OPEN)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total_chunks(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.name})"
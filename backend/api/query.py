@@ -0,0 +1,224 @@
+import json
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+from .analytics import METRICS
+from .rules import MaskEvaluator, compile_condition, referenced_columns
+from .schema import decimal_values, widen_table
+from .storage import frame_key, load_frame
+
+# Small JSON query language over one dataset, run against the cached frame:
+#
+#   {"where": <condition, as in rules.py>,
+#    "select": ["Equipment Name", "Pressure"],
+#    "group_by": "Type", "aggregates": {"Pressure": ["mean", "max"]},
+#    "sort": ["-Pressure", "Equipment Name"],
+#    "offset": 0, "limit": 100}
+#
+# Parsed plans are memoised by their canonical JSON; results are kept per
+# (dataset contents, plan), so appends and re-uploads never see stale answers.
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max', 'median', 'std')
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 5000
+
+Plan = namedtuple('Plan', 'where select group_by aggregates sort offset limit')
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _names(value, field):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) and v for v in value):
+        raise QueryError(f"{field} must be a column name or a list of them")
+    return tuple(value)
+
+
+def _compile(query):
+    if not isinstance(query, dict):
+        raise QueryError("Query must be an object")
+    unknown = set(query) - {'where', 'select', 'group_by', 'aggregates', 'sort', 'offset', 'limit'}
+    if unknown:
+        raise QueryError(f"Unknown query fields: {', '.join(sorted(unknown))}")
+
+    where = compile_condition(query['where']) if query.get('where') is not None else None
+    select = _names(query['select'], 'select') if query.get('select') else None
+    group_by = query.get('group_by') or None
+    if group_by is not None and not isinstance(group_by, str):
+        raise QueryError("group_by must be a column name")
+    if select and group_by:
+        raise QueryError("select does not apply to grouped queries; use aggregates")
+
+    aggregates = query.get('aggregates') or {}
+    if not isinstance(aggregates, dict) or (aggregates and not group_by):
+        raise QueryError("aggregates must map columns to functions and need a group_by")
+    compiled = []
+    for column, fns in sorted(aggregates.items()):
+        fns = _names(fns, 'aggregates')
+        bad = [fn for fn in fns if fn not in AGGREGATES]
+        if bad:
+            raise QueryError(f"Unknown aggregates: {', '.join(bad)}; use {', '.join(AGGREGATES)}")
+        compiled.append((column, fns))
+
+    sort = tuple((key.lstrip('-'), key.startswith('-')) for key in _names(query['sort'], 'sort')) if query.get('sort') else ()
+    try:
+        offset = int(query.get('offset', 0))
+        limit = min(int(query.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except (TypeError, ValueError):
+        raise QueryError("offset and limit must be integers")
+    if offset < 0 or limit < 0:
+        raise QueryError("offset and limit must be non-negative")
+    return Plan(where, select, group_by, tuple(compiled), sort, offset, limit)
+
+
+@lru_cache(maxsize=512)
+def _compile_text(text):
+    return _compile(json.loads(text))
+
+
+def compile_query(query):
+    try:
+        text = json.dumps(query, sort_keys=True)
+    except (TypeError, ValueError):
+        raise QueryError("Query must be plain JSON")
+    return _compile_text(text)
+
+
+def result_bytes(result):
+    """Rough in-memory size of a query answer: its row dicts and the values in them."""
+    rows = result["data"]
+    return sys.getsizeof(rows) + sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values()) for row in rows
+    )
+
+
+class ResultCache:
+    """LRU of query answers keyed by (dataset contents, plan), bounded by estimated bytes
+    rather than entry count, since one answer can hold up to MAX_LIMIT rows."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, result):
+        nbytes = result_bytes(result)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+result_cache = ResultCache(getattr(settings, 'QUERY_CACHE_BYTES', 64 * 1024 * 1024))
+
+
+def _check_columns(plan, known):
+    wanted = set(plan.select or ()) | {c for c, _ in plan.aggregates}
+    if plan.group_by:
+        # grouped results are sorted on their output columns, checked after grouping
+        wanted.add(plan.group_by)
+    else:
+        wanted |= {c for c, _ in plan.sort}
+    if plan.where is not None:
+        referenced_columns(plan.where, wanted)
+    unknown = sorted(wanted - set(known))
+    if unknown:
+        raise QueryError(f"Unknown columns: {', '.join(unknown)}")
+
+
+def _grouped(frame, plan):
+    aggregates = plan.aggregates or tuple((m, ('mean',)) for m in METRICS if m in frame)
+    # aggregates are part of the answer, so they are taken over the readings as written
+    frame = frame.assign(**{
+        column: decimal_values(frame[column].to_numpy()) for column, _ in aggregates if frame[column].dtype == np.float32
+    })
+    groups = frame.groupby(plan.group_by, observed=True, dropna=False)
+    out = groups.agg(**{f"{column}_{fn}": (column, fn) for column, fns in aggregates for fn in fns}) if aggregates else None
+    counts = groups.size().rename('count')
+    out = counts.to_frame() if out is None else out.join(counts)
+    out = out.reset_index()
+    return out[[plan.group_by, 'count'] + [c for c in out.columns if c not in (plan.group_by, 'count')]]
+
+
+def execute(frame, plan):
+    if plan.where is not None:
+        frame = frame[MaskEvaluator(frame).evaluate(plan.where)]
+    if plan.group_by:
+        frame = _grouped(frame, plan)
+        known = frame.columns
+        unknown = [c for c, _ in plan.sort if c not in known]
+        if unknown:
+            raise QueryError(f"Grouped results can only sort on: {', '.join(known)}")
+    if plan.sort:
+        frame = frame.sort_values(
+            [c for c, _ in plan.sort], ascending=[not desc for _, desc in plan.sort],
+            na_position='last', kind='stable',
+        )
+    total = len(frame)
+    page = frame.iloc[plan.offset:plan.offset + plan.limit]
+    if plan.select:
+        page = page[list(plan.select)]
+    table = widen_table(pa.Table.from_pandas(page, preserve_index=False))
+    end = plan.offset + table.num_rows
+    return {
+        "total": total,
+        "offset": plan.offset,
+        "limit": plan.limit,
+        "next_offset": end if end < total else None,
+        "columns": table.column_names,
+        "data": table.to_pylist(),
+    }
+
+
+def run_query(dataset, query):
+    """Returns (result, cached)."""
+    plan = compile_query(query)
+    if dataset.columns:
+        _check_columns(plan, dataset.columns)
+    key = (frame_key(dataset), plan)
+    result = result_cache.get(key)
+    if result is not None:
+        return result, True
+    frame = load_frame(dataset)
+    # datasets stored before column lists were recorded are checked against the file itself
+    _check_columns(plan, frame.columns)
+    try:
+        result = execute(frame, plan)
+    except QueryError:
+        raise
+    except (KeyError, IndexError, TypeError, ValueError, NotImplementedError, pd.errors.DataError, pa.ArrowException) as e:
+        # e.g. a mean over a text column, or a comparison pandas cannot make
+        raise QueryError(str(e))
+    result_cache.put(key, result)
+    return result, False
@@ -0,0 +1,43 @@
+import json
+import msgpack
+import pyarrow as pa
+from rest_framework.renderers import BaseRenderer
+
+# Binary renderers for row data. Views hand them a pyarrow Table; anything else
+# (error payloads) falls back to plain JSON.
+
+
+def _json_fallback(data, renderer_context):
+    response = (renderer_context or {}).get('response')
+    if response is not None:
+        response['Content-Type'] = 'application/json'
+    return json.dumps(data, default=str).encode()
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, pa.Table):
+            return _json_fallback(data, renderer_context)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, data.schema) as writer:
+            writer.write_table(data)
+        return sink.getvalue().to_pybytes()
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, pa.Table):
+            return _json_fallback(data, renderer_context)
+        # column-major: one array per column instead of one map per row
+        data = {"columns": data.column_names, "data": data.to_pydict()}
+        return msgpack.packb(data, default=str, use_bin_type=True)
@@ -0,0 +1,238 @@
+import os
+import tempfile
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from reportlab.graphics import renderPDF
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from .analytics import CRITICAL_PRESSURE, CRITICAL_TEMPERATURE, summarize
+from .charts import METRIC_COLUMNS, line_series, type_series
+from .storage import iter_batches
+
+# Server-rendered dataset report. The output depends only on the file contents, so the
+# finished PDF is kept per (content hash, TEMPLATE_VERSION); bump the version whenever
+# the layout below changes.
+TEMPLATE_VERSION = '1'
+REPORT_DIR = 'reports'
+# the canvas holds every page until save(), so the equipment table is capped: about 100
+# pages at most, whatever the size of the dataset. The full rows are in the exports.
+MAX_TABLE_ROWS = getattr(settings, 'REPORT_MAX_TABLE_ROWS', 5000)
+
+TABLE_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+COLUMN_X = [50, 200, 310, 400, 490]
+ROW_HEIGHT = 14
+MARGIN = 50
+PALETTE = [colors.HexColor(c) for c in ('#2563eb', '#16a34a', '#f59e0b', '#dc2626', '#7c3aed', '#0891b2', '#db2777', '#65a30d')]
+CHART_POINTS = 200
+
+WIDTH, HEIGHT = letter
+
+
+def report_path(content_hash):
+    return default_storage.path(os.path.join(REPORT_DIR, f"{content_hash}-v{TEMPLATE_VERSION}.pdf"))
+
+
+def remove_cached_reports(content_hash):
+    directory = default_storage.path(REPORT_DIR)
+    if not content_hash or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(f"{content_hash}-v"):
+            os.remove(os.path.join(directory, name))
+
+
+def open_report(dataset):
+    """The finished PDF for dataset, opened for reading, or None until a report job has
+    rendered it."""
+    # opened rather than checked first: retention may delete the file at any moment, and
+    # an open handle keeps the contents readable after that
+    try:
+        return open(report_path(dataset.content_hash), 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def write_report(dataset):
+    """Render the report for dataset into the per-content cache; run by a report job."""
+    path = report_path(dataset.content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # concurrent jobs each render to their own temp file; the last rename wins
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            render_report(dataset, f)
+        os.replace(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+
+
+def _footer(c, page):
+    c.setFont("Helvetica", 8)
+    c.setFillColor(colors.grey)
+    c.drawString(MARGIN, 30, "Chemical Equipment Visualizer Report")
+    c.drawRightString(WIDTH - MARGIN, 30, f"Page {page}")
+    c.setFillColor(colors.black)
+
+
+def _kpis(c, stats, y):
+    analytics = summarize(stats)
+    metrics = stats["metrics"]
+    avg_temperature = metrics.get('Temperature', {})
+    kpis = [
+        ("Total Equipment", f"{analytics['total_count']:,}"),
+        ("Avg Flowrate", f"{analytics['avg_flowrate']} m³/h"),
+        ("Avg Pressure", f"{analytics['avg_pressure']} PSI"),
+        ("Avg Temperature", f"{round(avg_temperature['sum'] / avg_temperature['count'], 2) if avg_temperature.get('count') else 0} °C"),
+        ("Max Temperature", f"{analytics['max_temperature']} °C"),
+        ("Critical Alerts", f"{analytics['critical_alerts']:,}"),
+    ]
+    box_w = (WIDTH - 2 * MARGIN - 20) / 3
+    for i, (label, value) in enumerate(kpis):
+        x = MARGIN + (i % 3) * (box_w + 10)
+        top = y - (i // 3) * 60
+        c.setStrokeColor(colors.lightgrey)
+        c.roundRect(x, top - 50, box_w, 50, 6)
+        c.setFont("Helvetica", 9)
+        c.setFillColor(colors.grey)
+        c.drawString(x + 10, top - 18, label)
+        c.setFont("Helvetica-Bold", 14)
+        c.setFillColor(colors.red if label == "Critical Alerts" and analytics['critical_alerts'] else colors.black)
+        c.drawString(x + 10, top - 38, value)
+    c.setFillColor(colors.black)
+    return y - 130
+
+
+def _type_pie(stats):
+    series = type_series(stats, len(PALETTE))
+    drawing = Drawing(WIDTH - 2 * MARGIN, 200)
+    if not series["values"]:
+        return drawing
+    pie = Pie()
+    pie.x, pie.y, pie.width, pie.height = 20, 10, 180, 180
+    pie.data = series["values"]
+    pie.slices.strokeColor = colors.white
+    for i in range(len(pie.data)):
+        pie.slices[i].fillColor = PALETTE[i % len(PALETTE)]
+    drawing.add(pie)
+    total = sum(series["values"]) or 1
+    for i, (label, value) in enumerate(zip(series["labels"], series["values"])):
+        y = 180 - i * 18
+        drawing.add(String(230, y, f"{label}: {value:,} ({value * 100 / total:.1f}%)", fontName="Helvetica", fontSize=10, fillColor=PALETTE[i % len(PALETTE)]))
+    return drawing
+
+
+def _metric_chart(dataset, column):
+    series = line_series(dataset, column, CHART_POINTS)
+    drawing = Drawing(WIDTH - 2 * MARGIN, 170)
+    drawing.add(String(0, 155, column, fontName="Helvetica-Bold", fontSize=11))
+    if len(series["values"]) < 2:
+        return drawing
+    plot = LinePlot()
+    plot.x, plot.y, plot.width, plot.height = 40, 15, WIDTH - 2 * MARGIN - 50, 125
+    plot.data = [list(zip(series["rows"], series["values"]))]
+    plot.lines[0].strokeColor = PALETTE[0]
+    plot.lines[0].strokeWidth = 1
+    plot.xValueAxis.labels.fontSize = 7
+    plot.yValueAxis.labels.fontSize = 7
+    drawing.add(plot)
+    return drawing
+
+
+def _table_header(c, y):
+    c.setFillColor(colors.HexColor('#374151'))
+    c.rect(MARGIN - 5, y - 4, WIDTH - 2 * MARGIN + 10, ROW_HEIGHT + 2, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 9)
+    for x, name in zip(COLUMN_X, TABLE_COLUMNS):
+        c.drawString(x, y, name)
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica", 8)
+    return y - ROW_HEIGHT - 4
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "-"
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)[:28]
+
+
+def render_report(dataset, out):
+    stats = dataset.stats
+    c = canvas.Canvas(out, pagesize=letter, pageCompression=1)
+    c.setTitle("Equipment Analysis Report")
+    page = 1
+
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(MARGIN, HEIGHT - 60, "Equipment Analysis Report")
+    c.setFont("Helvetica", 9)
+    c.setFillColor(colors.grey)
+    c.drawString(MARGIN, HEIGHT - 76, f"Dataset fingerprint {dataset.content_hash[:12]} · {stats['count']:,} records")
+    c.setFillColor(colors.black)
+
+    y = _kpis(c, stats, HEIGHT - 100)
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(MARGIN, y, "Equipment Type Distribution")
+    renderPDF.draw(_type_pie(stats), c, MARGIN, y - 215)
+    _footer(c, page)
+    c.showPage()
+
+    # metric trends from downsampled series, never the full column
+    page += 1
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(MARGIN, HEIGHT - 60, "Parameter Trends")
+    y = HEIGHT - 80
+    for column in METRIC_COLUMNS.values():
+        y -= 180
+        renderPDF.draw(_metric_chart(dataset, column), c, MARGIN, y)
+    _footer(c, page)
+    c.showPage()
+
+    # equipment table, one Parquet batch at a time, up to MAX_TABLE_ROWS
+    page += 1
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(MARGIN, HEIGHT - 60, "Equipment Details")
+    y = _table_header(c, HEIGHT - 85)
+    columns = [col for col in TABLE_COLUMNS if col in (dataset.columns or TABLE_COLUMNS)]
+    shown = 0
+    for batch in iter_batches(dataset, columns):
+        if shown >= MAX_TABLE_ROWS:
+            break
+        batch = batch.slice(0, MAX_TABLE_ROWS - shown)
+        data = batch.to_pydict()
+        critical = np.zeros(batch.num_rows, dtype=bool)
+        if 'Pressure' in data:
+            critical |= np.array(data['Pressure'], dtype='float64') > CRITICAL_PRESSURE
+        if 'Temperature' in data:
+            critical |= np.array(data['Temperature'], dtype='float64') > CRITICAL_TEMPERATURE
+        for i in range(batch.num_rows):
+            if y < MARGIN + 10:
+                _footer(c, page)
+                c.showPage()
+                page += 1
+                y = _table_header(c, HEIGHT - 60)
+            c.setFillColor(colors.red if critical[i] else colors.black)
+            for x, col in zip(COLUMN_X, TABLE_COLUMNS):
+                c.drawString(x, y, _cell(data[col][i]) if col in data else "-")
+            y -= ROW_HEIGHT
+        shown += batch.num_rows
+    if stats['count'] > shown:
+        if y < MARGIN + 10:
+            _footer(c, page)
+            c.showPage()
+            page += 1
+            y = HEIGHT - 60
+        c.setFillColor(colors.grey)
+        c.setFont("Helvetica-Oblique", 8)
+        c.drawString(MARGIN, y - 4, f"First {shown:,} of {stats['count']:,} records; export the dataset for the full table.")
+    c.setFillColor(colors.black)
+    _footer(c, page)
+    c.showPage()
+    c.save()
@@ -0,0 +1,169 @@
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+from .models import Dataset, IngestJob, UploadSession
+from .storage import COLUMNAR_SUFFIX, SEGMENT_DIR, remove_dataset_files, remove_segments
+from .reports import REPORT_DIR, remove_cached_reports
+
+# Per-user history limits. A limit of 0 disables it; the newest dataset is always kept.
+MAX_DATASETS_PER_USER = getattr(settings, 'RETENTION_MAX_DATASETS', 5)
+MAX_BYTES_PER_USER = getattr(settings, 'RETENTION_MAX_BYTES', 0)
+MAX_AGE_DAYS = getattr(settings, 'RETENTION_MAX_AGE_DAYS', 0)
+# files younger than this are never treated as orphans: an upload may still be saving
+ORPHAN_GRACE_SECONDS = 3600
+# chunked uploads that never sent a chunk are dropped after this long
+UPLOAD_IDLE_TIMEOUT = getattr(settings, 'UPLOAD_IDLE_TIMEOUT', 600)
+DATASET_DIR = 'datasets'
+UPLOAD_DIR = 'uploads'
+
+
+def release_datasets(datasets):
+    """Delete datasets in one query, then the files no remaining row refers to."""
+    datasets = list(datasets)
+    if not datasets:
+        return 0
+    Dataset.objects.filter(id__in=[d.id for d in datasets]).delete()
+
+    # stored blobs are shared between datasets with the same content hash, so the
+    # files only go once the last row pointing at them is deleted
+    names = {d.file.name for d in datasets}
+    hashes = {d.content_hash for d in datasets if d.content_hash}
+    still_used = set(Dataset.objects.filter(file__in=names).values_list('file', flat=True))
+    hashes_used = set(Dataset.objects.filter(content_hash__in=hashes).values_list('content_hash', flat=True))
+    removed = set()
+    for dataset in datasets:
+        remove_segments(dataset)
+        if dataset.file.name not in still_used and dataset.file.name not in removed:
+            remove_dataset_files(dataset)
+            removed.add(dataset.file.name)
+    for content_hash in hashes - hashes_used:
+        remove_cached_reports(content_hash)
+    return len(datasets)
+
+
+def release_dataset(dataset):
+    release_datasets([dataset])
+
+
+def expired_datasets(user, max_count=None, max_bytes=None, max_age_days=None, now=None):
+    """Datasets of user outside the count, byte or age limits."""
+    max_count = MAX_DATASETS_PER_USER if max_count is None else max_count
+    max_bytes = MAX_BYTES_PER_USER if max_bytes is None else max_bytes
+    max_age_days = MAX_AGE_DAYS if max_age_days is None else max_age_days
+    cutoff = (now or timezone.now()) - timedelta(days=max_age_days) if max_age_days else None
+
+    # datasets still being ingested count towards the quota but are never deleted
+    busy = set(IngestJob.objects.filter(owner=user, stage__in=IngestJob.ACTIVE_STAGES).values_list('dataset_id', flat=True))
+    busy |= set(UploadSession.objects.filter(owner=user, state=UploadSession.OPEN).values_list('dataset_id', flat=True))
+    expired = []
+    kept = []
+    for dataset in Dataset.objects.filter(owner=user).order_by('-uploaded_at', '-id'):
+        over = kept and (
+            (max_count and len(kept) >= max_count)
+            or (cutoff and dataset.uploaded_at < cutoff)
+        )
+        if over and dataset.id not in busy:
+            expired.append(dataset)
+        else:
+            kept.append(dataset)
+
+    if max_bytes:
+        # oldest first until the rest fits, so a large new upload pushes old ones out
+        # rather than being dropped itself while older small ones stay
+        used = sum(d.size or 0 for d in kept)
+        for dataset in reversed(kept[1:]):
+            if used <= max_bytes:
+                break
+            if dataset.id not in busy:
+                expired.append(dataset)
+                used -= dataset.size or 0
+    return expired
+
+
+def enforce_quota(user, **limits):
+    return release_datasets(expired_datasets(user, **limits))
+
+
+def owners_over_quota(now=None):
+    """Owner ids that may hold expired datasets, found with one aggregate query."""
+    cutoff = (now or timezone.now()) - timedelta(days=MAX_AGE_DAYS) if MAX_AGE_DAYS else None
+    rows = Dataset.objects.exclude(owner__isnull=True).values('owner').annotate(count=Count('id'), bytes=Sum('size'), oldest=Min('uploaded_at'))
+    return [
+        row['owner'] for row in rows
+        if (MAX_DATASETS_PER_USER and row['count'] > MAX_DATASETS_PER_USER)
+        or (MAX_BYTES_PER_USER and (row['bytes'] or 0) > MAX_BYTES_PER_USER)
+        or (cutoff and row['oldest'] < cutoff)
+    ]
+
+
+def stale_uploads(now=None):
+    """Open upload sessions with no chunk received for UPLOAD_IDLE_TIMEOUT. Sessions
+    that have started parsing time out in their ingest job instead."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=UPLOAD_IDLE_TIMEOUT)
+    return list(UploadSession.objects.filter(state=UploadSession.OPEN, job__isnull=True, updated_at__lt=cutoff).select_related('dataset'))
+
+
+def _stale(path, now):
+    return now - os.path.getmtime(path) > ORPHAN_GRACE_SECONDS
+
+
+def _listdir(name):
+    directory = default_storage.path(name)
+    if not os.path.isdir(directory):
+        return directory, []
+    return directory, [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+
+
+def orphan_files():
+    """Stored files that no Dataset row refers to: uploads with their columnar copies,
+    appended segments, cached reports and chunks of closed upload sessions."""
+    now = time.time()
+    orphans = []
+
+    files = {os.path.basename(name) for name in Dataset.objects.values_list('file', flat=True)}
+    directory, entries = _listdir(DATASET_DIR)
+    for entry in entries:
+        base = entry[:-len(COLUMNAR_SUFFIX)] if entry.endswith(COLUMNAR_SUFFIX) else entry
+        path = os.path.join(directory, entry)
+        if base not in files and _stale(path, now):
+            orphans.append(path)
+
+    segments = {os.path.basename(name) for names in Dataset.objects.exclude(segments=[]).values_list('segments', flat=True) for name in names}
+    directory, entries = _listdir(SEGMENT_DIR)
+    orphans += [os.path.join(directory, e) for e in entries if e not in segments and _stale(os.path.join(directory, e), now)]
+
+    hashes = set(Dataset.objects.exclude(content_hash__isnull=True).values_list('content_hash', flat=True))
+    directory, entries = _listdir(REPORT_DIR)
+    orphans += [os.path.join(directory, e) for e in entries if e.split('-v')[0] not in hashes and _stale(os.path.join(directory, e), now)]
+
+    # chunks left behind by uploads that are no longer open
+    open_ids = {str(i) for i in UploadSession.objects.filter(state=UploadSession.OPEN).values_list('id', flat=True)}
+    root = default_storage.path(UPLOAD_DIR)
+    for session_id in (os.listdir(root) if os.path.isdir(root) else []):
+        if session_id not in open_ids:
+            directory, entries = _listdir(f"{UPLOAD_DIR}/{session_id}")
+            orphans += [os.path.join(directory, e) for e in entries if _stale(os.path.join(directory, e), now)]
+    return orphans
+
+
+def run_retention(dry_run=False):
+    """One sweep over every user's quota, then orphaned files. Returns what was (or
+    with dry_run would be) removed."""
+    from django.contrib.auth.models import User
+    expired = []
+    for user in User.objects.filter(id__in=owners_over_quota()):
+        expired += expired_datasets(user)
+    uploads = stale_uploads()
+    expired += [s.dataset for s in uploads if s.dataset is not None]
+    orphans = orphan_files()
+    if not dry_run:
+        UploadSession.objects.filter(id__in=[s.id for s in uploads]).update(state=UploadSession.ABORTED)
+        release_datasets(expired)
+        for path in orphans:
+            if os.path.exists(path):
+                os.remove(path)
+    return expired, orphans
@@ -0,0 +1,55 @@
+import json
+import pyarrow as pa
+from .storage import iter_batches
+from .schema import widen_table
+
+# Row-window parameters and export streaming shared by the sync and async data views
+MAX_PAGE_SIZE = 10000
+STREAM_TYPES = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
+
+
+def parse_row_query(params, known):
+    # ?offset=&limit= window, ?columns=a,b projection, ?sort=col or ?sort=-col
+    offset = int(params.get('offset', 0))
+    limit = params.get('limit')
+    limit = min(int(limit), MAX_PAGE_SIZE) if limit is not None else None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must be non-negative")
+
+    columns = [c for c in params.get('columns', '').split(',') if c] or None
+    sort = params.get('sort') or None
+    descending = bool(sort) and sort.startswith('-')
+    if descending:
+        sort = sort[1:]
+
+    unknown = [c for c in (columns or []) + ([sort] if sort else []) if known is not None and c not in known]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return offset, limit, columns, sort, descending
+
+
+def check_stream_query(mode, offset, limit, sort):
+    if mode not in STREAM_TYPES:
+        raise ValueError("stream must be 'ndjson' or 'json'")
+    if sort or offset or limit is not None:
+        raise ValueError("stream exports the whole dataset; drop offset, limit and sort")
+
+
+def stream_rows(dataset, columns, mode):
+    # rows go out batch by batch, so memory stays flat and the first bytes leave immediately
+    if mode == 'json':
+        head = {"dataset_id": dataset.id, "name": dataset.name, "total": (dataset.stats or {}).get('count')}
+        yield json.dumps(head)[:-1] + ', "data": ['
+    first = True
+    for batch in iter_batches(dataset, columns):
+        if not batch.num_rows:
+            continue
+        frame = widen_table(pa.Table.from_batches([batch])).to_pandas()
+        if mode == 'ndjson':
+            yield frame.to_json(orient='records', lines=True, double_precision=15, force_ascii=False)
+        else:
+            body = frame.to_json(orient='records', double_precision=15, force_ascii=False)[1:-1]
+            yield body if first else ',' + body
+        first = False
+    if mode == 'json':
+        yield ']}'
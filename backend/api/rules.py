@@ -0,0 +1,275 @@
+import json
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from .analytics import CRITICAL_PRESSURE, CRITICAL_TEMPERATURE
+
+# Boolean conditions over dataset columns, shared by alert rules and the query endpoint.
+#
+#   leaf:      {"column": "Pressure", "op": ">", "value": 1200}
+#              ops: > >= < <= == != between outside in not_in is_null not_null
+#   compound:  {"all": [...]}, {"any": [...]}, {"not": {...}}
+#
+# A condition compiles into a tree of hashable leaves; MaskEvaluator computes each
+# distinct leaf once per frame, so rules sharing a predicate share its mask.
+COMPARISONS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+RANGE_OPS = ('between', 'outside')
+SET_OPS = ('in', 'not_in')
+NULL_OPS = ('is_null', 'not_null')
+MAX_DEPTH = 16
+
+DEFAULT_RULE = {
+    "name": "Critical",
+    "condition": {"any": [
+        {"column": "Pressure", "op": ">", "value": CRITICAL_PRESSURE},
+        {"column": "Temperature", "op": ">", "value": CRITICAL_TEMPERATURE},
+    ]},
+}
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _scalar(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise RuleError(f"Unsupported value: {value!r}")
+    return float(value) if isinstance(value, (int, float)) else value
+
+
+def _compile(cond, depth):
+    if depth > MAX_DEPTH:
+        raise RuleError("Condition is nested too deeply")
+    if not isinstance(cond, dict):
+        raise RuleError("Condition must be an object")
+
+    for key in ('all', 'any'):
+        if key in cond:
+            parts = cond[key]
+            if not isinstance(parts, list) or not parts:
+                raise RuleError(f"'{key}' takes a non-empty list of conditions")
+            return (key, tuple(_compile(part, depth + 1) for part in parts))
+    if 'not' in cond:
+        return ('not', _compile(cond['not'], depth + 1))
+
+    column, op = cond.get('column'), cond.get('op')
+    if not isinstance(column, str) or not column:
+        raise RuleError("Condition needs a 'column'")
+    if op in COMPARISONS:
+        value = _scalar(cond.get('value'))
+    elif op in RANGE_OPS:
+        bounds = cond.get('value')
+        if not isinstance(bounds, list) or len(bounds) != 2:
+            raise RuleError(f"'{op}' takes a [low, high] value")
+        bounds = [_scalar(b) for b in bounds]
+        try:
+            value = tuple(float(b) for b in bounds)
+        except ValueError:
+            raise RuleError(f"'{op}' bounds must be numbers")
+    elif op in SET_OPS:
+        values = cond.get('value')
+        if not isinstance(values, list) or not values:
+            raise RuleError(f"'{op}' takes a non-empty list value")
+        value = tuple(_scalar(v) for v in values)
+    elif op in NULL_OPS:
+        value = None
+    else:
+        raise RuleError(f"Unknown operator: {op}")
+    return ('leaf', (column, op, value))
+
+
+@lru_cache(maxsize=1024)
+def _compile_text(text):
+    return _compile(json.loads(text), 0)
+
+
+def compile_condition(cond):
+    """Validate cond and return its compiled tree; identical conditions compile once."""
+    return _compile_text(json.dumps(cond, sort_keys=True))
+
+
+def referenced_columns(node, out=None):
+    out = set() if out is None else out
+    kind, body = node
+    if kind == 'leaf':
+        out.add(body[0])
+    elif kind == 'not':
+        referenced_columns(body, out)
+    else:
+        for part in body:
+            referenced_columns(part, out)
+    return out
+
+
+class MaskEvaluator:
+    """Evaluates compiled conditions against one frame, memoising every leaf mask."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.rows = len(frame)
+        self._numeric = {}
+        self._codes = {}
+        self._masks = {}
+
+    def _column(self, name):
+        if name not in self.frame.columns:
+            raise RuleError(f"Unknown column: {name}")
+        return self.frame[name]
+
+    def numeric(self, name):
+        # float32 columns are compared in float32, against thresholds rounded the same
+        # way as the stored readings
+        if name not in self._numeric:
+            column = self._column(name)
+            if column.dtype == np.float32:
+                self._numeric[name] = column.to_numpy(dtype=np.float32, na_value=np.nan)
+            else:
+                self._numeric[name] = pd.to_numeric(column, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        return self._numeric[name]
+
+    def codes(self, name):
+        # strings are compared through factorized integer codes
+        if name not in self._codes:
+            column = self._column(name)
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # categorical columns already carry their codes
+                codes, uniques = column.cat.codes.to_numpy(), column.cat.categories.astype(str)
+            else:
+                codes, uniques = pd.factorize(column.astype('string'), use_na_sentinel=True)
+            self._codes[name] = (codes, {v: i for i, v in enumerate(uniques)})
+        return self._codes[name]
+
+    def _is_numeric(self, name):
+        return pd.api.types.is_numeric_dtype(self._column(name))
+
+    def _leaf(self, column, op, value):
+        if op in NULL_OPS:
+            missing = self._column(column).isna().to_numpy()
+            return missing if op == 'is_null' else ~missing
+
+        if op in RANGE_OPS:
+            values = self.numeric(column)
+            low, high = (values.dtype.type(v) for v in value)
+            inside = (values >= low) & (values <= high)
+            return inside if op == 'between' else ~inside & ~np.isnan(values)
+
+        if not self._is_numeric(column) and (op in SET_OPS or op in ('==', '!=')):
+            codes, lookup = self.codes(column)
+            wanted = [lookup[v] for v in (value if op in SET_OPS else (value,)) if v in lookup]
+            mask = np.isin(codes, wanted)
+            return mask if op in ('in', '==') else ~mask & (codes >= 0)
+
+        values = self.numeric(column)
+        if op in SET_OPS:
+            mask = np.isin(values, np.array([v for v in value if isinstance(v, float)], dtype=values.dtype))
+            return mask if op == 'in' else ~mask & ~np.isnan(values)
+        if isinstance(value, str):
+            raise RuleError(f"Column {column} is numeric; '{op}' needs a number")
+        with np.errstate(invalid='ignore'):
+            return COMPARISONS[op](values, values.dtype.type(value))
+
+    def leaf(self, key):
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = self._leaf(*key)
+        return mask
+
+    def evaluate(self, node):
+        kind, body = node
+        if kind == 'leaf':
+            return self.leaf(body)
+        if kind == 'not':
+            return ~self.evaluate(body)
+        masks = [self.evaluate(part) for part in body]
+        return np.logical_and.reduce(masks) if kind == 'all' else np.logical_or.reduce(masks)
+
+    def type_mask(self, type_name):
+        return self.leaf(('Type', '==', type_name))
+
+
+def rule_mask(evaluator, rule):
+    """rule: dict with a compiled 'condition', optional 'equipment_type' scope and
+    'overrides' mapping Type -> compiled condition used for rows of that Type."""
+    mask = evaluator.evaluate(rule['condition'])
+    overrides = rule.get('overrides') or {}
+    if overrides:
+        mask = mask.copy()
+        for type_name, condition in overrides.items():
+            rows = evaluator.type_mask(type_name)
+            mask[rows] = evaluator.evaluate(condition)[rows]
+    if rule.get('equipment_type'):
+        mask = mask & evaluator.type_mask(rule['equipment_type'])
+    return mask
+
+
+def evaluate_rules(frame, rules, limit):
+    evaluator = MaskEvaluator(frame)
+    results = []
+    for rule in rules:
+        entry = {"rule_id": rule.get('id'), "name": rule['name']}
+        try:
+            mask = rule_mask(evaluator, rule)
+        except RuleError as e:
+            entry["error"] = str(e)
+            results.append(entry)
+            continue
+        rows = np.flatnonzero(mask)
+        entry["count"] = int(len(rows))
+        entry["rows"] = rows[:limit].tolist()
+        results.append(entry)
+    return results
+
+
+def clean_rule(data, partial=False):
+    """Validate an alert rule payload; returns the model fields to set."""
+    fields = {}
+    if 'name' in data or not partial:
+        name = data.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise RuleError("name is required")
+        fields['name'] = name.strip()[:100]
+    if 'condition' in data or not partial:
+        compile_condition(data.get('condition'))
+        fields['condition'] = data.get('condition')
+    if 'equipment_type' in data:
+        fields['equipment_type'] = str(data.get('equipment_type') or '')[:100]
+    if 'overrides' in data:
+        overrides = data.get('overrides') or {}
+        if not isinstance(overrides, dict):
+            raise RuleError("overrides must map Type to a condition")
+        for condition in overrides.values():
+            compile_condition(condition)
+        fields['overrides'] = overrides
+    if 'enabled' in data:
+        fields['enabled'] = bool(data.get('enabled'))
+    return fields
+
+
+def compile_rule(rule):
+    return {
+        "id": rule.id,
+        "name": rule.name,
+        "condition": compile_condition(rule.condition),
+        "equipment_type": rule.equipment_type,
+        "overrides": {t: compile_condition(c) for t, c in (rule.overrides or {}).items()},
+    }
+
+
+def serialize_rule(rule):
+    return {
+        "id": rule.id,
+        "name": rule.name,
+        "condition": rule.condition,
+        "equipment_type": rule.equipment_type or None,
+        "overrides": rule.overrides or {},
+        "enabled": rule.enabled,
+        "created_at": rule.created_at,
+        "updated_at": rule.updated_at,
+    }
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Declared storage types for the equipment format. Type is a small set of labels and is
+# kept as a dictionary (pandas categorical); Equipment Name is near-unique, so it stays
+# an Arrow string in memory and is dictionary-encoded by the Parquet writer only. Metrics
+# are stored as float32 when a dataset's readings survive the round trip, float64 otherwise.
+TYPES = {
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'string': pa.string(),
+    'float32': pa.float32(),
+    'float64': pa.float64(),
+}
+REGISTRY = {
+    'Equipment Name': 'string',
+    'Type': 'category',
+    'Flowrate': 'float32',
+    'Pressure': 'float32',
+    'Temperature': 'float32',
+}
+
+
+def parse_types(declared):
+    """Validate extra-column types supplied with an upload ({column: type name})."""
+    if not isinstance(declared, dict):
+        raise ValueError("schema must map column names to types")
+    for column, name in declared.items():
+        if column in REGISTRY:
+            raise ValueError(f"{column} has a fixed type")
+        if name not in TYPES:
+            raise ValueError(f"Unknown type for {column}: {name}; use {', '.join(TYPES)}")
+    return dict(declared)
+
+
+def decimal_values(values):
+    """float32 values as float64 at the shortest decimals that round-trip (1.1, not
+    1.100000023841858), for values that leave the server; other values just widened."""
+    values = np.asarray(values)
+    wide = values.astype('float64')
+    if values.dtype != np.float32:
+        return wide
+    magnitude = np.abs(wide)
+    # scaled by exact powers of ten (up to 1e22) only; the rare value outside that goes through text
+    scalable = (magnitude >= 1e-13) & (magnitude < 1e13)
+    pending = np.flatnonzero(scalable)
+    exponent = np.floor(np.log10(magnitude[pending]))
+    # any float32 is told apart by 9 significant digits; most readings need 7 or fewer
+    for digits in (7, 8, 9):
+        if not len(pending):
+            break
+        shift = digits - 1 - exponent
+        up, down = 10.0 ** np.maximum(shift, 0), 10.0 ** np.maximum(-shift, 0)
+        rounded = np.round(wide[pending] * up / down) * down / up
+        fits = rounded.astype('float32') == values[pending]
+        wide[pending[fits]] = rounded[fits]
+        pending, exponent = pending[~fits], exponent[~fits]
+    rest = np.flatnonzero(~scalable & np.isfinite(wide) & (magnitude != 0))
+    if len(rest):
+        wide[rest] = pc.cast(pc.cast(pa.array(values[rest]), pa.string()), pa.float64()).to_numpy()
+    return wide
+
+
+def metric_values(series):
+    """A metric column as float64 for arithmetic, non-numbers as NaN."""
+    if series.dtype == np.float32:
+        return series.to_numpy().astype('float64')
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _fits_float32(column):
+    values = column.to_numpy(zero_copy_only=False)
+    return np.array_equal(decimal_values(values.astype('float32')), values, equal_nan=True)
+
+
+def resolve_types(table, declared=None):
+    """Column types for a new dataset, decided from its first chunk. A later chunk can
+    still widen a float32 column (see lossy_columns)."""
+    declared = declared or {}
+    types = {}
+    for field in table.schema:
+        name = REGISTRY.get(field.name) or declared.get(field.name)
+        if name == 'float32' and not (pa.types.is_floating(field.type) and _fits_float32(table.column(field.name))):
+            name = 'float64'
+        if name is None:
+            name = 'float64' if pa.types.is_floating(field.type) else 'string'
+        types[field.name] = name
+    return types
+
+
+def lossy_columns(table, schema):
+    """float32 columns of schema whose values in table would change when narrowed."""
+    return [
+        field.name for field in schema
+        if pa.types.is_float32(field.type) and field.name in table.column_names
+        and not _fits_float32(table.column(field.name))
+    ]
+
+
+def widen_schema(schema, columns):
+    for column in columns:
+        schema = schema.set(schema.get_field_index(column), pa.field(column, pa.float64()))
+    return schema
+
+
+def arrow_schema(types):
+    return pa.schema([(column, TYPES[name]) for column, name in types.items()])
+
+
+def types_of(schema):
+    """Type names of an existing Parquet schema; the inverse of arrow_schema."""
+    names = {str(t): n for n, t in TYPES.items()}
+    return {field.name: names.get(str(field.type), 'float64' if pa.types.is_floating(field.type) else 'string') for field in schema}
+
+
+def apply_types(frame, types=None):
+    """Bring a loaded frame to its declared dtypes. Categories are sorted so that sorting
+    a categorical column orders rows by label."""
+    types = types or {c: n for c, n in REGISTRY.items() if n == 'category'}
+    for column, name in types.items():
+        if column not in frame.columns:
+            continue
+        series = frame[column]
+        if name == 'category':
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype('category')
+            categories = series.cat.categories
+            if not categories.is_monotonic_increasing:
+                series = series.cat.reorder_categories(categories.sort_values())
+            frame[column] = series
+    return frame
+
+
+def mixed_float_columns(schemas):
+    """Columns stored as float32 in some of schemas and float64 in others. An append that
+    needs more precision is stored as float64, and read alongside the float32 rows by
+    widening those (see widen_table)."""
+    def of(check):
+        return {field.name for schema in schemas for field in schema if check(field.type)}
+    return of(pa.types.is_float32) & of(pa.types.is_float64)
+
+
+def widen_table(table, columns=None):
+    """float32 columns (or just those named) as float64 decimals, for payloads that
+    leave the server."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_float32(field.type) and (columns is None or field.name in columns):
+            column = table.column(i)
+            values = pa.array(decimal_values(column.to_numpy()), mask=column.is_null().to_numpy())
+            table = table.set_column(i, field.name, values)
+    return table
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.core.files.storage import default_storage
+from .cache import frame_cache
+from .schema import apply_types, mixed_float_columns, widen_table
+
+# Columnar copy of each uploaded dataset, written once next to the original file.
+# Rows appended later live in per-dataset segment files under SEGMENT_DIR.
+COLUMNAR_SUFFIX = '.parquet'
+SEGMENT_DIR = 'datasets/segments'
+
+
+def columnar_path(path):
+    return path + COLUMNAR_SUFFIX
+
+
+def ensure_columnar(dataset):
+    path = dataset.file.path
+    sidecar = columnar_path(path)
+    if not os.path.exists(sidecar):
+        # datasets uploaded before the columnar copy existed get one on first read
+        from .ingest import ingest_file
+        ingest_file(path, dataset.sheet or None, types=dataset.column_types)
+    return sidecar
+
+
+def columnar_paths(dataset):
+    # base copy first, then rows appended to this dataset in arrival order
+    return [ensure_columnar(dataset)] + [default_storage.path(name) for name in dataset.segments or []]
+
+
+def frame_key(dataset):
+    sidecar = columnar_path(dataset.file.path)
+    # legacy datasets have no content hash; their copy is written here if it is still missing
+    return (sidecar, dataset.content_hash or os.stat(ensure_columnar(dataset)).st_mtime_ns)
+
+
+def _read_table(paths):
+    tables = [pq.read_table(path) for path in paths]
+    if len(tables) == 1:
+        return tables[0]
+    # segments stored as float64 for precision widen the float32 rows they are read with
+    mixed = mixed_float_columns([table.schema for table in tables])
+    return pa.concat_tables([widen_table(table, mixed) for table in tables] if mixed else tables)
+
+
+def load_frame(dataset, columns=None):
+    paths = columnar_paths(dataset)
+    frame = frame_cache.get_or_load(frame_key(dataset), lambda: apply_types(
+        _read_table(paths).to_pandas(), dataset.column_types,
+    ))
+    return frame[columns] if columns else frame
+
+
+def _slice_frame(frame, offset, stop, columns, sort, descending):
+    if sort is not None:
+        frame = frame.sort_values(sort, ascending=not descending, na_position='last', kind='stable')
+    page = frame.iloc[offset:stop]
+    if columns:
+        page = page[columns]
+    return widen_table(pa.Table.from_pandas(page, preserve_index=False))
+
+
+def read_rows(dataset, offset=0, limit=None, columns=None, sort=None, descending=False):
+    """Read a window of rows as an Arrow table, touching only the row groups it spans.
+
+    Returns the table and the total row count of the dataset.
+    """
+    paths = columnar_paths(dataset)
+    # a frame already in memory answers any window without touching the disk; a full
+    # read loads it into the cache, a page of an uncached dataset reads row groups only
+    frame = frame_cache.peek(frame_key(dataset))
+    if frame is None and limit is None:
+        frame = load_frame(dataset)
+    if frame is not None:
+        total = len(frame)
+        stop = total if limit is None else min(total, offset + limit)
+        return _slice_frame(frame, offset, stop, columns, sort, descending), total
+
+    files = [pq.ParquetFile(p) for p in paths]
+    # row groups of every segment, addressed as one sequence
+    pieces = [(f, i) for f in files for i in range(f.metadata.num_row_groups)]
+    sizes = np.array([f.metadata.row_group(i).num_rows for f, i in pieces], dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    total = int(sizes.sum())
+    stop = total if limit is None else min(total, offset + limit)
+    if offset >= stop:
+        return widen_table(files[0].schema_arrow.empty_table().select(columns or files[0].schema_arrow.names)), total
+
+    if sort is None:
+        rows = np.arange(offset, stop)
+    else:
+        # only the sort key is read in full; the page itself comes from the row groups it lands in
+        mixed = mixed_float_columns([f.schema_arrow for f in files])
+        keys = pa.chunked_array([widen_table(f.read(columns=[sort]), mixed).column(0) for f in files]).combine_chunks()
+        order = pc.array_sort_indices(keys, order='descending' if descending else 'ascending', null_placement='at_end')
+        rows = order.slice(offset, stop - offset).to_numpy().astype(np.int64)
+
+    groups = np.searchsorted(starts, rows, side='right') - 1
+    needed = np.unique(groups)
+    # widened piece by piece, as segments may differ in float width
+    table = pa.concat_tables([widen_table(pieces[g][0].read_row_group(pieces[g][1], columns=columns)) for g in needed])
+    group_offsets = np.zeros(len(pieces), dtype=np.int64)
+    group_offsets[needed] = np.cumsum([0] + [sizes[g] for g in needed[:-1]])
+    local = group_offsets[groups] + (rows - starts[groups])
+    return table.take(pa.array(local)), total
+
+
+def iter_batches(dataset, columns=None, batch_size=5000):
+    for path in columnar_paths(dataset):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+
+
+def remove_dataset_files(dataset):
+    path = dataset.file.path
+    frame_cache.invalidate(columnar_path(path))
+    for p in (path, columnar_path(path)):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def remove_segments(dataset):
+    # appended rows belong to one dataset, so they go with it even when the base file is shared
+    for name in dataset.segments or []:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+def file_digest(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_file(path, chunk_size=1024 * 1024):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
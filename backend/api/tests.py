@@ -1,3 +1,1601 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+import msgpack
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import zstandard
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from django.utils.module_loading import import_string
+from rest_framework.test import APIClient
+from . import appends, jobs
+from .authentication import SignedTokenAuthentication, issue_token
+from .cache import FrameCache, frame_cache
+from .charts import lttb
+from .models import AlertRule, AuthToken, Dataset, IngestJob
+from .query import ResultCache, result_bytes, result_cache
+from .reports import open_report, remove_cached_reports, report_path, write_report
+from .retention import expired_datasets, orphan_files, release_dataset, run_retention
+from .storage import columnar_path, frame_key, load_frame
+from .ingest import SchemaError, conform, ingest_csv
+from .schema import arrow_schema, decimal_values, metric_values
 
-# can create tests for dataset model
+SAMPLE_CSV = (
+    b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    b"Pump-1,Pump,120,5.2,110\n"
+    b"Pump-2,Pump,130,5.5,95\n"
+    b"Valve-1,Valve,60,4.1,105\n"
+    b"Compressor-1,Compressor,200,8.5,95\n"
+    b"Reactor-1,Reactor,150,1250,130\n"
+    b"HeatX-1,HeatExchanger,90,3.8,80\n"
+)
+
+
+def csv_rows(rows, extra_header=''):
+    header = "Equipment Name,Type,Flowrate,Pressure,Temperature" + extra_header
+    return ("\n".join([header] + rows) + "\n").encode()
+
+
+class DatasetTestMixin:
+    """A logged-in user with a media directory of their own; ingest jobs run inline."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        frame_cache.clear()
+        result_cache.clear()
+        cache.clear()
+
+        self.user = User.objects.create_user('alice', password='correct-horse')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content=SAMPLE_CSV, name='equipment.csv', client=None, **data):
+        response = (client or self.client).post('/api/upload-csv/', {'file': SimpleUploadedFile(name, content), **data}, format='multipart')
+        if response.status_code == 202:
+            jobs.run_job(response.data['job_id'])
+        return response
+
+    def upload_dataset(self, content=SAMPLE_CSV, name='equipment.csv', **data):
+        response = self.upload(content, name, **data)
+        self.assertEqual(response.status_code, 202, response.data)
+        return Dataset.objects.get(id=response.data['dataset_id'])
+
+    def legacy_dataset(self, content=SAMPLE_CSV, name='legacy.csv'):
+        # a row as stored before ingest precomputed anything
+        stored = default_storage.save(f"datasets/{name}", ContentFile(content))
+        return Dataset.objects.create(name=name, file=stored, owner=self.user)
+
+
+class DatasetTestCase(DatasetTestMixin, TestCase):
+    pass
+
+
+class ColumnarCopyTests(DatasetTestCase):
+    def test_upload_writes_a_parquet_copy(self):
+        dataset = self.upload_dataset()
+        table = pq.read_table(columnar_path(dataset.file.path))
+        self.assertEqual(table.num_rows, 6)
+        self.assertEqual(table.column_names, ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+
+    def test_rows_are_served_from_the_parquet_copy(self):
+        dataset = self.upload_dataset()
+        os.remove(dataset.file.path)
+        response = self.client.get(f'/api/dataset/{dataset.id}/data/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['Equipment Name'] for row in response.data['data']][:2], ['Pump-1', 'Pump-2'])
+
+    def test_legacy_dataset_gets_a_parquet_copy_on_first_read(self):
+        dataset = self.legacy_dataset()
+        self.assertFalse(os.path.exists(columnar_path(dataset.file.path)))
+        response = self.client.get(f'/api/dataset/{dataset.id}/data/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 6)
+        self.assertTrue(os.path.exists(columnar_path(dataset.file.path)))
+
+    def test_failed_parse_leaves_no_files_behind(self):
+        response = self.upload(csv_rows(['Pump-1,Pump,120,5.2,110', '"unterminated,Pump,1,2,3']))
+        job = IngestJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.stage, IngestJob.FAILED)
+        self.assertFalse(Dataset.objects.filter(id=response.data['dataset_id']).exists())
+        self.assertEqual(os.listdir(default_storage.path('datasets')), [])
+
+
+class StoredAnalyticsTests(DatasetTestCase):
+    def test_stats_are_stored_at_upload(self):
+        dataset = self.upload_dataset()
+        self.assertEqual(dataset.stats['count'], 6)
+        self.assertEqual(dataset.stats['type_counts'], {'Pump': 2, 'Valve': 1, 'Compressor': 1, 'Reactor': 1, 'HeatExchanger': 1})
+        self.assertEqual(dataset.stats['metrics']['Flowrate'], {'count': 6, 'sum': 750.0, 'min': 60.0, 'max': 200.0})
+        self.assertEqual(dataset.stats['critical_alerts'], 3)
+
+    def test_summary_is_served_without_reading_the_file(self):
+        dataset = self.upload_dataset()
+        with mock.patch('api.analytics.load_frame', side_effect=AssertionError("file read")):
+            response = self.client.get(f'/api/dataset/{dataset.id}/summary/')
+        self.assertEqual(response.status_code, 200)
+        analytics = response.data['analytics']
+        self.assertEqual(analytics['total_count'], 6)
+        self.assertEqual(analytics['avg_flowrate'], 125.0)
+        self.assertEqual(analytics['avg_pressure'], 212.85)
+        self.assertEqual(analytics['max_temperature'], 130.0)
+        self.assertEqual(analytics['critical_alerts'], 3)
+        self.assertEqual(next(iter(analytics['equipment_count_by_type'])), 'Pump')
+        self.assertEqual(analytics['metrics']['Flowrate'], {'min': 60.0, 'max': 200.0, 'mean': 125.0})
+
+    def test_summary_of_a_legacy_dataset_is_computed_once(self):
+        dataset = self.legacy_dataset()
+        self.assertEqual(self.client.get(f'/api/dataset/{dataset.id}/summary/').data['analytics']['total_count'], 6)
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.stats['count'], 6)
+
+    def test_summary_of_another_users_dataset_is_not_found(self):
+        other = User.objects.create_user('bob', password='x')
+        dataset = self.legacy_dataset()
+        dataset.owner = other
+        dataset.save()
+        self.assertEqual(self.client.get(f'/api/dataset/{dataset.id}/summary/').status_code, 404)
+        self.assertEqual(self.client.get('/api/dataset/999/summary/').status_code, 404)
+
+    def test_backfill_fills_in_legacy_datasets(self):
+        dataset = self.legacy_dataset()
+        out = StringIO()
+        call_command('backfill_summaries', stdout=out, stderr=StringIO())
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.stats['count'], 6)
+        self.assertEqual(dataset.columns, ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+        self.assertEqual(dataset.size, len(SAMPLE_CSV))
+        self.assertEqual(len(dataset.content_hash), 64)
+        self.assertIn("Backfilled 1 dataset(s), 0 failed", out.getvalue())
+
+    def test_backfill_reports_unreadable_files(self):
+        dataset = self.legacy_dataset(b"not,a,dataset\n\"1,2\n")
+        err = StringIO()
+        call_command('backfill_summaries', stdout=StringIO(), stderr=err)
+        self.assertIn(str(dataset.id), err.getvalue())
+
+
+class DatasetListTests(DatasetTestCase):
+    def test_list_is_built_from_stored_metadata(self):
+        dataset = self.upload_dataset()
+        with mock.patch('api.storage._read_table', side_effect=AssertionError("file read")):
+            response = self.client.get('/api/datasets/')
+        self.assertEqual(response.status_code, 200)
+        entry = response.data[0]
+        self.assertEqual(entry['id'], dataset.id)
+        self.assertEqual(entry['row_count'], 6)
+        self.assertEqual(entry['type_count'], 5)
+        self.assertEqual(entry['avg_flowrate'], 125.0)
+        self.assertEqual(entry['size'], len(SAMPLE_CSV))
+        self.assertIn("6 records across 5 unique equipment types", entry['summary'])
+
+    def test_list_shows_the_newest_five_of_the_users_own(self):
+        for i in range(7):
+            self.legacy_dataset(name=f'd{i}.csv')
+        other = User.objects.create_user('bob', password='x')
+        Dataset.objects.create(name='not-mine.csv', file='datasets/x.csv', owner=other)
+        response = self.client.get('/api/datasets/')
+        self.assertEqual(len(response.data), 5)
+        self.assertNotIn('not-mine.csv', [d['name'] for d in response.data])
+
+    def test_dataset_without_stats_is_listed_as_pending(self):
+        self.legacy_dataset()
+        entry = self.client.get('/api/datasets/').data[0]
+        self.assertIsNone(entry['row_count'])
+        self.assertEqual(entry['summary'], "File processing pending or unavailable.")
+
+    def test_list_requires_authentication(self):
+        self.assertIn(APIClient().get('/api/datasets/').status_code, (401, 403))
+
+
+class UploadValidationTests(DatasetTestCase):
+    def test_missing_columns_are_rejected_before_anything_is_stored(self):
+        response = self.upload(b"Equipment Name,Type,Flowrate\nPump-1,Pump,1\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Missing required columns: Pressure, Temperature", response.data['error'])
+        self.assertFalse(Dataset.objects.exists())
+        self.assertFalse(IngestJob.objects.exists())
+
+    def test_missing_file_is_rejected(self):
+        response = self.client.post('/api/upload-csv/', {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], "No file uploaded")
+
+    def test_chunked_ingest_matches_a_single_pass(self):
+        path = default_storage.path(default_storage.save('datasets/chunked.csv', ContentFile(SAMPLE_CSV)))
+        stats, types = ingest_csv(path, chunk_rows=2)
+        self.assertEqual(stats, self.upload_dataset().stats)
+        self.assertEqual(pq.read_metadata(columnar_path(path)).num_rows, 6)
+
+    def test_unparseable_metrics_become_missing_values(self):
+        dataset = self.upload_dataset(csv_rows(['Pump-1,Pump,n/a,5.2,110', 'Pump-2,Pump,130,5.5,95']))
+        self.assertEqual(dataset.stats['metrics']['Flowrate']['count'], 1)
+
+    def test_optional_column_that_turns_to_text_in_a_later_chunk(self):
+        rows = ['Pump-1,Pump,120,5.2,110,', 'Pump-2,Pump,130,5.5,95,7', 'Valve-1,Valve,60,4.1,105,hello', 'Valve-2,Valve,61,4.2,99,1.50']
+        path = default_storage.path(default_storage.save('datasets/late.csv', ContentFile(csv_rows(rows, ',Notes'))))
+        stats, types = ingest_csv(path, chunk_rows=2)
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(types['Notes'], 'string')
+        notes = pq.read_table(columnar_path(path)).column('Notes').to_pylist()
+        # read as written, not as re-formatted floats
+        self.assertEqual(notes, [None, '7', 'hello', '1.50'])
+
+
+class RawDataPaginationTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.url = f'/api/dataset/{self.dataset.id}/data/'
+
+    def test_pages_follow_next_offset(self):
+        first = self.client.get(self.url, {'limit': 4}).data
+        self.assertEqual((first['total'], first['offset'], first['next_offset']), (6, 0, 4))
+        self.assertEqual(len(first['data']), 4)
+        last = self.client.get(self.url, {'offset': first['next_offset'], 'limit': 4}).data
+        self.assertEqual([row['Equipment Name'] for row in last['data']], ['Reactor-1', 'HeatX-1'])
+        self.assertIsNone(last['next_offset'])
+
+    def test_offset_past_the_end_is_an_empty_page(self):
+        page = self.client.get(self.url, {'offset': 50}).data
+        self.assertEqual(page['data'], [])
+        self.assertIsNone(page['next_offset'])
+
+    def test_columns_are_projected(self):
+        page = self.client.get(self.url, {'columns': 'Type,Flowrate', 'limit': 1}).data
+        self.assertEqual(page['columns'], ['Type', 'Flowrate'])
+        self.assertEqual(page['data'], [{'Type': 'Pump', 'Flowrate': 120.0}])
+
+    def test_sort_ascending_and_descending(self):
+        ascending = self.client.get(self.url, {'sort': 'Flowrate', 'limit': 2}).data['data']
+        self.assertEqual([row['Flowrate'] for row in ascending], [60.0, 90.0])
+        descending = self.client.get(self.url, {'sort': '-Flowrate', 'limit': 2}).data['data']
+        self.assertEqual([row['Equipment Name'] for row in descending], ['Compressor-1', 'Reactor-1'])
+
+    def test_limit_is_capped(self):
+        self.assertEqual(self.client.get(self.url, {'limit': 10 ** 6}).data['limit'], 10000)
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({'columns': 'Nope'}, {'sort': '-Nope'}, {'offset': -1}, {'limit': 'ten'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+        self.assertIn("Unknown columns: Nope", self.client.get(self.url, {'columns': 'Nope'}).data['error'])
+
+    def test_another_users_dataset_is_not_found(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('bob', password='x'))
+        self.assertEqual(other.get(self.url).status_code, 404)
+
+
+class StreamingExportTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.url = f'/api/dataset/{self.dataset.id}/data/'
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_is_one_record_per_line(self):
+        response = self.client.get(self.url, {'stream': 'ndjson', 'columns': 'Equipment Name,Flowrate'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[0], {'Equipment Name': 'Pump-1', 'Flowrate': 120.0})
+
+    def test_json_stream_is_one_document(self):
+        response = self.client.get(self.url, {'stream': 'json'})
+        document = json.loads(self.body(response))
+        self.assertEqual((document['dataset_id'], document['total']), (self.dataset.id, 6))
+        self.assertEqual([row['Type'] for row in document['data']][-1], 'HeatExchanger')
+
+    def test_stream_matches_the_paged_rows(self):
+        streamed = json.loads(self.body(self.client.get(self.url, {'stream': 'json'})))['data']
+        self.assertEqual(streamed, self.client.get(self.url).data['data'])
+
+    def test_windowed_or_unknown_streams_are_rejected(self):
+        for params in ({'stream': 'ndjson', 'offset': 2}, {'stream': 'json', 'sort': 'Flowrate'}, {'stream': 'csv'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+class BinaryRowFormatTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.url = f'/api/dataset/{self.dataset.id}/data/'
+
+    def test_arrow_stream(self):
+        response = self.client.get(self.url, {'limit': 4}, HTTP_ACCEPT='application/vnd.apache.arrow.stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        self.assertEqual((response['X-Total-Count'], response['X-Next-Offset']), ('6', '4'))
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(table.column('Flowrate').to_pylist(), [120.0, 130.0, 60.0, 200.0])
+
+    def test_msgpack_is_column_major(self):
+        response = self.client.get(self.url, {'columns': 'Type'}, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(response['X-Next-Offset'], '')
+        body = msgpack.unpackb(response.content)
+        self.assertEqual(body['columns'], ['Type'])
+        self.assertEqual(body['data']['Type'][:2], ['Pump', 'Pump'])
+
+    def test_errors_fall_back_to_json(self):
+        for accept in ('application/vnd.apache.arrow.stream', 'application/msgpack'):
+            response = self.client.get(self.url, {'columns': 'Nope'}, HTTP_ACCEPT=accept)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn("Unknown columns", json.loads(response.content)['error'])
+
+
+class ChartSeriesTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [f'P-{i},{"Pump" if i % 3 else "Valve"},{i % 97},{i / 10},{50 + i % 40}' for i in range(1000)]
+        self.dataset = self.upload_dataset(csv_rows(rows))
+        self.url = f'/api/dataset/{self.dataset.id}/chart/'
+
+    def test_line_is_downsampled_to_the_point_budget(self):
+        series = self.client.get(self.url + 'flowrate/', {'points': 50}).data
+        self.assertEqual((series['kind'], series['points'], series['total']), ('line', 50, 1000))
+        # the first and last rows always survive
+        self.assertEqual((series['rows'][0], series['rows'][-1]), (0, 999))
+        self.assertEqual(series['rows'], sorted(series['rows']))
+
+    def test_bar_folds_the_rest_into_other(self):
+        series = self.client.get(self.url + 'pressure/', {'kind': 'bar', 'points': 10}).data
+        self.assertEqual(series['labels'][0], 'P-999')
+        self.assertEqual(series['labels'][-1], 'Other')
+        self.assertEqual(series['other']['count'], 991)
+
+    def test_histogram_counts_every_row(self):
+        series = self.client.get(self.url + 'temperature/', {'kind': 'histogram', 'bins': 4}).data
+        self.assertEqual(len(series['values']), 4)
+        self.assertEqual(sum(series['values']), 1000)
+
+    def test_type_comes_from_the_stored_counts(self):
+        with mock.patch('api.charts.load_frame', side_effect=AssertionError("file read")):
+            series = self.client.get(self.url + 'type/').data
+        self.assertEqual(series['kind'], 'pie')
+        self.assertEqual(dict(zip(series['labels'], series['values'])), {'Pump': 666, 'Valve': 334})
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(self.url + 'humidity/').status_code, 404)
+        self.assertEqual(self.client.get(self.url + 'flowrate/', {'points': 2}).status_code, 400)
+        self.assertEqual(self.client.get(self.url + 'flowrate/', {'kind': 'pie'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url + 'type/', {'kind': 'line'}).status_code, 400)
+
+    def test_lttb_keeps_short_series_whole(self):
+        x = np.arange(5, dtype='float64')
+        self.assertEqual(lttb(x, x, 10).tolist(), [0, 1, 2, 3, 4])
+        keep = lttb(np.arange(100, dtype='float64'), np.sin(np.arange(100)), 10)
+        self.assertEqual((len(keep), keep[0], keep[-1]), (10, 0, 99))
+
+
+class DeduplicationTests(DatasetTestCase):
+    def test_identical_upload_reuses_the_stored_file_and_stats(self):
+        first = self.upload_dataset()
+        with mock.patch('api.jobs.ingest_file', side_effect=AssertionError("parsed again")):
+            second = self.upload_dataset(name='copy.csv')
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(second.stats, first.stats)
+        self.assertEqual(second.name, 'copy.csv')
+        self.assertEqual(sorted(os.listdir(default_storage.path('datasets'))), ['equipment.csv', 'equipment.csv.parquet'])
+
+    def test_different_content_is_stored_separately(self):
+        first = self.upload_dataset()
+        second = self.upload_dataset(SAMPLE_CSV + b"Pump-3,Pump,1,2,3\n")
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertEqual(second.stats['count'], 7)
+
+    def test_shared_file_outlives_one_of_its_datasets(self):
+        first = self.upload_dataset()
+        second = self.upload_dataset(name='copy.csv')
+        release_dataset(first)
+        self.assertTrue(os.path.exists(second.file.path))
+        self.assertEqual(self.client.get(f'/api/dataset/{second.id}/data/').data['total'], 6)
+        release_dataset(second)
+        self.assertFalse(os.path.exists(second.file.path))
+        self.assertFalse(os.path.exists(columnar_path(second.file.path)))
+
+
+class FrameCacheTests(TestCase):
+    def frame(self, rows):
+        return pd.DataFrame({'Flowrate': np.zeros(rows)})
+
+    def test_least_recently_used_frame_is_evicted_by_size(self):
+        size = int(self.frame(100).memory_usage(deep=True).sum())
+        frames = FrameCache(max_bytes=size * 2)
+        for key in ('a', 'b'):
+            frames.get_or_load((key, ''), lambda: self.frame(100))
+        frames.peek(('a', ''))
+        frames.get_or_load(('c', ''), lambda: self.frame(100))
+        self.assertIsNone(frames.peek(('b', '')))
+        self.assertIsNotNone(frames.peek(('a', '')))
+        self.assertEqual(frames.stats()['evictions'], 1)
+        self.assertLessEqual(frames.stats()['bytes'], size * 2)
+
+    def test_loaded_once_then_served_from_memory(self):
+        frames = FrameCache(max_bytes=10 ** 6)
+        loader = mock.Mock(return_value=self.frame(10))
+        first = frames.get_or_load(('a', 'h'), loader)
+        self.assertIs(frames.get_or_load(('a', 'h'), loader), first)
+        loader.assert_called_once()
+        self.assertEqual((frames.stats()['hits'], frames.stats()['misses']), (1, 1))
+
+    def test_frame_larger_than_the_budget_is_not_kept(self):
+        frames = FrameCache(max_bytes=10)
+        frames.get_or_load(('a', ''), lambda: self.frame(100))
+        self.assertEqual(frames.stats()['entries'], 0)
+
+    def test_invalidate_drops_every_version_of_a_path(self):
+        frames = FrameCache(max_bytes=10 ** 6)
+        frames.get_or_load(('a', 'v1'), lambda: self.frame(10))
+        frames.get_or_load(('a', 'v2'), lambda: self.frame(10))
+        frames.get_or_load(('b', 'v1'), lambda: self.frame(10))
+        frames.invalidate('a')
+        self.assertEqual(frames.stats()['entries'], 1)
+
+
+class CacheStatsTests(DatasetTestCase):
+    def test_reads_go_through_the_cache(self):
+        dataset = self.upload_dataset()
+        for _ in range(2):
+            self.client.get(f'/api/dataset/{dataset.id}/chart/flowrate/')
+        self.assertGreaterEqual(frame_cache.stats()['hits'], 1)
+
+    def test_stats_are_for_admins_only(self):
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/cache-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max_bytes', response.data)
+
+
+class ConditionalRequestTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.url = f'/api/dataset/{self.dataset.id}/summary/'
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn(self.dataset.content_hash, response['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+        with mock.patch('api.views.ensure_stats', side_effect=AssertionError("view ran")):
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_last_modified_is_honoured(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_each_representation_has_its_own_etag(self):
+        data = f'/api/dataset/{self.dataset.id}/data/'
+        etags = {
+            self.client.get(data)['ETag'],
+            self.client.get(data, {'limit': 2})['ETag'],
+            self.client.get(data, HTTP_ACCEPT='application/msgpack')['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+        stale = self.client.get(data, HTTP_IF_NONE_MATCH=self.client.get(data, {'limit': 2})['ETag'])
+        self.assertEqual(stale.status_code, 200)
+
+    def test_compressed_bodies_keep_strong_etags(self):
+        data = f'/api/dataset/{self.dataset.id}/data/'
+        plain = self.client.get(data)
+        encoded = self.client.get(data, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(encoded['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', encoded['Vary'])
+        self.assertTrue(encoded['ETag'].startswith('"'), encoded['ETag'])
+        self.assertNotEqual(encoded['ETag'], plain['ETag'])
+        self.assertEqual(self.client.get(data, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=encoded['ETag']).status_code, 304)
+        # the identity body's tag does not validate the gzip one
+        self.assertEqual(self.client.get(data, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(data, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_MATCH=encoded['ETag']).status_code, 200)
+
+    def test_dataset_still_being_ingested_is_a_conflict(self):
+        response = self.client.post('/api/upload-csv/', {'file': SimpleUploadedFile('new.csv', SAMPLE_CSV + b"X,Pump,1,1,1\n")}, format='multipart')
+        pending = self.client.get(f"/api/dataset/{response.data['dataset_id']}/summary/")
+        self.assertEqual(pending.status_code, 409)
+        self.assertEqual((pending.data['job_id'], pending.data['stage']), (response.data['job_id'], IngestJob.QUEUED))
+        self.assertNotIn('ETag', pending)
+
+
+class TokenAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='correct-horse')
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/login/', {'username': 'alice', 'password': 'correct-horse'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def get(self, token, url='/api/datasets/'):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_login_issues_a_working_token(self):
+        token = self.login()
+        self.assertEqual(self.get(token).status_code, 200)
+
+    def test_wrong_password_is_refused(self):
+        response = self.client.post('/api/login/', {'username': 'alice', 'password': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_only_a_hash_of_the_key_is_stored(self):
+        token = self.login()
+        key = token.split(':')[0]
+        record = AuthToken.objects.get(user=self.user)
+        self.assertEqual(len(record.digest), 64)
+        self.assertNotIn(key, record.digest)
+        self.assertFalse(AuthToken.objects.filter(digest=key).exists())
+
+    def test_tampered_token_is_refused(self):
+        token = self.login()
+        response = self.get(('1' if token[0] == '0' else '0') + token[1:])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(str(response.data['detail']), 'Invalid token.')
+
+    def test_expired_token_is_refused(self):
+        token = self.login()
+        with mock.patch('api.authentication.TOKEN_TTL', -1):
+            response = self.get(token)
+        self.assertEqual(str(response.data['detail']), 'Token has expired.')
+        AuthToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.get(token).status_code, 401)
+
+    def test_refresh_rotates_the_token(self):
+        old = self.login()
+        self.assertEqual(self.get(old).status_code, 200)
+        response = self.client.post('/api/token/refresh/', HTTP_AUTHORIZATION=f'Token {old}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(response.data['token']).status_code, 200)
+        self.assertEqual(self.get(old).status_code, 401)
+
+    def test_logout_revokes_the_token(self):
+        token = self.login()
+        self.assertEqual(self.get(token).status_code, 200)
+        self.assertEqual(self.client.post('/api/logout/', HTTP_AUTHORIZATION=f'Token {token}').status_code, 204)
+        self.assertEqual(self.get(token).status_code, 401)
+        self.assertFalse(AuthToken.objects.exists())
+
+
+class IngestJobTests(DatasetTestCase):
+    def test_job_reports_progress_to_done(self):
+        response = self.upload()
+        job = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+        self.assertEqual((job['stage'], job['percent'], job['rows_parsed']), ('done', 100, 6))
+        self.assertIsNone(job['error'])
+
+    def test_failed_job_keeps_its_error(self):
+        response = self.upload(csv_rows(['"unterminated,Pump,1,2,3']))
+        job = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+        self.assertEqual(job['stage'], 'failed')
+        self.assertTrue(job['error'].startswith("Invalid CSV"))
+
+    def test_another_users_job_is_not_found(self):
+        response = self.upload()
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('bob', password='x'))
+        self.assertEqual(other.get(f"/api/jobs/{response.data['job_id']}/").status_code, 404)
+
+    def test_job_runs_once(self):
+        response = self.upload()
+        with mock.patch('api.jobs._process', side_effect=AssertionError("ran twice")):
+            jobs.run_job(response.data['job_id'])
+
+
+class StaleJobTests(DatasetTestCase):
+    def queued(self, content=SAMPLE_CSV):
+        response = self.client.post('/api/upload-csv/', {'file': SimpleUploadedFile('new.csv', content)}, format='multipart')
+        return IngestJob.objects.get(id=response.data['job_id'])
+
+    def age(self, job, stage, seconds=3600):
+        IngestJob.objects.filter(id=job.id).update(stage=stage, updated_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_interrupted_parse_is_failed_and_released(self):
+        job = self.queued()
+        self.age(job, IngestJob.PARSING)
+        self.assertEqual(jobs.reclaim_stale_jobs(requeue=False), ([], [job.id]))
+        job.refresh_from_db()
+        self.assertEqual(job.stage, IngestJob.FAILED)
+        self.assertFalse(Dataset.objects.filter(id=job.dataset_id).exists())
+
+    def test_recent_jobs_are_left_alone(self):
+        job = self.queued()
+        self.age(job, IngestJob.PARSING, seconds=5)
+        self.assertEqual(jobs.reclaim_stale_jobs(requeue=False), ([], []))
+        self.assertEqual(IngestJob.objects.get(id=job.id).stage, IngestJob.PARSING)
+
+    def test_parsed_dataset_stuck_in_finalizing_is_done(self):
+        job = self.queued()
+        Dataset.objects.filter(id=job.dataset_id).update(stats=self.upload_dataset().stats)
+        self.age(job, IngestJob.FINALIZING)
+        self.assertEqual(jobs.reclaim_stale_jobs(requeue=False), ([], []))
+        self.assertEqual(IngestJob.objects.get(id=job.id).stage, IngestJob.DONE)
+        self.assertTrue(Dataset.objects.filter(id=job.dataset_id).exists())
+
+    def test_lost_queued_job_is_resubmitted(self):
+        job = self.queued()
+        self.age(job, IngestJob.QUEUED)
+        with mock.patch.object(jobs.executor, 'submit') as submit:
+            requeued, failed = jobs.reclaim_stale_jobs(requeue=True)
+        self.assertEqual((requeued, failed), ([job.id], []))
+        submit.assert_called_once_with(jobs.run_job, job.id)
+        # not submitted again while it waits for a thread
+        self.assertEqual(jobs.reclaim_stale_jobs(requeue=False), ([], []))
+
+    def test_worker_fails_stalled_jobs_then_drains_the_queue(self):
+        stalled, waiting = self.queued(), self.queued(SAMPLE_CSV + b"X,Pump,1,1,1\n")
+        self.age(stalled, IngestJob.PARSING)
+        out = StringIO()
+        call_command('ingest_worker', '--once', '--retention-interval', '0', stdout=out)
+        self.assertIn(f"job {stalled.id}: stalled, marked failed", out.getvalue())
+        self.assertIn(f"job {waiting.id}: done", out.getvalue())
+
+
+class AsyncViewTests(DatasetTestMixin, TransactionTestCase):
+    # committed rows: authentication runs on the view pool, on a connection of its own
+    def setUp(self):
+        patcher = mock.patch('api.jobs.IN_PROCESS', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.headers = {'Authorization': f"Token {issue_token(self.user)['token']}"}
+        self.async_client = AsyncClient()
+
+    async def test_summary_matches_the_sync_view(self):
+        response = await self.async_client.get(f'/api/async/dataset/{self.dataset.id}/summary/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['analytics']['total_count'], 6)
+        self.assertEqual(response.json()['analytics']['avg_pressure'], 212.85)
+
+    async def test_data_pages_and_charts(self):
+        page = await self.async_client.get(f'/api/async/dataset/{self.dataset.id}/data/', {'limit': 2, 'sort': '-Flowrate'}, headers=self.headers)
+        self.assertEqual([row['Equipment Name'] for row in page.json()['data']], ['Compressor-1', 'Reactor-1'])
+        self.assertEqual(page.json()['next_offset'], 2)
+        chart = await self.async_client.get(f'/api/async/dataset/{self.dataset.id}/chart/flowrate/', headers=self.headers)
+        self.assertEqual(chart.json()['total'], 6)
+
+    async def test_conditional_get(self):
+        url = f'/api/async/dataset/{self.dataset.id}/summary/'
+        etag = (await self.async_client.get(url, headers=self.headers))['ETag']
+        response = await self.async_client.get(url, headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_authentication_and_ownership(self):
+        url = f'/api/async/dataset/{self.dataset.id}/summary/'
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        self.assertEqual((await self.async_client.get(url, headers={'Authorization': 'Token forged'})).status_code, 401)
+        self.assertEqual((await self.async_client.get('/api/async/dataset/999/summary/', headers=self.headers)).status_code, 404)
+        self.assertEqual((await self.async_client.get(url + '?columns=x', headers=self.headers)).status_code, 200)
+        bad = await self.async_client.get(f'/api/async/dataset/{self.dataset.id}/data/', {'columns': 'Nope'}, headers=self.headers)
+        self.assertEqual(bad.status_code, 400)
+
+    async def test_authentication_runs_on_the_view_pool(self):
+        threads = []
+        verify = SignedTokenAuthentication.authenticate_credentials
+
+        def record(auth, token):
+            threads.append(threading.current_thread().name)
+            return verify(auth, token)
+
+        with mock.patch.object(SignedTokenAuthentication, 'authenticate_credentials', record):
+            response = await self.async_client.get(f'/api/async/dataset/{self.dataset.id}/summary/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('async-view'), threads)
+
+    @override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if m != 'whitenoise.middleware.WhiteNoiseMiddleware'])
+    async def test_asgi_middleware_chain_stays_async(self):
+        # what visualizer/asgi.py runs: no sync-only middleware to adapt around
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            response = await self.async_client.get(f'/api/async/dataset/{self.dataset.id}/summary/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+
+class PDFReportTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.url = f'/api/dataset/{self.dataset.id}/pdf/'
+
+    def download(self, url=None):
+        # the first request queues a report job; the PDF is served once it has run
+        response = self.client.get(url or self.url)
+        if response.status_code == 202:
+            jobs.run_job(response.data['job_id'])
+            response = self.client.get(url or self.url)
+        return response
+
+    def test_report_is_rendered_off_the_request(self):
+        with mock.patch('api.reports.render_report', side_effect=AssertionError("rendered in the request")):
+            pending = self.client.get(self.url)
+        self.assertEqual(pending.status_code, 202)
+        self.assertEqual((pending.data['kind'], pending.data['stage']), ('report', 'queued'))
+        self.assertEqual(pending['Retry-After'], '2')
+        self.assertFalse(pending.has_header('ETag'))
+        # polling again while the job waits does not queue another
+        self.assertEqual(self.client.get(self.url).data['job_id'], pending.data['job_id'])
+
+        jobs.run_job(pending.data['job_id'])
+        self.assertEqual(self.client.get(f"/api/jobs/{pending.data['job_id']}/").data['stage'], 'done')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('equipment.csv_report.pdf', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_report_is_rendered_once_per_content(self):
+        b''.join(self.download().streaming_content)
+        copy = self.upload_dataset(name='copy.csv')
+        with mock.patch('api.reports.render_report', side_effect=AssertionError("rendered again")):
+            response = self.client.get(f'/api/dataset/{copy.id}/pdf/')
+            self.assertEqual(response.status_code, 200)
+            b''.join(response.streaming_content)
+
+    def test_deleted_cached_report_is_rendered_again(self):
+        b''.join(self.download().streaming_content)
+        os.remove(report_path(self.dataset.content_hash))
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_report_survives_deletion_while_being_sent(self):
+        self.assertIsNone(open_report(self.dataset))
+        write_report(self.dataset)
+        with open_report(self.dataset) as report:
+            os.remove(report_path(self.dataset.content_hash))
+            self.assertTrue(report.read().startswith(b'%PDF'))
+
+    def test_detail_table_is_capped(self):
+        dataset = self.upload_dataset(csv_rows([f'Pump-{i},Pump,{i},1,1' for i in range(300)]), name='big.csv')
+        url = f'/api/dataset/{dataset.id}/pdf/'
+        pages = lambda pdf: len(re.findall(rb'/Type /Page\b', pdf))
+        full = pages(b''.join(self.download(url).streaming_content))
+        remove_cached_reports(dataset.content_hash)
+        with mock.patch('api.reports.MAX_TABLE_ROWS', 50):
+            capped = pages(b''.join(self.download(url).streaming_content))
+        # two summary pages, then up to 50 table rows a page
+        self.assertEqual((full, capped), (2 + 7, 2 + 2))
+
+    def test_failed_render_keeps_the_dataset(self):
+        pending = self.client.get(self.url)
+        with mock.patch('api.reports.render_report', side_effect=RuntimeError("out of ink")):
+            jobs.run_job(pending.data['job_id'])
+        job = self.client.get(f"/api/jobs/{pending.data['job_id']}/").data
+        self.assertEqual((job['stage'], job['error']), ('failed', "Report failed: out of ink"))
+        self.assertTrue(Dataset.objects.filter(id=self.dataset.id).exists())
+        self.assertEqual(self.download().status_code, 200)
+
+    def test_stalled_render_is_failed_without_touching_the_dataset(self):
+        job_id = self.client.get(self.url).data['job_id']
+        IngestJob.objects.filter(id=job_id).update(stage=IngestJob.PARSING, updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.reclaim_stale_jobs(older_than=60, requeue=False), ([], [job_id]))
+        self.assertIn("request the report again", IngestJob.objects.get(id=job_id).error)
+        self.assertTrue(Dataset.objects.filter(id=self.dataset.id).exists())
+
+    def test_dataset_without_content_hash_is_a_conflict(self):
+        legacy = self.legacy_dataset()
+        response = self.client.get(f'/api/dataset/{legacy.id}/pdf/')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("backfill_summaries", response.data['error'])
+
+    def test_another_users_report_is_not_found(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('bob', password='x'))
+        self.assertEqual(other.get(self.url).status_code, 404)
+
+
+class BatchSummaryTests(DatasetTestCase):
+    url = '/api/datasets/summaries/'
+
+    def test_each_id_gets_a_result_in_request_order(self):
+        ready = self.upload_dataset()
+        legacy = self.legacy_dataset()
+        broken = self.legacy_dataset(b"not,a,dataset\n\"1,2\n", name='broken.csv')
+        pending = self.client.post('/api/upload-csv/', {'file': SimpleUploadedFile('new.csv', SAMPLE_CSV + b"X,Pump,1,1,1\n")}, format='multipart').data['dataset_id']
+        ids = [legacy.id, ready.id, 999, pending, broken.id, ready.id]
+        results = self.client.post(self.url, {'ids': ids}, format='json').data['results']
+        self.assertEqual([r['dataset_id'] for r in results], [legacy.id, ready.id, 999, pending, broken.id])
+        self.assertEqual(results[0]['analytics']['total_count'], 6)
+        self.assertEqual(results[1]['name'], 'equipment.csv')
+        self.assertEqual(results[2]['error'], "Dataset not found")
+        self.assertEqual(results[3]['error'], "Dataset is still being processed")
+        self.assertIn('error', results[4])
+        legacy.refresh_from_db()
+        self.assertIsNotNone(legacy.stats)
+
+    def test_other_users_datasets_are_not_found(self):
+        other = User.objects.create_user('bob', password='x')
+        theirs = Dataset.objects.create(name='theirs.csv', file='datasets/x.csv', owner=other, stats=self.upload_dataset().stats)
+        result = self.client.post(self.url, {'ids': [theirs.id]}, format='json').data['results'][0]
+        self.assertEqual(result['error'], "Dataset not found")
+
+    def test_bad_id_lists_are_rejected(self):
+        for ids in ([], 'abc', {'a': 1}, ['x'], list(range(51))):
+            response = self.client.post(self.url, {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+
+
+class CompareTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.upload_dataset()
+        self.b = self.upload_dataset(csv_rows([
+            'Pump-1,Pump,150,5.2,110',
+            'Pump-2,Pump,130,5.5,95',
+            'Valve-1,Valve,60,8.2,105',
+            'Compressor-1,Compressor,200,8.5,95',
+            'Reactor-1,Reactor,150,1250,130',
+            'New-1,Valve,10,1,20',
+        ]), name='next.csv')
+
+    def compare(self, **params):
+        return self.client.get('/api/datasets/compare/', {'a': self.a.id, 'b': self.b.id, **params})
+
+    def test_changed_added_and_removed_rows(self):
+        diff = self.compare().data
+        self.assertEqual((diff['matched'], diff['changed']), (5, 2))
+        self.assertEqual(diff['added'], {'count': 1, 'names': ['New-1']})
+        self.assertEqual(diff['removed'], {'count': 1, 'names': ['HeatX-1']})
+        # largest relative change first
+        self.assertEqual([d['Equipment Name'] for d in diff['deltas']], ['Valve-1', 'Pump-1'])
+        self.assertEqual(diff['deltas'][1]['Flowrate'], {'a': 120.0, 'b': 150.0, 'delta': 30.0})
+
+    def test_sort_by_one_metric_and_limit(self):
+        diff = self.compare(sort='flowrate', limit=1).data
+        self.assertEqual([d['Equipment Name'] for d in diff['deltas']], ['Pump-1'])
+        self.assertEqual(diff['changed'], 2)
+
+    def test_type_shifts(self):
+        shifts = {s['type']: s for s in self.compare().data['type_shifts']}
+        self.assertEqual((shifts['HeatExchanger']['count_a'], shifts['HeatExchanger']['count_b']), (1, 0))
+        self.assertEqual(shifts['Valve']['count_delta'], 1)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/datasets/compare/', {'a': self.a.id}).status_code, 400)
+        self.assertEqual(self.client.get('/api/datasets/compare/', {'a': 'x', 'b': 1}).status_code, 400)
+        self.assertEqual(self.compare(sort='humidity').status_code, 400)
+        self.assertEqual(self.compare(limit=0).status_code, 400)
+
+    def test_missing_or_foreign_datasets_are_not_found(self):
+        other = User.objects.create_user('bob', password='x')
+        Dataset.objects.filter(id=self.b.id).update(owner=other)
+        self.assertEqual(self.compare().status_code, 404)
+        self.assertEqual(self.client.get('/api/datasets/compare/', {'a': self.a.id, 'b': 999}).status_code, 404)
+
+
+class AppendTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+
+    def append(self, content, dataset=None):
+        dataset = dataset or self.dataset
+        return self.client.post(f'/api/dataset/{dataset.id}/append/', {'file': SimpleUploadedFile('more.csv', content)}, format='multipart')
+
+    def test_appended_rows_are_merged_into_the_stats(self):
+        response = self.append(csv_rows(['Pump-9,Pump,300,2,140', 'Valve-9,Valve,10,1,20']))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['rows_added'], response.data['total']), (2, 8))
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.stats['type_counts']['Pump'], 3)
+        self.assertEqual(self.dataset.stats['metrics']['Flowrate']['max'], 300.0)
+        self.assertEqual(self.dataset.stats['critical_alerts'], 4)
+        rows = self.client.get(f'/api/dataset/{self.dataset.id}/data/').data
+        self.assertEqual(rows['total'], 8)
+        self.assertEqual(rows['data'][-1]['Equipment Name'], 'Valve-9')
+
+    def test_append_moves_the_validators(self):
+        url = f'/api/dataset/{self.dataset.id}/summary/'
+        before = self.client.get(url)
+        self.append(csv_rows(['Pump-9,Pump,300,2,140']))
+        after = self.client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(after.data['analytics']['total_count'], 7)
+        self.assertGreaterEqual(parse_http_date(after['Last-Modified']), parse_http_date(before['Last-Modified']))
+
+    def test_append_to_a_legacy_dataset_summarises_every_row(self):
+        legacy = self.legacy_dataset()
+        self.assertEqual(self.append(csv_rows(['Pump-9,Pump,300,2,140']), legacy).data['total'], 7)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.stats['count'], 7)
+        self.assertEqual(legacy.stats['metrics']['Flowrate']['min'], 60.0)
+
+    def test_segments_are_compacted(self):
+        with mock.patch('api.appends.MAX_SEGMENTS', 2):
+            for i in range(3):
+                self.append(csv_rows([f'Pump-{10 + i},Pump,1,1,1']))
+        self.dataset.refresh_from_db()
+        self.assertEqual(len(self.dataset.segments), 1)
+        self.assertEqual(os.listdir(default_storage.path('datasets/segments')), [os.path.basename(self.dataset.segments[0])])
+        self.assertEqual(self.client.get(f'/api/dataset/{self.dataset.id}/data/').data['total'], 9)
+
+    def test_compaction_streams_row_groups_outside_the_lock(self):
+        for i in range(3):
+            self.append(csv_rows([f'Pump-{10 + i},Pump,{i},1,1']))
+        self.dataset.refresh_from_db()
+        merging = list(self.dataset.segments)
+        late = 'datasets/segments/late.parquet'
+        shutil.copy(default_storage.path(merging[0]), default_storage.path(late))
+        merge = appends._merge
+
+        def merge_while_appending(names, merged):
+            # another append commits while the merge runs
+            Dataset.objects.filter(id=self.dataset.id).update(segments=merging + [late])
+            with mock.patch('pyarrow.parquet.read_table', side_effect=AssertionError("whole segment read")):
+                merge(names, merged)
+
+        with mock.patch('api.appends._merge', merge_while_appending):
+            self.assertTrue(appends.compact_segments(self.dataset))
+        self.dataset.refresh_from_db()
+        self.assertEqual(len(self.dataset.segments), 2)
+        self.assertEqual(self.dataset.segments[1], late)
+        self.assertEqual(pq.read_table(default_storage.path(self.dataset.segments[0])).num_rows, 3)
+        self.assertFalse(any(default_storage.exists(name) for name in merging))
+        self.assertEqual(self.client.get(f'/api/dataset/{self.dataset.id}/data/').data['total'], 10)
+
+    def test_compaction_that_lost_the_race_is_discarded(self):
+        for i in range(2):
+            self.append(csv_rows([f'Pump-{10 + i},Pump,{i},1,1']))
+        self.dataset.refresh_from_db()
+        before = list(self.dataset.segments)
+        merge = appends._merge
+
+        def merge_while_compacting(names, merged):
+            Dataset.objects.filter(id=self.dataset.id).update(segments=before[1:])
+            merge(names, merged)
+
+        with mock.patch('api.appends._merge', merge_while_compacting):
+            self.assertFalse(appends.compact_segments(self.dataset))
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.segments, before[1:])
+        self.assertEqual(sorted(os.listdir(default_storage.path('datasets/segments'))), sorted(os.path.basename(n) for n in before))
+
+    def test_bad_appends_are_rejected(self):
+        self.assertEqual(self.client.post(f'/api/dataset/{self.dataset.id}/append/', {}, format='multipart').status_code, 400)
+        response = self.append(b"Equipment Name,Type\nPump-9,Pump\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Missing required columns", response.data['error'])
+        self.assertEqual(self.append(SAMPLE_CSV, dataset=Dataset(id=999)).status_code, 404)
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.stats['count'], 6)
+
+
+class AlertRuleTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.alerts = f'/api/dataset/{self.dataset.id}/alerts/'
+
+    def create(self, **rule):
+        return self.client.post('/api/alert-rules/', rule, format='json')
+
+    def test_default_rule_matches_the_stored_critical_count(self):
+        result = self.client.get(self.alerts).data
+        self.assertEqual(result['rows'], 6)
+        self.assertEqual(result['rules'][0]['name'], 'Critical')
+        self.assertEqual(result['rules'][0]['count'], self.dataset.stats['critical_alerts'])
+        self.assertEqual(result['rules'][0]['rows'], [0, 2, 4])
+
+    def test_rule_crud(self):
+        created = self.create(name='Hot', condition={'column': 'Temperature', 'op': '>=', 'value': 110})
+        self.assertEqual(created.status_code, 201)
+        url = f"/api/alert-rules/{created.data['id']}/"
+        self.assertEqual(self.client.get('/api/alert-rules/').data['rules'][0]['name'], 'Hot')
+        self.assertEqual(self.client.patch(url, {'enabled': False}, format='json').data['enabled'], False)
+        replaced = self.client.put(url, {'name': 'Hotter', 'condition': {'column': 'Temperature', 'op': '>', 'value': 120}}, format='json')
+        self.assertEqual((replaced.status_code, replaced.data['name']), (200, 'Hotter'))
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_rules_replace_the_default(self):
+        self.create(name='Hot', condition={'column': 'Temperature', 'op': '>=', 'value': 110})
+        self.create(name='Pumps', condition={'column': 'Flowrate', 'op': 'between', 'value': [100, 200]}, equipment_type='Pump')
+        self.create(name='Off', condition={'column': 'Flowrate', 'op': '>', 'value': 0}, enabled=False)
+        rules = {r['name']: r for r in self.client.get(self.alerts).data['rules']}
+        self.assertEqual(set(rules), {'Hot', 'Pumps'})
+        self.assertEqual(rules['Hot']['rows'], [0, 4])
+        self.assertEqual(rules['Pumps']['rows'], [0, 1])
+
+    def test_override_applies_to_its_type_only(self):
+        self.create(
+            name='Pressure', condition={'column': 'Pressure', 'op': '>', 'value': 5},
+            overrides={'Reactor': {'column': 'Pressure', 'op': '>', 'value': 2000}},
+        )
+        self.assertEqual(self.client.get(self.alerts).data['rules'][0]['rows'], [0, 1, 3])
+
+    def test_invalid_rules_are_rejected(self):
+        for condition in (
+            {'column': 'Pressure', 'op': '~', 'value': 1},
+            {'column': 'Pressure', 'op': 'between', 'value': ['a', 'b']},
+            {'column': 'Pressure', 'op': 'between', 'value': [1]},
+            {'column': 'Pressure', 'op': '>', 'value': True},
+            {'all': []},
+            'Pressure > 1',
+        ):
+            response = self.create(name='Bad', condition=condition)
+            self.assertEqual(response.status_code, 400, condition)
+        self.assertEqual(self.create(condition={'column': 'Pressure', 'op': 'is_null'}).status_code, 400)
+        self.assertFalse(AlertRule.objects.exists())
+
+    def test_rule_on_a_missing_column_reports_it_without_reading_the_file(self):
+        self.create(name='Humid', condition={'column': 'Humidity', 'op': '>', 'value': 1})
+        with mock.patch('api.views.load_frame', side_effect=AssertionError("file read")):
+            result = self.client.get(self.alerts).data
+        self.assertEqual(result['rows'], 6)
+        self.assertEqual(result['rules'][0]['error'], "Unknown column: Humidity")
+
+    def test_other_users_rules_are_invisible(self):
+        rule = self.create(name='Hot', condition={'column': 'Temperature', 'op': '>', 'value': 1}).data
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('bob', password='x'))
+        self.assertEqual(other.get(f"/api/alert-rules/{rule['id']}/").status_code, 404)
+        self.assertEqual(other.delete(f"/api/alert-rules/{rule['id']}/").status_code, 404)
+        self.assertEqual(other.get(self.alerts).status_code, 404)
+
+
+class QueryTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = self.upload_dataset()
+        self.url = f'/api/dataset/{self.dataset.id}/query/'
+
+    def query(self, **body):
+        return self.client.post(self.url, body, format='json')
+
+    def test_where_select_sort_and_limit(self):
+        result = self.query(
+            where={'all': [{'column': 'Flowrate', 'op': '>=', 'value': 100}, {'column': 'Type', 'op': '!=', 'value': 'Reactor'}]},
+            select=['Equipment Name', 'Flowrate'], sort='-Flowrate', limit=2,
+        ).data
+        self.assertEqual((result['total'], result['next_offset']), (3, 2))
+        self.assertEqual(result['data'], [{'Equipment Name': 'Compressor-1', 'Flowrate': 200.0}, {'Equipment Name': 'Pump-2', 'Flowrate': 130.0}])
+
+    def test_group_by_aggregates(self):
+        result = self.query(group_by='Type', aggregates={'Flowrate': ['sum', 'count'], 'Temperature': 'max'}, sort='-count').data
+        pumps = result['data'][0]
+        self.assertEqual(pumps, {'Type': 'Pump', 'count': 2, 'Flowrate_count': 2, 'Flowrate_sum': 250.0, 'Temperature_max': 110.0})
+        self.assertEqual(sum(g['count'] for g in result['data']), 6)
+
+    def test_repeated_query_is_served_from_the_cache(self):
+        body = {'where': {'column': 'Pressure', 'op': '>', 'value': 5}}
+        self.assertFalse(self.query(**body).data['cached'])
+        with mock.patch('api.query.load_frame', side_effect=AssertionError("file read")):
+            again = self.query(**body).data
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['total'], 4)
+
+    def test_append_invalidates_cached_answers(self):
+        body = {'where': {'column': 'Type', 'op': '==', 'value': 'Pump'}}
+        self.assertEqual(self.query(**body).data['total'], 2)
+        self.client.post(f'/api/dataset/{self.dataset.id}/append/', {'file': SimpleUploadedFile('more.csv', csv_rows(['Pump-9,Pump,1,1,1']))}, format='multipart')
+        result = self.query(**body).data
+        self.assertFalse(result['cached'])
+        self.assertEqual(result['total'], 3)
+
+    def test_invalid_queries_are_rejected(self):
+        for body in (
+            {'select': ['Nope']},
+            {'where': {'column': 'Nope', 'op': '>', 'value': 1}},
+            {'group_by': 'Type', 'aggregates': {'Flowrate': ['avg']}},
+            {'aggregates': {'Flowrate': ['sum']}},
+            {'group_by': 'Type', 'select': ['Type']},
+            {'group_by': 'Type', 'sort': 'Flowrate'},
+            {'group_by': 'Type', 'aggregates': {'Equipment Name': ['mean']}},
+            {'limit': 'all'},
+            {'offset': -1},
+            {'having': {}},
+        ):
+            response = self.query(**body)
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(self.client.post('/api/dataset/999/query/', {}, format='json').status_code, 404)
+
+    def test_legacy_datasets_check_columns_against_the_file(self):
+        dataset = self.legacy_dataset()
+        self.assertIsNone(dataset.columns)
+        url = f'/api/dataset/{dataset.id}/query/'
+        for body in ({'select': ['Nope']}, {'sort': 'Nope'}, {'group_by': 'Nope'}):
+            response = self.client.post(url, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('Nope', response.data['error'])
+        self.assertEqual(self.client.post(url, {'select': ['Type']}, format='json').data['total'], 6)
+
+    def test_pandas_failures_are_reported_as_bad_queries(self):
+        with mock.patch('api.query.execute', side_effect=KeyError('Flowrate')):
+            response = self.query(sort='Flowrate')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Flowrate', response.data['error'])
+
+    def test_cache_is_bounded_by_bytes(self):
+        cache = ResultCache(max_bytes=0)
+        small = {'data': [{'a': 1}]}
+        cache.max_bytes = result_bytes(small) * 2
+        cache.put('one', small)
+        cache.put('two', small)
+        self.assertEqual(cache.stats()['entries'], 2)
+        cache.put('three', small)
+        self.assertIsNone(cache.get('one'))
+        self.assertEqual(cache.get('three'), small)
+        cache.put('big', {'data': [{'a': i} for i in range(100)]})
+        self.assertIsNone(cache.get('big'))
+        self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+
+
+class RetentionTests(DatasetTestCase):
+    def history(self, *sizes, days_apart=1):
+        # oldest first
+        now = timezone.now()
+        datasets = []
+        for i, size in enumerate(sizes):
+            dataset = self.legacy_dataset(name=f'd{i}.csv')
+            Dataset.objects.filter(id=dataset.id).update(size=size, uploaded_at=now - timedelta(days=(len(sizes) - i) * days_apart))
+            datasets.append(dataset.id)
+        return datasets
+
+    def expired(self, **limits):
+        limits = {'max_count': 0, 'max_bytes': 0, 'max_age_days': 0, **limits}
+        return sorted(d.id for d in expired_datasets(self.user, **limits))
+
+    def test_count_limit_keeps_the_newest(self):
+        ids = self.history(1, 1, 1, 1)
+        self.assertEqual(self.expired(max_count=2), ids[:2])
+
+    def test_byte_quota_evicts_oldest_first(self):
+        small_old, small, large, newest = self.history(10, 10, 100, 10)
+        self.assertEqual(self.expired(max_bytes=120), [small_old])
+        self.assertEqual(self.expired(max_bytes=50), [small_old, small, large])
+
+    def test_newest_is_kept_even_over_every_limit(self):
+        ids = self.history(500)
+        self.assertEqual(self.expired(max_count=1, max_bytes=10, max_age_days=0), [])
+        self.assertEqual(self.expired(max_age_days=1, now=timezone.now() + timedelta(days=30)), [])
+
+    def test_age_limit(self):
+        ids = self.history(1, 1, 1, days_apart=10)
+        self.assertEqual(self.expired(max_age_days=15), ids[:2])
+
+    def test_datasets_being_ingested_are_never_removed(self):
+        ids = self.history(100, 100, 100)
+        IngestJob.objects.create(dataset_id=ids[0], owner=self.user, stage=IngestJob.PARSING)
+        self.assertEqual(self.expired(max_bytes=150), [ids[1]])
+        self.assertEqual(self.expired(max_count=1), [ids[1]])
+
+    def test_upload_enforces_the_default_count(self):
+        for i in range(6):
+            self.upload_dataset(SAMPLE_CSV + f"Extra-{i},Pump,1,1,1\n".encode(), name=f'u{i}.csv')
+        names = sorted(Dataset.objects.values_list('name', flat=True))
+        self.assertEqual(names, ['u1.csv', 'u2.csv', 'u3.csv', 'u4.csv', 'u5.csv'])
+        self.assertEqual(len(os.listdir(default_storage.path('datasets'))), 10)
+
+    @override_settings(RETENTION_MAX_DATASETS=1)
+    def test_command_dry_run_lists_without_deleting(self):
+        with mock.patch('api.retention.MAX_DATASETS_PER_USER', 1):
+            ids = self.history(1, 1)
+            out = StringIO()
+            call_command('enforce_retention', '--dry-run', stdout=out)
+            self.assertIn(f"dataset {ids[0]}", out.getvalue())
+            self.assertIn("would remove 1 datasets", out.getvalue())
+            self.assertEqual(Dataset.objects.count(), 2)
+            call_command('enforce_retention', stdout=StringIO())
+        self.assertEqual(list(Dataset.objects.values_list('id', flat=True)), [ids[1]])
+
+    def test_only_old_orphans_are_removed(self):
+        kept = self.upload_dataset()
+        stray = default_storage.path(default_storage.save('datasets/stray.csv', ContentFile(b'x')))
+        fresh = default_storage.path(default_storage.save('datasets/fresh.csv', ContentFile(b'x')))
+        long_ago = time.time() - 2 * 3600
+        os.utime(stray, (long_ago, long_ago))
+        os.utime(kept.file.path, (long_ago, long_ago))
+        self.assertEqual(orphan_files(), [stray])
+        run_retention()
+        self.assertFalse(os.path.exists(stray))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(kept.file.path))
+
+
+class SchemaTests(DatasetTestCase):
+    def chunked_dataset(self, content, chunk_rows=2):
+        # parsed a couple of rows at a time, so later chunks see the schema the first chose
+        dataset = self.legacy_dataset(content)
+        stats, types = ingest_csv(dataset.file.path, chunk_rows=chunk_rows)
+        Dataset.objects.filter(id=dataset.id).update(stats=stats, column_types=types)
+        dataset.refresh_from_db()
+        return dataset
+
+    def test_metrics_are_stored_compactly(self):
+        dataset = self.upload_dataset()
+        schema = pq.read_schema(columnar_path(dataset.file.path))
+        self.assertEqual(str(schema.field('Type').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        self.assertEqual(schema.field('Flowrate').type, pa.float32())
+        self.assertIsInstance(load_frame(dataset)['Type'].dtype, pd.CategoricalDtype)
+        row = self.client.get(f'/api/dataset/{dataset.id}/data/?limit=1').data['data'][0]
+        self.assertEqual(row['Pressure'], 5.2)
+
+    def test_a_later_chunk_widens_a_float32_column(self):
+        dataset = self.chunked_dataset(csv_rows([
+            'Pump-1,Pump,1.5,2,3', 'Pump-2,Pump,2.5,2,3', 'Pump-3,Pump,123456.789,2,3', 'Pump-4,Pump,4.1,2,3',
+        ]))
+        schema = pq.read_schema(columnar_path(dataset.file.path))
+        self.assertEqual(schema.field('Flowrate').type, pa.float64())
+        self.assertEqual(schema.field('Pressure').type, pa.float32())
+        self.assertEqual(dataset.column_types['Flowrate'], 'float64')
+        rows = self.client.get(f'/api/dataset/{dataset.id}/data/').data['data']
+        self.assertEqual([r['Flowrate'] for r in rows], [1.5, 2.5, 123456.789, 4.1])
+        self.assertEqual(dataset.stats['metrics']['Flowrate']['max'], 123456.789)
+
+    def test_an_append_that_needs_more_precision_is_stored_wider(self):
+        dataset = self.upload_dataset()
+        response = self.client.post(
+            f'/api/dataset/{dataset.id}/append/',
+            {'file': SimpleUploadedFile('more.csv', csv_rows(['Pump-9,Pump,1,1234.5678,3']))}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 200)
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.column_types['Pressure'], 'float64')
+        self.assertEqual(dataset.column_types['Flowrate'], 'float32')
+        self.assertEqual(pq.read_schema(columnar_path(dataset.file.path)).field('Pressure').type, pa.float32())
+        self.assertEqual(pq.read_schema(default_storage.path(dataset.segments[0])).field('Pressure').type, pa.float64())
+        self.assertEqual(dataset.stats['metrics']['Pressure']['max'], 1250.0)
+
+        # the float32 rows read alongside keep their decimals, from the file and from the cache
+        expected = [5.2, 5.5, 4.1, 8.5, 1250.0, 3.8, 1234.5678]
+        for cached in (False, True):
+            self.assertEqual(frame_cache.peek(frame_key(dataset)) is not None, cached)
+            rows = self.client.get(f'/api/dataset/{dataset.id}/data/').data['data']
+            self.assertEqual([r['Pressure'] for r in rows], expected)
+            load_frame(dataset)
+        frame_cache.clear()
+        page = self.client.get(f'/api/dataset/{dataset.id}/data/?offset=4&limit=3&sort=Pressure').data['data']
+        self.assertEqual([r['Pressure'] for r in page], [8.5, 1234.5678, 1250.0])
+
+        # compaction writes one float64 file holding both
+        self.client.post(f'/api/dataset/{dataset.id}/append/', {'file': SimpleUploadedFile('more.csv', csv_rows(['Pump-10,Pump,1,1.1,3']))}, format='multipart')
+        dataset.refresh_from_db()
+        self.assertTrue(appends.compact_segments(dataset))
+        dataset.refresh_from_db()
+        self.assertEqual(pq.read_schema(default_storage.path(dataset.segments[0])).field('Pressure').type, pa.float64())
+        frame_cache.clear()
+        rows = self.client.get(f'/api/dataset/{dataset.id}/data/').data['data']
+        self.assertEqual([r['Pressure'] for r in rows], expected + [1.1])
+
+    def test_float32_values_leave_as_their_shortest_decimals(self):
+        values = np.array([1.1, 5.2, 123456.7, 0.001, -7.25, 3.4e38, 1e-30, 0, np.nan, np.inf], dtype='float32')
+        expected = pc.cast(pc.cast(pa.array(values), pa.string()), pa.float64()).to_numpy(zero_copy_only=False)
+        np.testing.assert_array_equal(decimal_values(values), expected)
+        self.assertEqual(metric_values(pd.Series(values[:2])).tolist(), values[:2].astype('float64').tolist())
+
+    def test_extra_columns_take_their_declared_type(self):
+        content = csv_rows(['Pump-1,Pump,1,2,3,north,0.5', 'Pump-2,Pump,1,2,3,south,0.25'], ',Site,Load')
+        dataset = self.upload_dataset(content, schema=json.dumps({'Site': 'category', 'Load': 'float32'}))
+        self.assertEqual(dataset.column_types['Site'], 'category')
+        self.assertEqual(dataset.column_types['Load'], 'float32')
+        self.assertEqual(self.upload(content, schema=json.dumps({'Type': 'string'})).status_code, 400)
+        self.assertEqual(self.upload(content, schema=json.dumps({'Site': 'int8'})).status_code, 400)
+
+    def test_ragged_rows_are_rejected_readably(self):
+        for rows, message in [
+            (['Pump-1,Pump,1,2,3,4', 'Pump-2,Pump,1,2,3'], "Rows have more fields than the header"),
+            (['Pump-1,Pump,1,2,3', 'Pump-2,Pump,1,2,3,4'], "Malformed CSV: Expected 5 fields in line 3, saw 6"),
+        ]:
+            response = self.upload(csv_rows(rows))
+            job = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+            self.assertEqual(job['stage'], 'failed')
+            self.assertIn(message, job['error'])
+
+    def test_values_that_do_not_fit_the_schema_raise_a_schema_error(self):
+        with self.assertRaisesMessage(SchemaError, "Type values can't be stored as category"):
+            conform(pa.table({'Type': [1.5]}), arrow_schema({'Type': 'category'}))
+
+
+def workbook(sheets):
+    # {title: rows} as .xlsx bytes; the first row of each sheet is its header
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+class ExcelUploadTests(DatasetTestCase):
+    HEADER = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+    ROWS = [['Pump-1', 'Pump', 120, 5.2, 110], ['Valve-1', 'Valve', 60, 4.1, 105], ['Reactor-1', 'Reactor', 150, 1250, 130]]
+
+    def test_the_first_sheet_with_the_required_columns_is_used(self):
+        content = workbook({'Notes': [['Written by'], ['ops']], 'Readings': [self.HEADER] + self.ROWS})
+        dataset = self.upload_dataset(content, name='plant.xlsx')
+        self.assertEqual(dataset.sheet, 'Readings')
+        summary = self.client.get(f'/api/dataset/{dataset.id}/summary/').data['analytics']
+        self.assertEqual(summary['total_count'], 3)
+        self.assertEqual(summary['equipment_count_by_type'], {'Pump': 1, 'Reactor': 1, 'Valve': 1})
+        rows = self.client.get(f'/api/dataset/{dataset.id}/data/').data['data']
+        self.assertEqual(rows[0]['Pressure'], 5.2)
+
+    def test_a_named_sheet_is_its_own_dataset(self):
+        content = workbook({'A': [self.HEADER] + self.ROWS, 'B': [self.HEADER] + self.ROWS[:1]})
+        first = self.upload_dataset(content, name='plant.xlsx')
+        second = self.upload_dataset(content, name='plant.xlsx', sheet='B')
+        self.assertEqual((first.sheet, second.sheet), ('A', 'B'))
+        self.assertNotEqual(first.content_hash, second.content_hash)
+        self.assertEqual(self.client.get(f'/api/dataset/{second.id}/summary/').data['analytics']['total_count'], 1)
+        # the same sheet again reuses what was parsed
+        again = self.upload_dataset(content, name='plant.xlsx', sheet='B')
+        self.assertEqual(again.file.name, second.file.name)
+
+    def test_no_matching_sheet_lists_the_sheets(self):
+        response = self.upload(workbook({'Notes': [['Written by']], 'Other': [['x', 'y']]}), name='plant.xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("No sheet has the required columns", response.data['error'])
+        self.assertEqual(response.data['sheets'], ['Notes', 'Other'])
+
+    def test_unknown_or_invalid_sheets_are_rejected(self):
+        content = workbook({'A': [self.HEADER] + self.ROWS, 'Notes': [['Written by']]})
+        response = self.upload(content, name='plant.xlsx', sheet='Missing')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['error'], response.data['sheets']), ("Unknown sheet: Missing", ['A', 'Notes']))
+        response = self.upload(content, name='plant.xlsx', sheet='Notes')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Missing required columns", response.data['error'])
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_a_corrupt_workbook_is_rejected(self):
+        response = self.upload(b'not a workbook', name='plant.xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Not a readable Excel workbook", response.data['error'])
+
+
+class CompressedUploadTests(DatasetTestCase):
+    def assertParsed(self, dataset):
+        summary = self.client.get(f'/api/dataset/{dataset.id}/summary/').data['analytics']
+        self.assertEqual((summary['total_count'], summary['critical_alerts']), (6, 3))
+        self.assertEqual(self.client.get(f'/api/dataset/{dataset.id}/data/').data['total'], 6)
+
+    def test_compressed_files_are_stored_as_sent(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('equipment.csv', SAMPLE_CSV)
+            z.writestr('__MACOSX/._equipment.csv', b'')
+        for name, content in [
+            ('equipment.csv.gz', gzip.compress(SAMPLE_CSV)),
+            ('equipment.csv.zst', zstandard.ZstdCompressor().compress(SAMPLE_CSV)),
+            ('equipment.zip', archive.getvalue()),
+        ]:
+            dataset = self.upload_dataset(content, name=name)
+            self.assertEqual(dataset.size, len(content))
+            with dataset.file.open('rb') as f:
+                self.assertEqual(f.read(), content)
+            self.assertParsed(dataset)
+
+    def test_a_gzip_encoded_body_is_kept_compressed(self):
+        content = gzip.compress(SAMPLE_CSV)
+        response = self.client.post(
+            '/api/upload-csv/', content, content_type='application/octet-stream',
+            HTTP_CONTENT_DISPOSITION='attachment; filename=equipment.csv', HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 202, response.data)
+        jobs.run_job(response.data['job_id'])
+        dataset = Dataset.objects.get(id=response.data['dataset_id'])
+        self.assertEqual(dataset.name, 'equipment.csv.gz')
+        self.assertEqual(dataset.size, len(content))
+        self.assertParsed(dataset)
+
+    def test_bad_archives_are_rejected(self):
+        two = BytesIO()
+        with zipfile.ZipFile(two, 'w') as z:
+            z.writestr('a.csv', SAMPLE_CSV)
+            z.writestr('b.csv', SAMPLE_CSV)
+        for name, content, message in [
+            ('equipment.zip', two.getvalue(), "exactly one CSV file"),
+            ('equipment.zip', b'not a zip', "Not a readable .zip file"),
+            ('equipment.csv.gz', b'not gzip', "Invalid CSV"),
+            ('equipment.csv.zst', b'not zstd', "Invalid CSV"),
+        ]:
+            response = self.upload(content, name=name)
+            self.assertEqual(response.status_code, 400, name)
+            self.assertIn(message, response.data['error'])
+        self.assertFalse(Dataset.objects.exists())
+
+
+@mock.patch('api.uploads.MIN_CHUNK_SIZE', 16)
+class ChunkedUploadTests(DatasetTestCase):
+    CHUNK = 64
+
+    def open(self, content=SAMPLE_CSV, name='equipment.csv', chunk_size=CHUNK):
+        response = self.client.post('/api/uploads/', {'name': name, 'size': len(content), 'chunk_size': chunk_size}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def put(self, session, index, data, checksum=None):
+        return self.client.put(
+            f"/api/uploads/{session['upload_id']}/chunks/{index}/", data, content_type='application/octet-stream',
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest(),
+        )
+
+    def chunks(self, content=SAMPLE_CSV):
+        return [content[i:i + self.CHUNK] for i in range(0, len(content), self.CHUNK)]
+
+    def test_chunks_in_any_order_make_a_dataset(self):
+        session = self.open()
+        chunks = self.chunks()
+        self.assertEqual((session['total_chunks'], session['missing']), (len(chunks), list(range(len(chunks)))))
+        for index in reversed(range(1, len(chunks))):
+            self.assertEqual(self.put(session, index, chunks[index]).status_code, 200)
+        status_ = self.client.get(f"/api/uploads/{session['upload_id']}/").data
+        # the job starts with the first chunk to arrive and waits for chunk 0
+        self.assertEqual((status_['missing'], status_['offset'], status_['job']['stage']), ([0], 0, 'queued'))
+
+        job_id = self.put(session, 0, chunks[0]).data['job_id']
+        self.assertEqual(job_id, status_['job_id'])
+        # a resent chunk is accepted and changes nothing
+        self.assertEqual(self.put(session, 0, chunks[0]).data['job_id'], job_id)
+        jobs.run_job(job_id)
+        response = self.client.post(f"/api/uploads/{session['upload_id']}/finalize/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['job_id'], response.data['stage']), (job_id, 'done'))
+
+        dataset = Dataset.objects.get(id=session['dataset_id'])
+        with dataset.file.open('rb') as f:
+            self.assertEqual(f.read(), SAMPLE_CSV)
+        self.assertEqual(dataset.content_hash, hashlib.sha256(SAMPLE_CSV).hexdigest())
+        self.assertEqual((dataset.stats['count'], dataset.stats['critical_alerts']), (6, 3))
+        self.assertEqual(self.client.get(f"/api/uploads/{session['upload_id']}/").data['state'], 'finalized')
+        self.assertFalse(os.path.exists(default_storage.path(f"uploads/{session['upload_id']}")))
+
+    def test_bad_chunks_are_not_stored(self):
+        session = self.open()
+        chunk = self.chunks()[0]
+        response = self.put(session, 0, chunk, checksum='0' * 64)
+        self.assertEqual((response.status_code, response.data['error']), (400, "Checksum mismatch for chunk 0"))
+        response = self.put(session, 0, chunk[:-1])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("must be 64 bytes, got 63", response.data['error'])
+        self.assertEqual(self.put(session, session['total_chunks'], chunk).status_code, 400)
+        response = self.client.put(f"/api/uploads/{session['upload_id']}/chunks/0/", chunk, content_type='application/octet-stream')
+        self.assertEqual(response.data['error'], "X-Chunk-SHA256 header is required")
+        self.assertEqual(self.client.get(f"/api/uploads/{session['upload_id']}/").data['received'], [])
+        self.assertFalse(IngestJob.objects.exists())
+
+    def test_finalize_needs_every_chunk_and_a_job(self):
+        session = self.open()
+        chunks = self.chunks()
+        self.put(session, 0, chunks[0])
+        response = self.client.post(f"/api/uploads/{session['upload_id']}/finalize/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['missing'], list(range(1, len(chunks))))
+
+        for index in range(1, len(chunks)):
+            self.put(session, index, chunks[index])
+        IngestJob.objects.all().delete()
+        response = self.client.post(f"/api/uploads/{session['upload_id']}/finalize/")
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("no ingest job", response.data['error'])
+        self.assertEqual(self.client.get(f"/api/uploads/{session['upload_id']}/").data['state'], 'open')
+        self.assertEqual(self.client.post('/api/uploads/999/finalize/').status_code, 404)
+
+    def test_abort_releases_the_dataset(self):
+        session = self.open()
+        url = f"/api/uploads/{session['upload_id']}/"
+        job_id = self.put(session, 1, self.chunks()[1]).data['job_id']
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        # the waiting parser notices and cleans up
+        jobs.run_job(job_id)
+        self.assertEqual(IngestJob.objects.get(id=job_id).error, "Invalid CSV: Upload was aborted")
+        self.assertFalse(Dataset.objects.filter(id=session['dataset_id']).exists())
+        self.assertFalse(os.path.exists(default_storage.path(f"uploads/{session['upload_id']}")))
+        self.assertEqual(self.client.delete(url).status_code, 409)
+        self.assertEqual(self.put(session, 0, self.chunks()[0]).status_code, 409)
+        self.assertEqual(self.client.post(url + 'finalize/').status_code, 409)
+
+    def test_abort_before_any_chunk_releases_the_dataset(self):
+        session = self.open()
+        self.assertEqual(self.client.delete(f"/api/uploads/{session['upload_id']}/").status_code, 204)
+        self.assertFalse(Dataset.objects.exists())
+        self.assertEqual(self.client.delete('/api/uploads/999/').status_code, 404)
+
+    def test_invalid_sessions_are_rejected(self):
+        for data, message in [
+            ({'name': 'plant.xlsx', 'size': 10}, "Chunked uploads take"),
+            ({'name': 'equipment.csv', 'size': 0}, "size must be positive"),
+            ({'name': 'equipment.csv', 'size': 'ten'}, "must be integers"),
+            ({'name': 'equipment.csv', 'size': 10, 'chunk_size': 1}, "chunk_size must be between"),
+            ({'name': 'equipment.csv', 'size': 10, 'schema': {'Type': 'string'}}, "Invalid schema"),
+            ({'size': 10}, "name is required"),
+        ]:
+            response = self.client.post('/api/uploads/', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+            self.assertIn(message, response.data['error'])
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_an_idle_upload_fails_its_job(self):
+        session = self.open()
+        job_id = self.put(session, 0, self.chunks()[0]).data['job_id']
+        with mock.patch('api.uploads.IDLE_TIMEOUT', 0), mock.patch('api.uploads.POLL_SECONDS', 0):
+            jobs.run_job(job_id)
+        job = IngestJob.objects.get(id=job_id)
+        self.assertEqual(job.stage, IngestJob.FAILED)
+        self.assertIn("timed out waiting for chunk 1", job.error)
+        self.assertFalse(Dataset.objects.filter(id=session['dataset_id']).exists())
+        response = self.put(session, 1, self.chunks()[1])
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("timed out", response.data['error'])
+
+    def test_upload_jobs_run_on_their_own_threads(self):
+        session = self.open()
+        with mock.patch.object(jobs.executor, 'submit') as ingest, mock.patch.object(jobs.upload_executor, 'submit') as upload, \
+                self.captureOnCommitCallbacks(execute=True):
+            job_id = self.put(session, 0, self.chunks()[0]).data['job_id']
+        upload.assert_called_once_with(jobs.run_job, job_id)
+        ingest.assert_not_called()
+
+        with mock.patch.object(jobs.executor, 'submit') as ingest, mock.patch.object(jobs.upload_executor, 'submit') as upload, \
+                self.captureOnCommitCallbacks(execute=True):
+            job_id = self.upload().data['job_id']
+        ingest.assert_called_once_with(jobs.run_job, job_id)
+        upload.assert_not_called()
+
+    def test_worker_hands_uploads_to_their_own_threads(self):
+        session = self.open()
+        for index, chunk in enumerate(self.chunks()):
+            upload_job = self.put(session, index, chunk).data['job_id']
+        other_job = self.client.post('/api/upload-csv/', {'file': SimpleUploadedFile('other.csv', SAMPLE_CSV + b"X,Pump,1,1,1\n")}, format='multipart').data['job_id']
+        handed = []
+
+        def submit(fn, job_id):
+            handed.append(job_id)
+            future = Future()
+            future.set_result(fn(job_id))
+            return future
+
+        out = StringIO()
+        with mock.patch.object(jobs.upload_executor, 'submit', side_effect=submit):
+            call_command('ingest_worker', '--once', '--retention-interval', '0', stdout=out)
+        self.assertEqual(handed, [upload_job])
+        self.assertIn(f"job {upload_job}: done", out.getvalue())
+        self.assertIn(f"job {other_job}: done", out.getvalue())
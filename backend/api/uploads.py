@@ -0,0 +1,225 @@
+import hashlib
+import io
+import os
+import shutil
+import time
+import uuid
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from .models import Dataset, IngestJob, UploadSession
+from .compression import open_stream
+from .ingest import _track, read_csv_chunks, validate_header, write_chunks
+
+# Resumable uploads: the client opens a session, PUTs numbered chunks (in any order,
+# retrying freely) and finalizes. Parsing starts with the first chunk: the ingest job
+# reads the contiguous run of chunks received so far, assembling the stored file and
+# its hash on the way, and waits for the next chunk when it catches up.
+UPLOAD_DIR = 'uploads'
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# the parser gives up on a session that sends nothing for this long
+IDLE_TIMEOUT = getattr(settings, 'UPLOAD_IDLE_TIMEOUT', 600)
+POLL_SECONDS = 0.2
+# formats that can be parsed front to back; workbooks and zips need the whole file
+STREAMABLE = ('.csv', '.csv.gz', '.csv.zst')
+
+
+class UploadError(ValueError):
+    pass
+
+
+def part_dir(session):
+    return default_storage.path(f"{UPLOAD_DIR}/{session.id}")
+
+
+def part_path(session, index):
+    return os.path.join(part_dir(session), f"{index}.part")
+
+
+def open_session(owner, name, size, chunk_size=DEFAULT_CHUNK_SIZE, types=None):
+    if not name.lower().endswith(STREAMABLE):
+        raise UploadError(f"Chunked uploads take {', '.join(STREAMABLE)} files; post other formats to upload-csv/")
+    if size <= 0:
+        raise UploadError("size must be positive")
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise UploadError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+
+    # the dataset row and its file name are reserved now; the file fills in as chunks are parsed
+    stored = default_storage.save(f"datasets/{os.path.basename(name)}", ContentFile(b''))
+    dataset = Dataset.objects.create(name=name, file=stored, owner=owner, size=size, column_types=types)
+    return UploadSession.objects.create(owner=owner, dataset=dataset, name=name, size=size, chunk_size=chunk_size)
+
+
+def received_chunks(session):
+    present = set()
+    directory = part_dir(session)
+    if os.path.isdir(directory):
+        present = {int(n[:-len('.part')]) for n in os.listdir(directory) if n.endswith('.part')}
+    return sorted(present | set(range(session.consumed)))
+
+
+def contiguous_bytes(session, received):
+    # bytes from the start of the file the server holds without a gap
+    index = 0
+    for i in received:
+        if i != index:
+            break
+        index += 1
+    return sum(session.chunk_length(i) for i in range(index))
+
+
+def save_chunk(session, index, body, checksum):
+    """Store chunk index from the file-like body once its length and SHA-256 match."""
+    if not 0 <= index < session.total_chunks:
+        raise UploadError(f"index must be between 0 and {session.total_chunks - 1}")
+    if index < session.consumed:
+        # a retry of a chunk that has already been parsed
+        return
+    os.makedirs(part_dir(session), exist_ok=True)
+    tmp = part_path(session, index) + f".{uuid.uuid4().hex}.tmp"
+    digest = hashlib.sha256()
+    length = 0
+    try:
+        with open(tmp, 'wb') as out:
+            for block in iter(lambda: body.read(1024 * 1024), b''):
+                digest.update(block)
+                length += len(block)
+                out.write(block)
+        if length != session.chunk_length(index):
+            raise UploadError(f"Chunk {index} must be {session.chunk_length(index)} bytes, got {length}")
+        if digest.hexdigest() != (checksum or '').lower():
+            raise UploadError(f"Checksum mismatch for chunk {index}")
+        os.replace(tmp, part_path(session, index))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def start_job(session):
+    """The session's ingest job, created with the first chunk. Returns (job, created)."""
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(id=session.id)
+        if locked.job_id is not None or locked.dataset_id is None:
+            return locked.job, False
+        locked.job = IngestJob.objects.create(dataset_id=locked.dataset_id, owner_id=locked.owner_id)
+        locked.save(update_fields=['job', 'updated_at'])
+        return locked.job, True
+
+
+def abort_session(session):
+    UploadSession.objects.filter(id=session.id).update(state=UploadSession.ABORTED, updated_at=timezone.now())
+    if session.job_id is None:
+        # nothing is parsing yet, so nothing else will clean up
+        from .retention import release_dataset
+        if session.dataset is not None:
+            release_dataset(session.dataset)
+        shutil.rmtree(part_dir(session), ignore_errors=True)
+
+
+class ChunkReader(io.RawIOBase):
+    """The session's chunks in order as one stream, waiting for chunks not yet sent.
+    Bytes read are copied to dest and hashed."""
+
+    def __init__(self, session, dest):
+        self.session = session
+        self.dest = dest
+        self.digest = hashlib.sha256()
+        self.position = 0
+        self.index = session.consumed
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def _wait_for(self, index):
+        path = part_path(self.session, index)
+        deadline = time.monotonic() + IDLE_TIMEOUT
+        polls = 0
+        while not os.path.exists(path):
+            if polls % 5 == 0:
+                state = UploadSession.objects.filter(id=self.session.id).values_list('state', flat=True).first()
+                if state in (None, UploadSession.ABORTED):
+                    raise UploadError("Upload was aborted")
+            if time.monotonic() > deadline:
+                raise UploadError(f"Upload timed out waiting for chunk {index}")
+            polls += 1
+            time.sleep(POLL_SECONDS)
+        return open(path, 'rb')
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if self.index >= self.session.total_chunks:
+                    return 0
+                self.current = self._wait_for(self.index)
+            n = self.current.readinto(buffer)
+            if n:
+                data = memoryview(buffer)[:n]
+                self.dest.write(data)
+                self.digest.update(data)
+                self.position += n
+                return n
+            self.current.close()
+            self.current = None
+            UploadSession.objects.filter(id=self.session.id).update(consumed=self.index + 1, updated_at=timezone.now())
+            os.remove(part_path(self.session, self.index))
+            self.index += 1
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def _validated(chunks):
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            validate_header(list(chunk.columns))
+        yield chunk
+
+
+def ingest_upload(session, progress=None):
+    """Parse a chunked upload as it arrives. Returns the stats and column types."""
+    dataset = session.dataset
+    path = dataset.file.path
+    try:
+        with open(path, 'wb') as dest, ChunkReader(session, dest) as raw:
+            stream = io.BufferedReader(raw, 1024 * 1024)
+            with open_stream(stream, session.name) as text, read_csv_chunks(text, types=dataset.column_types) as reader:
+                chunks = _validated(reader)
+                stats, types = write_chunks(_track(chunks, raw, progress) if progress else chunks, path, dataset.column_types)
+            # whatever the parser left unread (a compressed trailer) still belongs to the file
+            while stream.read(1024 * 1024):
+                pass
+    finally:
+        shutil.rmtree(part_dir(session), ignore_errors=True)
+    dataset.content_hash = raw.digest.hexdigest()
+    Dataset.objects.filter(id=dataset.id).update(content_hash=dataset.content_hash, size=raw.position)
+    # every chunk has been read, so the session is complete whether or not the client finalized
+    UploadSession.objects.filter(id=session.id).update(state=UploadSession.FINALIZED, updated_at=timezone.now())
+    return stats, types
+
+
+def serialize_session(session, received=None):
+    received = received_chunks(session) if received is None else received
+    return {
+        "upload_id": session.id,
+        "dataset_id": session.dataset_id,
+        "name": session.name,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        "received": received,
+        "missing": sorted(set(range(session.total_chunks)) - set(received)),
+        "offset": contiguous_bytes(session, received),
+        "state": session.state,
+        "job_id": session.job_id,
+    }
@@ -1,13 +1,35 @@
 from django.urls import path
-from .views import UploadCSVView, DatasetSummaryView, DatasetRawDataView, DatasetPDFView, DatasetListView, SignupView, LoginView
+from .async_views import AsyncDatasetSummaryView, AsyncDatasetRawDataView, AsyncDatasetChartView
+from .views import UploadCSVView, DatasetSummaryView, DatasetRawDataView, DatasetPDFView, DatasetChartView, DatasetListView, DatasetSummariesView, DatasetCompareView, DatasetAppendView, CacheStatsView, IngestJobView, UploadSessionListView, UploadSessionView, UploadChunkView, UploadFinalizeView, AlertRuleListView, AlertRuleDetailView, DatasetAlertsView, DatasetQueryView, SignupView, LoginView, TokenRefreshView, LogoutView
 
 # API endpoints for datasets
 urlpatterns = [
     path('signup/', SignupView.as_view(), name='signup'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('upload-csv/', UploadCSVView.as_view(), name='upload-csv'),
+    path('jobs/<int:id>/', IngestJobView.as_view(), name='ingest-job'),
+    # resumable chunked uploads
+    path('uploads/', UploadSessionListView.as_view(), name='upload-sessions'),
+    path('uploads/<int:id>/', UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<int:id>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<int:id>/finalize/', UploadFinalizeView.as_view(), name='upload-finalize'),
     path('datasets/', DatasetListView.as_view(), name='dataset-list'),
+    path('datasets/summaries/', DatasetSummariesView.as_view(), name='dataset-summaries'),
+    path('datasets/compare/', DatasetCompareView.as_view(), name='dataset-compare'),
     path('dataset/<int:id>/summary/', DatasetSummaryView.as_view(), name='dataset-summary'),
     path('dataset/<int:id>/data/', DatasetRawDataView.as_view(), name='dataset-raw-data'),
+    path('dataset/<int:id>/chart/<str:metric>/', DatasetChartView.as_view(), name='dataset-chart'),
+    path('dataset/<int:id>/append/', DatasetAppendView.as_view(), name='dataset-append'),
+    path('dataset/<int:id>/query/', DatasetQueryView.as_view(), name='dataset-query'),
+    path('dataset/<int:id>/alerts/', DatasetAlertsView.as_view(), name='dataset-alerts'),
+    path('alert-rules/', AlertRuleListView.as_view(), name='alert-rules'),
+    path('alert-rules/<int:id>/', AlertRuleDetailView.as_view(), name='alert-rule'),
     path('dataset/<int:id>/pdf/', DatasetPDFView.as_view(), name='dataset-pdf'),
+    # async variants for ASGI deployments
+    path('async/dataset/<int:id>/summary/', AsyncDatasetSummaryView.as_view(), name='async-dataset-summary'),
+    path('async/dataset/<int:id>/data/', AsyncDatasetRawDataView.as_view(), name='async-dataset-raw-data'),
+    path('async/dataset/<int:id>/chart/<str:metric>/', AsyncDatasetChartView.as_view(), name='async-dataset-chart'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
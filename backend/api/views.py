@@ -1,11 +1,34 @@
+import io
+import json
+import pandas as pd
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Dataset
+from rest_framework.settings import api_settings
+from rest_framework.parsers import MultiPartParser, FormParser, FileUploadParser
+from .models import Dataset, IngestJob, AlertRule, UploadSession
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-import pandas as pd
-import os
+from django.http import StreamingHttpResponse, FileResponse
+from .storage import read_rows, file_digest, load_frame
+from .query import run_query
+from .rows import STREAM_TYPES, parse_row_query, check_stream_query, stream_rows
+from .analytics import ensure_stats, ensure_stats_many, summarize, metric_mean
+from .renderers import ArrowStreamRenderer, MessagePackRenderer
+from .charts import METRIC_COLUMNS, DEFAULT_POINTS, MAX_POINTS, DEFAULT_BINS, UnknownMetric, build_series
+from .ingest import REQUIRED_COLUMNS, SchemaError, read_header, validate_header
+from .excel import SheetError, is_excel, pick_sheet, sheet_hash
+from .compression import ArchiveError, compression_of
+from .schema import parse_types
+from .jobs import enqueue, serialize_job, pending_job, request_report
+from .uploads import DEFAULT_CHUNK_SIZE, UploadError, abort_session, open_session, received_chunks, save_chunk, serialize_session, start_job
+from .cache import frame_cache
+from .conditional import API_VERSION, conditional_dataset, dataset_conditional, get_owned_dataset
+from .reports import TEMPLATE_VERSION, open_report
+from .appends import append_rows
+from .compare import DEFAULT_LIMIT as COMPARE_LIMIT, MAX_LIMIT as COMPARE_MAX_LIMIT, compare_datasets
+from .rules import DEFAULT_RULE, RuleError, clean_rule, compile_condition, compile_rule, evaluate_rules, referenced_columns, serialize_rule
+from .authentication import SignedTokenAuthentication, issue_token, revoke_token
 
 class SignupView(APIView):
     permission_classes = [] 
@@ -35,66 +58,231 @@ class LoginView(APIView):
 
         user = authenticate(username=username, password=password)
         if user is not None:
-            return Response({"message": "Login successful", "username": user.username})
+            return Response({"message": "Login successful", "username": user.username, **issue_token(user)})
         else:
             return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
 
-from rest_framework.permissions import IsAuthenticated
+class TokenRefreshView(APIView):
+    authentication_classes = [SignedTokenAuthentication]
+
+    def post(self, request):
+        # rotate: the presented token stops working once its replacement is issued
+        token = issue_token(request.user)
+        revoke_token(request.auth)
+        return Response({"username": request.user.username, **token})
+
+class LogoutView(APIView):
+    authentication_classes = [SignedTokenAuthentication]
+
+    def post(self, request):
+        if request.auth:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 class UploadCSVView(APIView):
     permission_classes = [IsAuthenticated]
-    REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+    # a raw body (with Content-Disposition: attachment; filename=...) is taken as the file
+    parser_classes = [MultiPartParser, FormParser, FileUploadParser]
 
     def post(self, request):
         uploaded_file = request.FILES.get('file')
         if not uploaded_file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
- 
-        try:
-            df = pd.read_csv(uploaded_file)
-            
-            
-            missing = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
-            if missing:
-                return Response(
-                    {"error": f"Invalid Schema. Missing required columns: {', '.join(missing)}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip' and compression_of(uploaded_file.name) is None:
+            # a gzip-encoded body is kept compressed, like an uploaded .csv.gz
+            uploaded_file.name += '.gz'
+
+        # only the header line is read before the schema is accepted or rejected
+        sheet = ''
+        try:
+            if is_excel(uploaded_file.name):
+                sheet, header = pick_sheet(uploaded_file, request.data.get('sheet') or request.query_params.get('sheet'), REQUIRED_COLUMNS)
+            else:
+                header = read_header(uploaded_file, uploaded_file.name)
+            validate_header(header)
+        except SheetError as e:
+            return Response({"error": str(e), "sheets": e.sheets}, status=status.HTTP_400_BAD_REQUEST)
+        except (SchemaError, ArchiveError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"Invalid CSV: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        dataset = Dataset.objects.create(name=uploaded_file.name, file=uploaded_file, owner=request.user)
-        dataset.save()
+        # optional types for extra columns: {"Vendor": "category", "Rating": "float32"}
+        types = None
+        if request.data.get('schema'):
+            try:
+                types = parse_types(json.loads(request.data['schema']))
+            except ValueError as e:
+                return Response({"error": f"Invalid schema: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_hash = file_digest(uploaded_file.chunks())
+        if sheet:
+            content_hash = sheet_hash(content_hash, sheet)
+
+        # identical content already stored and parsed: point at the same blob and
+        # reuse its derived artifacts instead of parsing again
+        existing = Dataset.objects.filter(content_hash=content_hash, stats__isnull=False).first()
+        if existing and existing.file.storage.exists(existing.file.name):
+            dataset = Dataset.objects.create(
+                name=uploaded_file.name,
+                file=existing.file.name,
+                owner=request.user,
+                size=existing.size,
+                content_hash=content_hash,
+                stats=existing.stats,
+                columns=existing.columns,
+                column_types=existing.column_types,
+                sheet=existing.sheet,
+            )
+        else:
+            dataset = Dataset.objects.create(
+                name=uploaded_file.name,
+                file=uploaded_file,
+                owner=request.user,
+                size=uploaded_file.size,
+                content_hash=content_hash,
+                column_types=types,
+                sheet=sheet,
+            )
 
-        user_datasets = Dataset.objects.filter(owner=request.user).order_by('-uploaded_at')
-        if user_datasets.count() > 5:
-            for old_dataset in user_datasets[5:]:
-                if os.path.exists(old_dataset.file.path):
-                    os.remove(old_dataset.file.path)
-                old_dataset.delete()
+        # parsing and retention run on the ingest queue; poll the job for progress
+        job = IngestJob.objects.create(dataset=dataset, owner=request.user)
+        enqueue(job)
 
         return Response({
-            "message": "CSV uploaded and parsed successfully",
-            "dataset_id": dataset.id,
-            "columns": list(df.columns)
-        }, status=status.HTTP_201_CREATED)
+            "message": "CSV uploaded, processing started",
+            **serialize_job(job),
+        }, status=status.HTTP_202_ACCEPTED)
 
-class DatasetSummaryView(APIView):
+class IngestJobView(APIView):
     permission_classes = [IsAuthenticated]
+
     def get(self, request, id):
         try:
-            dataset = Dataset.objects.get(id=id, owner=request.user)
-            df = pd.read_csv(dataset.file.path)
+            job = IngestJob.objects.get(id=id, owner=request.user)
+        except IngestJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_job(job))
+
+def get_owned_session(request, id):
+    return UploadSession.objects.select_related('dataset').get(id=id, owner=request.user)
+
+class UploadSessionListView(APIView):
+    """Open a resumable upload: {"name", "size", "chunk_size"?, "schema"?}. Chunks then
+    go to uploads/<id>/chunks/<index>/ and parsing starts with the first one."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        name = request.data.get('name')
+        if not isinstance(name, str) or not name:
+            return Response({"error": "name is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            size = int(request.data.get('size'))
+            chunk_size = int(request.data.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response({"error": "size and chunk_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = None
+        schema = request.data.get('schema')
+        if schema:
+            try:
+                types = parse_types(json.loads(schema) if isinstance(schema, str) else schema)
+            except ValueError as e:
+                return Response({"error": f"Invalid schema: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = open_session(request.user, name, size, chunk_size, types)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serialize_session(session, []), status=status.HTTP_201_CREATED)
+
+class UploadSessionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        # what the server holds, so an interrupted client knows which chunks to resend
+        try:
+            session = get_owned_session(request, id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        payload = serialize_session(session)
+        payload["job"] = serialize_job(session.job) if session.job_id else None
+        return Response(payload)
+
+    def delete(self, request, id):
+        try:
+            session = get_owned_session(request, id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.state != UploadSession.OPEN:
+            return Response({"error": f"Upload is already {session.state}"}, status=status.HTTP_409_CONFLICT)
+        abort_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadChunkView(APIView):
+    """PUT one chunk as the raw request body, with its SHA-256 in X-Chunk-SHA256.
+    Chunks may arrive in any order and be resent; a chunk is stored only if it verifies."""
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, id, index):
+        try:
+            session = get_owned_session(request, id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.state != UploadSession.OPEN or session.dataset_id is None:
+            job = session.job
+            error = job.error if job and job.stage == IngestJob.FAILED else f"Upload is {session.state}"
+            return Response({"error": error}, status=status.HTTP_409_CONFLICT)
+        checksum = request.headers.get('X-Chunk-SHA256')
+        if not checksum:
+            return Response({"error": "X-Chunk-SHA256 header is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            save_chunk(session, index, request.stream or io.BytesIO(), checksum)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job, created = start_job(session)
+        if created:
+            enqueue(job)
+        return Response({"upload_id": session.id, "index": index, "job_id": job.id if job else None})
 
-            analytics = {
-                "total_count": len(df),
-                "avg_flowrate": round(df['Flowrate'].mean(), 2) if 'Flowrate' in df.columns else 0,
-                "avg_pressure": round(df['Pressure'].mean(), 2) if 'Pressure' in df.columns else 0,
-                "max_temperature": df['Temperature'].max() if 'Temperature' in df.columns else 0,
-                "critical_alerts": len(df[(df['Pressure'] > 1200) | (df['Temperature'] > 100)]) if 'Pressure' in df.columns and 'Temperature' in df.columns else 0, 
-                "equipment_count_by_type": df['Type'].value_counts().to_dict() if 'Type' in df.columns else {}
-            }
+class UploadFinalizeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, id):
+        try:
+            session = get_owned_session(request, id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.state == UploadSession.ABORTED:
+            return Response({"error": "Upload was aborted"}, status=status.HTTP_409_CONFLICT)
+
+        received = received_chunks(session)
+        missing = sorted(set(range(session.total_chunks)) - set(received))
+        if session.state == UploadSession.OPEN and missing:
+            return Response({"error": "Chunks are missing", "missing": missing}, status=status.HTTP_409_CONFLICT)
+        # parsing has been running since the first chunk; poll the job as for upload-csv/
+        job = IngestJob.objects.filter(id=session.job_id).first()
+        if job is None:
+            # the dataset (and with it the job) was removed before parsing could finish
+            return Response({"error": "Upload has no ingest job; start a new upload"}, status=status.HTTP_409_CONFLICT)
+        UploadSession.objects.filter(id=session.id, state=UploadSession.OPEN).update(state=UploadSession.FINALIZED)
+
+        return Response({
+            "message": "Upload complete, processing",
+            **serialize_job(job),
+        }, status=status.HTTP_202_ACCEPTED)
+
+class DatasetSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+    @conditional_dataset
+    def get(self, request, id):
+        try:
+            dataset = get_owned_dataset(request, id)
+            analytics = summarize(ensure_stats(dataset))
 
             return Response({
                 "dataset_id": dataset.id,
@@ -108,51 +296,308 @@ class DatasetSummaryView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class DatasetRawDataView(APIView):
+class DatasetSummariesView(APIView):
     permission_classes = [IsAuthenticated]
+    MAX_IDS = 50
+
+    def post(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "ids must be a non-empty list of dataset ids"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(int(i) for i in ids))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.MAX_IDS:
+            return Response({"error": f"At most {self.MAX_IDS} ids per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        datasets = {d.id: d for d in Dataset.objects.filter(owner=request.user, id__in=ids)}
+        pending = set(
+            IngestJob.objects.filter(dataset_id__in=[d.id for d in datasets.values() if d.stats is None], stage__in=IngestJob.ACTIVE_STAGES)
+            .values_list('dataset_id', flat=True)
+        )
+        errors = ensure_stats_many([d for d in datasets.values() if d.id not in pending])
+
+        results = []
+        for id in ids:
+            dataset = datasets.get(id)
+            if dataset is None:
+                results.append({"dataset_id": id, "error": "Dataset not found"})
+            elif id in pending:
+                results.append({"dataset_id": id, "error": "Dataset is still being processed"})
+            elif id in errors:
+                results.append({"dataset_id": id, "error": errors[id]})
+            else:
+                results.append({"dataset_id": id, "name": dataset.name, "analytics": summarize(dataset.stats)})
+        return Response({"results": results})
+
+class DatasetCompareView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            a, b = int(request.query_params['a']), int(request.query_params['b'])
+            limit = min(int(request.query_params.get('limit', COMPARE_LIMIT)), COMPARE_MAX_LIMIT)
+        except (KeyError, ValueError):
+            return Response({"error": "a and b must be dataset ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        sort = request.query_params.get('sort')
+        if sort is not None:
+            sort = METRIC_COLUMNS.get(sort.lower())
+            if sort is None:
+                return Response({"error": f"sort must be one of: {', '.join(METRIC_COLUMNS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        datasets = {d.id: d for d in Dataset.objects.filter(owner=request.user, id__in=[a, b])}
+        if a not in datasets or b not in datasets:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        for dataset in datasets.values():
+            if pending_job(dataset) is not None:
+                return Response({"error": "Dataset is still being processed", "dataset_id": dataset.id}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            diff = compare_datasets(datasets[a], datasets[b], limit, sort)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "a": {"dataset_id": a, "name": datasets[a].name},
+            "b": {"dataset_id": b, "name": datasets[b].name},
+            "limit": limit,
+            **diff
+        })
+
+class DatasetAppendView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, id):
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            dataset = Dataset.objects.get(id=id, owner=request.user)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        if pending_job(dataset) is not None:
+            return Response({"error": "Dataset is still being processed"}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            rows = append_rows(dataset, uploaded_file)
+        except SchemaError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": f"Invalid CSV: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "Rows appended successfully",
+            "dataset_id": dataset.id,
+            "rows_added": rows,
+            "total": dataset.stats["count"],
+            "content_hash": dataset.content_hash,
+        })
+
+class AlertRuleListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rules = AlertRule.objects.filter(owner=request.user).order_by('id')
+        return Response({"rules": [serialize_rule(r) for r in rules]})
+
+    def post(self, request):
+        try:
+            fields = clean_rule(request.data)
+        except RuleError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rule = AlertRule.objects.create(owner=request.user, **fields)
+        return Response(serialize_rule(rule), status=status.HTTP_201_CREATED)
+
+class AlertRuleDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_rule(self, request, id):
+        return AlertRule.objects.filter(id=id, owner=request.user).first()
+
+    def get(self, request, id):
+        rule = self.get_rule(request, id)
+        if rule is None:
+            return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_rule(rule))
+
+    def put(self, request, id, partial=False):
+        rule = self.get_rule(request, id)
+        if rule is None:
+            return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            fields = clean_rule(request.data, partial=partial)
+        except RuleError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        for name, value in fields.items():
+            setattr(rule, name, value)
+        rule.save()
+        return Response(serialize_rule(rule))
+
+    def patch(self, request, id):
+        return self.put(request, id, partial=True)
+
+    def delete(self, request, id):
+        deleted, _ = AlertRule.objects.filter(id=id, owner=request.user).delete()
+        if not deleted:
+            return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class DatasetAlertsView(APIView):
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 5000
+
     def get(self, request, id):
+        try:
+            limit = min(int(request.query_params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
         try:
             dataset = Dataset.objects.get(id=id, owner=request.user)
-            df = pd.read_csv(dataset.file.path)
-            data = df.to_dict(orient='records')
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        if pending_job(dataset) is not None:
+            return Response({"error": "Dataset is still being processed"}, status=status.HTTP_409_CONFLICT)
+
+        rules = [compile_rule(r) for r in AlertRule.objects.filter(owner=request.user, enabled=True).order_by('id')]
+        if not rules:
+            rules = [{"name": DEFAULT_RULE["name"], "condition": compile_condition(DEFAULT_RULE["condition"])}]
+
+        # read only the columns some rule refers to, in one pass for all rules
+        wanted = set()
+        for rule in rules:
+            for node in [rule["condition"], *rule.get("overrides", {}).values()]:
+                referenced_columns(node, wanted)
+            if rule.get("overrides") or rule.get("equipment_type"):
+                wanted.add('Type')
+        columns = [c for c in (dataset.columns or []) if c in wanted]
+        try:
+            if columns or dataset.columns is None:
+                frame = load_frame(dataset, columns=columns or None)
+            else:
+                # no rule refers to a stored column, so each just reports its unknown
+                # column; the row count comes from the stored stats, not the file
+                frame = pd.DataFrame(index=pd.RangeIndex(ensure_stats(dataset)['count']))
+            results = evaluate_rules(frame, rules, max(limit, 0))
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"dataset_id": dataset.id, "rows": len(frame), "rules": results})
+
+class DatasetQueryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, id):
+        try:
+            dataset = Dataset.objects.get(id=id, owner=request.user)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        if pending_job(dataset) is not None:
+            return Response({"error": "Dataset is still being processed"}, status=status.HTTP_409_CONFLICT)
+        try:
+            result, cached = run_query(dataset, request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"dataset_id": dataset.id, "cached": cached, **result})
+
+class DatasetRawDataView(APIView):
+    permission_classes = [IsAuthenticated]
+    BINARY_FORMATS = ('arrow', 'msgpack')
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [ArrowStreamRenderer, MessagePackRenderer]
+
+    @conditional_dataset
+    def get(self, request, id):
+        try:
+            dataset = get_owned_dataset(request, id)
+
+            offset, limit, columns, sort, descending = parse_row_query(request.query_params, dataset.columns)
+
+            mode = request.query_params.get('stream')
+            if mode:
+                check_stream_query(mode, offset, limit, sort)
+                return StreamingHttpResponse(stream_rows(dataset, columns, mode), content_type=STREAM_TYPES[mode])
+
+            table, total = read_rows(dataset, offset, limit, columns, sort, descending)
+            end = offset + table.num_rows
+            next_offset = end if end < total else None
+
+            # Accept: application/vnd.apache.arrow.stream or application/msgpack get columnar
+            # buffers; paging metadata travels in headers
+            if request.accepted_renderer.format in self.BINARY_FORMATS:
+                return Response(table, headers={
+                    "X-Total-Count": str(total),
+                    "X-Next-Offset": "" if next_offset is None else str(next_offset),
+                })
 
             return Response({
                 "dataset_id": dataset.id,
                 "name": dataset.name,
-                "data": data
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "next_offset": next_offset,
+                "columns": table.column_names,
+                "data": table.to_pylist()
+            })
+
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class DatasetChartView(APIView):
+    permission_classes = [IsAuthenticated]
+    @conditional_dataset
+    def get(self, request, id, metric):
+        try:
+            dataset = get_owned_dataset(request, id)
+            metric = metric.lower()
+            if metric == 'type':
+                ensure_stats(dataset)
+            kind, series = build_series(
+                dataset, metric,
+                kind=request.query_params.get('kind'),
+                points=min(int(request.query_params.get('points', DEFAULT_POINTS)), MAX_POINTS),
+                bins=int(request.query_params.get('bins', DEFAULT_BINS)),
+            )
+
+            return Response({
+                "dataset_id": dataset.id,
+                "metric": metric,
+                "kind": kind,
+                "points": len(series["values"]),
+                **series
             })
 
         except Dataset.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        except UnknownMetric as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class DatasetPDFView(APIView):
     permission_classes = [IsAuthenticated]
+    @dataset_conditional(f"{API_VERSION}.{TEMPLATE_VERSION}")
     def get(self, request, id):
         try:
-            dataset = Dataset.objects.get(id=id, owner=request.user)
-            df = pd.read_csv(dataset.file.path)
-            
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{dataset.name}_report.pdf"'
-            
-            p = canvas.Canvas(response, pagesize=letter)
-            width, height = letter
-            
-            p.setFont("Helvetica-Bold", 16)
-            p.drawString(50, height - 50, f"Equipment Report: {dataset.name}")
-            
-            p.setFont("Helvetica", 12)
-            p.drawString(50, height - 80, f"Total Records: {len(df)}")
-            p.drawString(50, height - 100, f"Generated for: {request.user.username}")
-            
-            
-            
-            p.showPage()
-            p.save()
-            return response
+            dataset = get_owned_dataset(request, id)
+            ensure_stats(dataset)
+            if not dataset.content_hash:
+                return Response({"error": "Dataset has no content hash yet; run backfill_summaries"}, status=status.HTTP_409_CONFLICT)
+
+            # rendered once per content by a report job; until it is ready the client
+            # polls the job, as for an upload
+            report = open_report(dataset)
+            if report is None:
+                job = request_report(dataset)
+                return Response({"message": "Report is being rendered", **serialize_job(job)}, status=status.HTTP_202_ACCEPTED, headers={"Retry-After": "2"})
+            return FileResponse(report, as_attachment=True, filename=f"{dataset.name}_report.pdf", content_type='application/pdf')
 
         except Dataset.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -165,26 +610,32 @@ class DatasetListView(APIView):
         datasets = Dataset.objects.filter(owner=request.user).order_by('-uploaded_at')[:5]
         data = []
         for d in datasets:
-            summary_text = "Summary unavailable."
-            try:
-                df = pd.read_csv(d.file.path)
-                total = len(df)
-                types = len(df['Type'].unique()) if 'Type' in df.columns else 0
-                avg_flow = round(df['Flowrate'].mean(), 1) if 'Flowrate' in df.columns else 0
-                avg_press = round(df['Pressure'].mean(), 1) if 'Pressure' in df.columns else 0
-                
+            stats = d.stats
+            if stats is None:
+                summary_text = "File processing pending or unavailable."
+            else:
                 summary_text = (
-                    f"Dataset contains {total} records across {types} unique equipment types. "
-                    f"Key averages include {avg_flow} m³/h Flowrate and {avg_press} PSI Pressure. "
+                    f"Dataset contains {stats['count']} records across {len(stats['type_counts'])} unique equipment types. "
+                    f"Key averages include {metric_mean(stats, 'Flowrate', 1)} m³/h Flowrate and {metric_mean(stats, 'Pressure', 1)} PSI Pressure. "
                     f"Data integrity verified and ready for deep-dive analysis."
                 )
-            except Exception as e:
-                summary_text = "File processing pending or unavailable."
 
             data.append({
                 "id": d.id, 
                 "name": d.name, 
                 "uploaded_at": d.uploaded_at,
-                "summary": summary_text
+                "summary": summary_text,
+                "row_count": stats['count'] if stats else None,
+                "type_count": len(stats['type_counts']) if stats else None,
+                "avg_flowrate": metric_mean(stats, 'Flowrate') if stats else None,
+                "avg_pressure": metric_mean(stats, 'Pressure') if stats else None,
+                "size": d.size,
+                "columns": d.columns,
+                "content_hash": d.content_hash,
             })
         return Response(data)
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    def get(self, request):
+        return Response(frame_cache.stats())
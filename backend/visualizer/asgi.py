@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'visualizer.settings')
+# drops the sync-only WhiteNoise middleware so the middleware chain stays async
+os.environ.setdefault('DJANGO_ASGI', '1')
 
-application = get_asgi_application()
+# /static/ (admin and browsable-API assets) is answered before the request reaches
+# Django's middleware, on a thread of its own; everything else stays on the event loop
+application = ASGIStaticFilesHandler(get_asgi_application())
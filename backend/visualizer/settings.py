@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.CompressionMiddleware', # zstd/br/gzip by Accept-Encoding, strong ETags kept
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # Recommended for production static files
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -45,6 +46,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# WhiteNoise is sync-only middleware: in the async stack Django would adapt around it
+# and every async view would take a thread. visualizer/asgi.py sets DJANGO_ASGI and
+# serves static files in front of Django instead.
+if os.environ.get('DJANGO_ASGI') == '1':
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'visualizer.urls'
 
 TEMPLATES = [
@@ -113,10 +120,46 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# API token lifetime in seconds, and how long a verified token is remembered per
+# process before the database is asked again (api.authentication)
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 12 * 60 * 60))
+AUTH_TOKEN_CACHE_SECONDS = 60
+
+# run upload ingest jobs on a thread pool inside the web process; set to 0 when a
+# separate `manage.py ingest_worker` process handles the queue
+INGEST_IN_PROCESS = os.environ.get('INGEST_IN_PROCESS', '1') == '1'
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+# an ingest job silent for this many seconds is treated as lost in a crash or restart;
+# keep it above UPLOAD_IDLE_TIMEOUT, which a job may spend waiting for the next chunk
+INGEST_STALE_SECONDS = int(os.environ.get('INGEST_STALE_SECONDS', 1800))
+
+# per-user dataset history limits, enforced after each upload and by
+# `manage.py enforce_retention`; 0 disables a limit
+RETENTION_MAX_DATASETS = int(os.environ.get('RETENTION_MAX_DATASETS', 5))
+RETENTION_MAX_BYTES = int(os.environ.get('RETENTION_MAX_BYTES', 0))
+RETENTION_MAX_AGE_DAYS = int(os.environ.get('RETENTION_MAX_AGE_DAYS', 0))
+
+# chunked uploads are parsed as they arrive, each on one of these threads (in the web
+# process or the ingest worker), so a slow transfer never holds an INGEST_WORKERS slot
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+# a chunked upload that sends nothing for this many seconds is abandoned; its ingest
+# job, which holds an UPLOAD_WORKERS thread while waiting for chunks, then fails
+UPLOAD_IDLE_TIMEOUT = int(os.environ.get('UPLOAD_IDLE_TIMEOUT', 600))
+
+# thread pool the async dataset views hand file reads and pandas work to
+ASYNC_VIEW_WORKERS = int(os.environ.get('ASYNC_VIEW_WORKERS', 4))
+
+# Memory budget for parsed datasets kept in each worker process (api.cache.frame_cache)
+DATASET_CACHE_BYTES = int(os.environ.get('DATASET_CACHE_BYTES', 256 * 1024 * 1024))
+# Memory budget for recent /query/ answers kept per process (api.query.result_cache)
+QUERY_CACHE_BYTES = int(os.environ.get('QUERY_CACHE_BYTES', 64 * 1024 * 1024))
+
+
 CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'True') == 'True'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
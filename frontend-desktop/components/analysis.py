@@ -3,10 +3,20 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
+import pandas as pd
+from .http_cache import cached_get
+from .rows import fetch_page
+
+API_BASE = "http://127.0.0.1:8000/api"
+PAGE_SIZE = 200
 
 class AnalysisPage(QWidget):
-    def __init__(self):
+    def __init__(self, main_window):
         super().__init__()
+        self.main_window = main_window
+        self.dataset_id = None
+        self.next_offset = None
+        self.loading = False
         self.init_ui()
 
     def init_ui(self):
@@ -94,38 +104,73 @@ class AnalysisPage(QWidget):
             }
         """)
         self.table.setMinimumHeight(600)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_table_scroll)
         self.content_layout.addWidget(self.table)
         
         scroll.setWidget(content_widget)
         layout.addWidget(scroll)
 
-    def update_table(self, df):
-        if df is None: return
-        
-        self.table.setColumnCount(len(df.columns))
-        self.table.setRowCount(len(df))
-        self.table.setHorizontalHeaderLabels(df.columns)
-        
-        for i in range(len(df)):
-            for j, col in enumerate(df.columns):
-                val = str(df.iloc[i][col])
-                item = QTableWidgetItem(val)
-                item.setFlags(item.flags() ^ Qt.ItemIsEditable) 
-                self.table.setItem(i, j, item)
-        
-        self.update_summary(df)
+    def load_rows(self, dataset_id):
+        self.dataset_id = dataset_id
+        self.next_offset = 0
+        self.table.setRowCount(0)
+        self.fetch_next_page()
+
+    def on_table_scroll(self, value):
+        if value >= self.table.verticalScrollBar().maximum() - 5:
+            self.fetch_next_page()
 
-    def update_summary(self, df):
+    def fetch_next_page(self):
+        if self.dataset_id is None or self.next_offset is None or self.loading:
+            return
+        self.loading = True
+        try:
+            df, _, next_offset = fetch_page(API_BASE, self.dataset_id, self.main_window.get_auth(), self.next_offset, PAGE_SIZE)
+            columns = list(df.columns)
+
+            if self.next_offset == 0:
+                self.table.setColumnCount(len(columns))
+                self.table.setHorizontalHeaderLabels(columns)
+
+            start = self.table.rowCount()
+            self.table.setRowCount(start + len(df))
+            for i, row in enumerate(df.itertuples(index=False)):
+                for j, value in enumerate(row):
+                    item = QTableWidgetItem('' if pd.isna(value) else str(value))
+                    item.setFlags(item.flags() ^ Qt.ItemIsEditable)
+                    self.table.setItem(start + i, j, item)
+
+            self.next_offset = next_offset
+        except Exception:
+            pass
+        finally:
+            self.loading = False
+
+    def update_summary(self, dataset_id):
         while self.summary_layout.count():
             child = self.summary_layout.takeAt(0)
             if child.widget():
                 child.widget().deleteLater()
 
+        # totals and per-Type counts are stored with the dataset; /summary/ reads no rows
+        analytics = None
+        try:
+            res = cached_get(f"{API_BASE}/dataset/{dataset_id}/summary/", auth=self.main_window.get_auth(), timeout=10)
+            if res.status_code == 200:
+                analytics = res.json().get('analytics')
+        except Exception:
+            pass
+
+        analytics = analytics or {}
+        types = analytics.get('equipment_count_by_type', {})
+        total = analytics.get('total_count', 0)
+        avg_flowrate, avg_pressure = analytics.get('avg_flowrate'), analytics.get('avg_pressure')
+        max_temperature = analytics.get('max_temperature')
         metrics = [
-            ("Total Records", f"{len(df)}", "#3fb950"), 
-            ("Avg Flowrate", f"{df['Flowrate'].mean():.2f}" if 'Flowrate' in df else "N/A", "#22d3ee"), 
-            ("Avg Pressure", f"{df['Pressure'].mean():.2f}" if 'Pressure' in df else "N/A", "#a78bfa"), 
-            ("Max Temp", f"{df['Temperature'].max():.1f}" if 'Temperature' in df else "N/A", "#f87171")  
+            ("Total Records", f"{total}", "#3fb950"), 
+            ("Avg Flowrate", f"{avg_flowrate:.2f}" if avg_flowrate is not None else "N/A", "#22d3ee"), 
+            ("Avg Pressure", f"{avg_pressure:.2f}" if avg_pressure is not None else "N/A", "#a78bfa"), 
+            ("Max Temp", f"{max_temperature:.1f}" if max_temperature is not None else "N/A", "#f87171")  
         ]
 
         for i, (label, value, color) in enumerate(metrics):
@@ -163,12 +208,12 @@ class AnalysisPage(QWidget):
             
             self.summary_layout.addWidget(card, 0, i)
         
-        equipment_counts = df['Type'].value_counts() if 'Type' in df else {}
-        top_eq = equipment_counts.idxmax() if not equipment_counts.empty else "N/A"
+        # the server lists types most common first
+        top_eq = next(iter(types), "N/A")
         
         summary_str = (
-            f"The dataset contains <b>{len(df)}</b> records analyzing parameters such as Flowrate, Pressure, and Temperature. "
-            f"There are <b>{len(equipment_counts)}</b> distinct equipment types, with <b>{top_eq}</b> being the most common. "
+            f"The dataset contains <b>{total}</b> records analyzing parameters such as Flowrate, Pressure, and Temperature. "
+            f"There are <b>{len(types)}</b> distinct equipment types, with <b>{top_eq}</b> being the most common. "
             "Data distribution appears normal with no critical outliers detected at this stage."
         )
         self.summary_text.setText(summary_str)
@@ -7,6 +7,14 @@ import requests
 
 API_BASE = "http://127.0.0.1:8000/api"
 
+class TokenAuth(requests.auth.AuthBase):
+    def __init__(self, token):
+        self.token = token
+
+    def __call__(self, r):
+        r.headers["Authorization"] = f"Token {self.token}"
+        return r
+
 AUTH_BG = "background: qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:1, stop:0 #000000, stop:0.5 #211e44, stop:1 #000000);"
 
 class LoginPage(QWidget):
@@ -69,8 +77,9 @@ class LoginPage(QWidget):
         try:
             res = requests.post(f"{API_BASE}/login/", json={"username": username, "password": password}, timeout=5)
             if res.status_code == 200:
+                data = res.json()
                 self.main_app.user = username
-                self.main_app.password = password 
+                self.main_app.set_token(data["token"], data["expires_in"])
                 self.main_app.start_app_session()
             else:
                 QMessageBox.warning(self, "Login Failed", "Invalid credentials")
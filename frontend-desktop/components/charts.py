@@ -4,7 +4,17 @@ from PyQt5.QtGui import QFont
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
-import pandas as pd
+from .http_cache import cached_get
+
+API_BASE = "http://127.0.0.1:8000/api"
+CHART_KINDS = {
+    "Bar Chart": "bar",
+    "Line Chart": "line",
+    "Histogram": "histogram",
+    "Pie Chart": "pie",
+    "Doughnut Chart": "doughnut",
+}
+POINT_BUDGET = 200
 
 plt.style.use('dark_background')
 
@@ -91,9 +101,10 @@ class ChartCard(QFrame):
         self.layout.setStretch(1, 1)
 
 class ChartsPage(QWidget):
-    def __init__(self):
+    def __init__(self, main_window):
         super().__init__()
-        self.df = None
+        self.main_window = main_window
+        self.dataset_id = None
         self.init_ui()
 
     def init_ui(self):
@@ -128,14 +139,28 @@ class ChartsPage(QWidget):
         scroll.setWidget(content)
         layout.addWidget(scroll)
 
-    def update_charts(self, df):
-        if df is None: return
-        self.df = df
+    def load_dataset(self, dataset_id):
+        self.dataset_id = dataset_id
         self.update_flow_chart(self.flow_card.combo.currentText())
         self.update_temp_chart(self.temp_card.combo.currentText())
         self.update_press_chart(self.press_card.combo.currentText())
         self.update_dist_chart(self.dist_card.combo.currentText())
 
+    def fetch_series(self, metric, chart_type):
+        if self.dataset_id is None: return None
+        try:
+            res = cached_get(
+                f"{API_BASE}/dataset/{self.dataset_id}/chart/{metric}/",
+                params={"kind": CHART_KINDS[chart_type], "points": POINT_BUDGET},
+                auth=self.main_window.get_auth(),
+                timeout=10
+            )
+            if res.status_code == 200:
+                return res.json()
+        except Exception:
+            pass
+        return None
+
     def _get_common_fig(self):
         fig = Figure(figsize=(10, 6), facecolor='#161b22')
         ax = fig.add_subplot(111)
@@ -146,10 +171,11 @@ class ChartsPage(QWidget):
         return fig, ax
 
     def update_flow_chart(self, chart_type):
-        if self.df is None: return
+        series = self.fetch_series("flowrate", chart_type)
+        if series is None: return
         fig, ax = self._get_common_fig()
-        names = self.df["Equipment Name"]
-        data = self.df["Flowrate"]
+        names = series["labels"]
+        data = series["values"]
 
         if chart_type == "Bar Chart":
             ax.bar(names, data, color='#22d3ee', alpha=0.8, edgecolor='#22d3ee')
@@ -157,7 +183,7 @@ class ChartsPage(QWidget):
             ax.plot(names, data, color='#22d3ee', marker='o', linewidth=2, markersize=6)
             ax.fill_between(names, data, color='#22d3ee', alpha=0.1)
         elif chart_type == "Histogram":
-            ax.hist(data, bins=10, color='#22d3ee', alpha=0.7, edgecolor='#161b22')
+            ax.bar(names, data, width=1.0, color='#22d3ee', alpha=0.7, edgecolor='#161b22')
         
         if chart_type != "Histogram":
             plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=7)
@@ -168,10 +194,11 @@ class ChartsPage(QWidget):
         self.flow_card.plot(fig)
 
     def update_temp_chart(self, chart_type):
-        if self.df is None: return
+        series = self.fetch_series("temperature", chart_type)
+        if series is None: return
         fig, ax = self._get_common_fig()
-        names = self.df["Equipment Name"]
-        data = self.df["Temperature"]
+        names = series["labels"]
+        data = series["values"]
 
         color = '#f87171' 
         if chart_type == "Line Chart":
@@ -180,7 +207,7 @@ class ChartsPage(QWidget):
         elif chart_type == "Bar Chart":
             ax.bar(names, data, color=color, alpha=0.8)
         elif chart_type == "Histogram":
-            ax.hist(data, bins=10, color=color, alpha=0.7, edgecolor='#161b22')
+            ax.bar(names, data, width=1.0, color=color, alpha=0.7, edgecolor='#161b22')
 
         if chart_type != "Histogram":
             plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=7)
@@ -191,10 +218,11 @@ class ChartsPage(QWidget):
         self.temp_card.plot(fig)
 
     def update_press_chart(self, chart_type):
-        if self.df is None: return
+        series = self.fetch_series("pressure", chart_type)
+        if series is None: return
         fig, ax = self._get_common_fig()
-        names = self.df["Equipment Name"]
-        data = self.df["Pressure"]
+        names = series["labels"]
+        data = series["values"]
         
         color = '#a78bfa'
         if chart_type == "Bar Chart":
@@ -208,12 +236,14 @@ class ChartsPage(QWidget):
         self.press_card.plot(fig)
 
     def update_dist_chart(self, chart_type):
-        if self.df is None: return
-        counts = self.df["Type"].value_counts()
+        series = self.fetch_series("type", chart_type)
+        if series is None: return
+        labels = series["labels"]
+        values = series["values"]
         
         if chart_type == "Bar Chart":
             fig, ax = self._get_common_fig()
-            ax.bar(counts.index, counts.values, color='#36A2EB')
+            ax.bar(labels, values, color='#36A2EB')
             plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=7)
             self.dist_card.plot(fig)
             return
@@ -226,7 +256,7 @@ class ChartsPage(QWidget):
             wedgeprops['width'] = 0.4
             
         wedges, texts, autotexts = ax.pie(
-            counts.values, 
+            values, 
             labels=None, 
             autopct='%1.1f%%', 
             pctdistance=0.85 if chart_type == "Doughnut Chart" else 0.6,
@@ -236,7 +266,7 @@ class ChartsPage(QWidget):
             startangle=90
         )
         
-        ax.legend(wedges, counts.index, title="Equipment Types", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
+        ax.legend(wedges, labels, title="Equipment Types", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
         
         fig.tight_layout()
         self.dist_card.plot(fig)
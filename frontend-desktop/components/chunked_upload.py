@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+
+# Client side of the resumable upload API. A file goes up as numbered chunks over a few
+# parallel connections; the server starts parsing with the first chunk. Open sessions
+# are remembered per file, so after a dropped connection or a restart only the chunks
+# the server is missing are sent again.
+CHUNK_SIZE = 8 * 1024 * 1024
+PARALLEL = 4
+RETRIES = 4
+STREAMABLE = ('.csv', '.csv.gz', '.csv.zst')
+STATE_FILE = os.path.join(os.path.expanduser('~'), '.equipment-visualizer', 'uploads.json')
+_state_lock = threading.Lock()
+
+
+class UploadFailed(Exception):
+    pass
+
+
+def is_streamable(path):
+    return path.lower().endswith(STREAMABLE)
+
+
+def _key(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _remember(key, upload_id):
+    with _state_lock:
+        state = _load_state()
+        if upload_id is None:
+            state.pop(key, None)
+        else:
+            state[key] = upload_id
+        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        with open(STATE_FILE, 'w') as f:
+            json.dump(state, f)
+
+
+def _error(res):
+    try:
+        return res.json().get("error") or res.text
+    except ValueError:
+        return res.text
+
+
+def _resume(api_base, auth, upload_id, size):
+    """Chunks still to send for an earlier session, or None if it can't be resumed."""
+    try:
+        res = requests.get(f"{api_base}/uploads/{upload_id}/", auth=auth, timeout=10)
+    except requests.RequestException:
+        return None
+    if res.status_code != 200:
+        return None
+    session = res.json()
+    if session["state"] != "open" or session["size"] != size:
+        return None
+    return session
+
+
+def upload(path, auth, api_base, progress=None):
+    """Upload path and return the ingest job. progress gets (chunks sent, total chunks)
+    from a worker thread. Raises UploadFailed when the server rejects the upload."""
+    key = _key(path)
+    name = os.path.basename(path)
+    with open(path, 'rb') as src, tempfile.TemporaryFile() as packed:
+        f = src
+        if name.lower().endswith('.csv'):
+            # mtime=0 and no name in the header make the .gz byte-identical on every run,
+            # so chunks sent before a restart still match
+            with gzip.GzipFile(filename='', fileobj=packed, mode='wb', compresslevel=6, mtime=0) as gz:
+                for block in iter(lambda: src.read(1024 * 1024), b''):
+                    gz.write(block)
+            name, f = name + '.gz', packed
+        size = f.seek(0, os.SEEK_END)
+
+        session = None
+        upload_id = _load_state().get(key)
+        if upload_id is not None:
+            session = _resume(api_base, auth, upload_id, size)
+        if session is None:
+            res = requests.post(f"{api_base}/uploads/", json={'name': name, 'size': size, 'chunk_size': CHUNK_SIZE}, auth=auth, timeout=10)
+            if res.status_code != 201:
+                raise UploadFailed(_error(res))
+            session = res.json()
+            _remember(key, session["upload_id"])
+        upload_id, chunk_size, total = session["upload_id"], session["chunk_size"], session["total_chunks"]
+
+        read_lock = threading.Lock()
+
+        def send(index):
+            with read_lock:
+                f.seek(index * chunk_size)
+                data = f.read(chunk_size)
+            headers = {'X-Chunk-SHA256': hashlib.sha256(data).hexdigest(), 'Content-Type': 'application/octet-stream'}
+            for attempt in range(RETRIES):
+                try:
+                    res = requests.put(f"{api_base}/uploads/{upload_id}/chunks/{index}/", data=data, headers=headers, auth=auth, timeout=(5, 60))
+                except requests.RequestException:
+                    if attempt == RETRIES - 1:
+                        raise
+                else:
+                    if res.status_code == 200:
+                        return
+                    if res.status_code == 409:
+                        # the session failed or was aborted server-side; it can't be resumed
+                        _remember(key, None)
+                        raise UploadFailed(_error(res))
+                    if attempt == RETRIES - 1:
+                        raise UploadFailed(_error(res))
+                time.sleep(2 ** attempt)
+
+        missing = session["missing"]
+        sent = total - len(missing)
+        if progress:
+            progress(sent, total)
+        with ThreadPoolExecutor(max_workers=PARALLEL) as pool:
+            # lowest indices first: the parser consumes chunks in order
+            for future in as_completed([pool.submit(send, i) for i in sorted(missing)]):
+                future.result()
+                sent += 1
+                if progress:
+                    progress(sent, total)
+
+    res = requests.post(f"{api_base}/uploads/{upload_id}/finalize/", auth=auth, timeout=10)
+    if res.status_code != 202:
+        raise UploadFailed(_error(res))
+    _remember(key, None)
+    return res.json()
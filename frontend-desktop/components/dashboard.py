@@ -1,12 +1,19 @@
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QFrame, QPushButton, QListWidget, QListWidgetItem, QFileDialog, QMessageBox, QHBoxLayout
+    QWidget, QVBoxLayout, QLabel, QFrame, QPushButton, QListWidget, QListWidgetItem, QFileDialog, QMessageBox, QHBoxLayout, QInputDialog
 )
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QTimer
 from PyQt5.QtGui import QFont, QCursor, QDragEnterEvent, QDropEvent, QIcon, QPixmap
 import requests
 import os
+from concurrent.futures import ThreadPoolExecutor
+from . import chunked_upload
 
 API_BASE = "http://127.0.0.1:8000/api"
+JOB_POLL_MS = 1000
+JOB_TIMEOUT_MS = 10 * 60 * 1000
+UPLOAD_POLL_MS = 200
+# chunked uploads run here so the window stays responsive while chunks are sent
+upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload')
 
 class ClickableDropArea(QFrame):
     def __init__(self, parent=None):
@@ -34,6 +41,14 @@ class DashboardPage(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
+        self.job_id = None
+        self.job_polls = 0
+        self.job_timer = QTimer(self)
+        self.job_timer.timeout.connect(self.poll_job)
+        self.upload_future = None
+        self.upload_progress = (0, 0)
+        self.upload_timer = QTimer(self)
+        self.upload_timer.timeout.connect(self.poll_upload)
         self.init_ui()
 
     def init_ui(self):
@@ -100,14 +115,19 @@ class DashboardPage(QWidget):
         sub_text.setAlignment(Qt.AlignCenter)
         dz_layout.addWidget(sub_text)
 
-        limit_text = QLabel("Supports .csv, .xlsx (Max 50MB)")
+        limit_text = QLabel("Supports .csv, .xlsx, .csv.gz, .csv.zst, .zip (Max 50MB)")
         limit_text.setFont(QFont("Segoe UI", 9))
         limit_text.setStyleSheet("color: #484f58; border: none; background: transparent;")
         limit_text.setAlignment(Qt.AlignCenter)
         dz_layout.addWidget(limit_text)
 
+        self.status_lbl = QLabel("")
+        self.status_lbl.setAlignment(Qt.AlignCenter)
+        self.status_lbl.setStyleSheet("color: #8b949e; border: none; background: transparent;")
+
         card_layout.addWidget(title)
         card_layout.addWidget(drop_zone)
+        card_layout.addWidget(self.status_lbl)
         
         center_layout.addWidget(card)
         center_layout.addStretch()
@@ -132,24 +152,103 @@ class DashboardPage(QWidget):
         layout.addStretch()
 
     def open_file_dialog(self):
-        fname, _ = QFileDialog.getOpenFileName(self, "Open Dataset", "", "CSV Files (*.csv);;Excel Files (*.xlsx)")
+        fname, _ = QFileDialog.getOpenFileName(self, "Open Dataset", "", "CSV Files (*.csv);;Compressed CSV (*.csv.gz *.csv.zst *.zip);;Excel Files (*.xlsx)")
         if fname:
             self.upload_file(fname)
 
-    def upload_file(self, filepath):
+    def upload_file(self, filepath, sheet=None):
+        if chunked_upload.is_streamable(filepath):
+            self.start_chunked_upload(filepath)
+            return
         try:
             auth = self.main_window.get_auth()
-            files = {'file': open(filepath, 'rb')}
-            res = requests.post(f"{API_BASE}/upload-csv/", files=files, auth=auth, timeout=10)
-            
-            if res.status_code in [200, 201]:
-                QMessageBox.information(self, "Success", "Dataset uploaded successfully!")
-                self.main_window.refresh_history()
+            name = os.path.basename(filepath)
+            # workbooks and zips need the whole file server-side, so they go up in one request;
+            # the server only stores and hashes the file before answering; parsing is polled
+            with open(filepath, 'rb') as f:
+                data = {'sheet': sheet} if sheet else {}
+                res = requests.post(f"{API_BASE}/upload-csv/", files={'file': (name, f)}, data=data, auth=auth, timeout=(5, 120))
+
+            sheets = res.json().get("sheets") if res.status_code == 400 else None
+            if sheets:
+                # workbook without an obvious data sheet: let the user pick one
+                sheet, ok = QInputDialog.getItem(self, "Choose Sheet", res.json()["error"], sheets, 0, False)
+                if ok:
+                    self.upload_file(filepath, sheet)
+                return
+
+            if res.status_code == 202:
+                self.job_id = res.json()["job_id"]
+                self.job_polls = 0
+                self.job_timer.start(JOB_POLL_MS)
             else:
                 QMessageBox.warning(self, "Failed", f"Upload failed: {res.text}")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Connection error: {e}")
 
+    def start_chunked_upload(self, filepath):
+        if self.upload_future is not None and not self.upload_future.done():
+            QMessageBox.information(self, "Busy", "An upload is already in progress.")
+            return
+        # CSVs go up in parallel chunks; if the connection drops, uploading the same
+        # file again sends only the chunks the server is missing
+        self.upload_progress = (0, 0)
+        self.upload_future = upload_executor.submit(chunked_upload.upload, filepath, self.main_window.get_auth(), API_BASE, self.set_upload_progress)
+        self.status_lbl.setText("Uploading...")
+        self.upload_timer.start(UPLOAD_POLL_MS)
+
+    def set_upload_progress(self, sent, total):
+        # called from the upload thread; the timer puts it on screen
+        self.upload_progress = (sent, total)
+
+    def poll_upload(self):
+        if not self.upload_future.done():
+            sent, total = self.upload_progress
+            if total:
+                self.status_lbl.setText(f"Uploading... {sent * 100 // total}% ({sent}/{total} chunks)")
+            return
+
+        self.upload_timer.stop()
+        try:
+            job = self.upload_future.result()
+        except chunked_upload.UploadFailed as e:
+            self.status_lbl.setText("")
+            QMessageBox.warning(self, "Failed", f"Upload failed: {e}")
+            return
+        except Exception as e:
+            self.status_lbl.setText("")
+            QMessageBox.critical(self, "Error", f"Connection error: {e}\nUpload the file again to resume where it stopped.")
+            return
+        self.job_id = job["job_id"]
+        self.job_polls = 0
+        self.job_timer.start(JOB_POLL_MS)
+
+    def poll_job(self):
+        self.job_polls += 1
+        try:
+            res = requests.get(f"{API_BASE}/jobs/{self.job_id}/", auth=self.main_window.get_auth(), timeout=5)
+            job = res.json()
+        except Exception as e:
+            if self.job_polls * JOB_POLL_MS >= JOB_TIMEOUT_MS:
+                self.job_timer.stop()
+                QMessageBox.critical(self, "Error", f"Lost track of upload processing: {e}")
+            return
+
+        if job["stage"] == "done":
+            self.job_timer.stop()
+            self.status_lbl.setText("")
+            QMessageBox.information(self, "Success", "Dataset uploaded successfully!")
+            self.main_window.refresh_history()
+        elif job["stage"] == "failed":
+            self.job_timer.stop()
+            self.status_lbl.setText("")
+            QMessageBox.warning(self, "Failed", f"Upload failed: {job['error']}")
+        elif self.job_polls * JOB_POLL_MS >= JOB_TIMEOUT_MS:
+            self.job_timer.stop()
+            self.status_lbl.setText("Still processing in the background; check History later.")
+        else:
+            self.status_lbl.setText(f"Processing... {job['percent']}% ({job['rows_parsed']} rows)")
+
     def update_recent(self, data):
         self.recent_list.clear()
         for d in data[:5]:
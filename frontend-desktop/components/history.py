@@ -3,6 +3,15 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon, QColor
 import datetime
 
+def format_size(num_bytes):
+    if num_bytes is None:
+        return "Size unknown"
+    size = float(num_bytes)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
 class HistoryItemWidget(QWidget):
     def __init__(self, item_data, view_callback):
         super().__init__()
@@ -38,7 +47,7 @@ class HistoryItemWidget(QWidget):
         except:
             formatted_date = item_data['uploaded_at'][:10] 
             
-        meta_text = f"Uploaded {formatted_date} • {item_data.get('size', '2.4 MB')}"
+        meta_text = f"Uploaded {formatted_date} • {format_size(item_data.get('size'))}"
         meta = QLabel(meta_text)
         meta.setFont(QFont("Segoe UI", 12))
         meta.setStyleSheet("color: #8b949e;")
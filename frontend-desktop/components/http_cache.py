@@ -0,0 +1,29 @@
+from collections import OrderedDict
+import requests
+
+# Client side of the API's ETag support: re-opening a dataset sends If-None-Match
+# and reuses the stored body when the server answers 304 Not Modified.
+MAX_ENTRIES = 32
+_responses = OrderedDict()
+
+def cached_get(url, params=None, headers=None, **kwargs):
+    headers = dict(headers or {})
+    key = (url, tuple(sorted((params or {}).items())), headers.get("Accept", ""))
+    cached = _responses.get(key)
+    if cached is not None:
+        headers["If-None-Match"] = cached.headers["ETag"]
+
+    res = requests.get(url, params=params, headers=headers, **kwargs)
+    if res.status_code == 304 and cached is not None:
+        _responses.move_to_end(key)
+        return cached
+
+    if res.status_code == 200 and res.headers.get("ETag"):
+        _responses[key] = res
+        _responses.move_to_end(key)
+        while len(_responses) > MAX_ENTRIES:
+            _responses.popitem(last=False)
+    return res
+
+def clear():
+    _responses.clear()
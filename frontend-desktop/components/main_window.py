@@ -4,7 +4,6 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QFont, QCursor, QPixmap, QIcon
 from PyQt5.QtCore import Qt, QSize
 import requests
-import pandas as pd
 import os
 
 from .dashboard import DashboardPage
@@ -12,6 +11,7 @@ from .analysis import AnalysisPage
 from .charts import ChartsPage
 from .reports import ReportsPage
 from .history import HistoryPage
+from .auth import TokenAuth
 
 API_BASE = "http://127.0.0.1:8000/api"
 
@@ -20,13 +20,12 @@ class MainContent(QWidget):
         super().__init__()
         self.main_app = main_app
         self.dataset_id = None
-        self.df = None
         self.sidebar_icons_path = os.path.join("frontend-desktop", "assets", "icons")
         
         self.init_ui()
 
     def get_auth(self):
-        return (self.main_app.user, self.main_app.password)
+        return TokenAuth(self.main_app.token)
 
     def init_ui(self):
         root_layout = QVBoxLayout()
@@ -123,8 +122,8 @@ class MainContent(QWidget):
         self.content_stack.setStyleSheet("background: transparent;")
         
         self.dashboard_page = DashboardPage(self)
-        self.analysis_page = AnalysisPage()
-        self.charts_page = ChartsPage()
+        self.analysis_page = AnalysisPage(self)
+        self.charts_page = ChartsPage(self)
         self.reports_page = ReportsPage(self)
         self.history_page = HistoryPage(self.load_dataset)
         
@@ -180,13 +179,12 @@ class MainContent(QWidget):
     def load_dataset(self, dataset_id):
         self.dataset_id = dataset_id
         try:
-            auth = self.get_auth()
-            res = requests.get(f"{API_BASE}/dataset/{dataset_id}/data/", auth=auth, timeout=5)
-            if res.status_code == 200:
-                self.df = pd.DataFrame(res.json().get('data', []))
-                self.analysis_page.update_table(self.df)
-                self.charts_page.update_charts(self.df)
-                self.reports_page.update_report(self.df, dataset_id)
-                self.navigate_to(1)
+            # each page reads only what it shows, through the paged rows and the stored
+            # summary; the dataset itself is never downloaded whole
+            self.analysis_page.load_rows(dataset_id)
+            self.analysis_page.update_summary(dataset_id)
+            self.charts_page.load_dataset(dataset_id)
+            self.reports_page.update_report(dataset_id)
+            self.navigate_to(1)
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
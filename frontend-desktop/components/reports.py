@@ -1,9 +1,8 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QScrollArea, QFrame, QMessageBox, QFileDialog, QSizePolicy, QTextBrowser
 )
-from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QFont, QTextDocument
-from PyQt5.QtPrintSupport import QPrinter
+from PyQt5.QtCore import Qt, QDate, QTimer
+from PyQt5.QtGui import QFont
 import datetime
 import matplotlib.pyplot as plt
 import os
@@ -11,6 +10,16 @@ import pandas as pd
 import numpy as np
 import html
 import tempfile
+import requests
+from .http_cache import cached_get
+from .rows import fetch_page
+
+API_BASE = "http://127.0.0.1:8000/api"
+# rows shown in the preview's table and bar charts; the PDF covers the whole dataset
+PREVIEW_ROWS = 50
+# the server renders a report it has not cached in the background; its job is polled
+REPORT_POLL_MS = 1000
+REPORT_TIMEOUT_MS = 5 * 60 * 1000
 
 class ReportsPage(QWidget):
     def __init__(self, main_window):
@@ -18,6 +27,9 @@ class ReportsPage(QWidget):
         self.main_window = main_window
         self.dataset_id = None
         self.html_content = ""
+        self.report_job = None
+        self.report_timer = QTimer(self)
+        self.report_timer.timeout.connect(self.poll_report)
         self.init_ui()
 
     def init_ui(self):
@@ -90,7 +102,7 @@ class ReportsPage(QWidget):
         self.preview_area.setWidget(container)
         layout.addWidget(self.preview_area)
 
-    def generate_charts_for_report(self, df):
+    def generate_charts_for_report(self, type_counts, df):
         paths = {}
         
         
@@ -98,7 +110,7 @@ class ReportsPage(QWidget):
             
             
             fig = plt.figure(figsize=(8, 3.5)) 
-            counts = df['Type'].value_counts()
+            counts = pd.Series(type_counts, dtype=float)
             colors = ["#3b82f6", "#ef4444", "#f59e0b", "#10b981", "#8b5cf6", "#ec4899"]
             
             
@@ -145,29 +157,42 @@ class ReportsPage(QWidget):
 
         return paths
 
-    def update_report(self, df, dataset_id):
+    def update_report(self, dataset_id):
         self.dataset_id = dataset_id
         self.download_btn.setEnabled(True)
-        
-        
-        count = len(df)
-        unique_types = df['Type'].nunique() if 'Type' in df else 0
-        
-        avg_flow = f"{df['Flowrate'].mean():.2f}"
-        min_flow = f"{df['Flowrate'].min():.2f}"
-        max_flow = f"{df['Flowrate'].max():.2f}"
-        
-        avg_press = f"{df['Pressure'].mean():.2f}"
-        avg_temp = f"{df['Temperature'].mean():.2f}"
+        auth = self.main_window.get_auth()
+
+        # totals come from the stored summary and the rows from the first page, so the
+        # preview costs the same whatever the size of the dataset
+        res = cached_get(f"{API_BASE}/dataset/{dataset_id}/summary/", auth=auth, timeout=10)
+        res.raise_for_status()
+        summary = res.json()['analytics']
+        df, _, _ = fetch_page(API_BASE, dataset_id, auth, limit=PREVIEW_ROWS)
+        rows = df.astype(object).where(df.notna(), '').to_dict('records')
+
+        metrics = summary.get('metrics', {})
+        count = summary['total_count']
+        unique_types = len(summary['equipment_count_by_type'])
+
+        def stat(col, key):
+            value = metrics.get(col, {}).get(key)
+            return "-" if value is None else f"{value:.2f}"
+
+        avg_flow = stat('Flowrate', 'mean')
+        min_flow = stat('Flowrate', 'min')
+        max_flow = stat('Flowrate', 'max')
+
+        avg_press = stat('Pressure', 'mean')
+        avg_temp = stat('Temperature', 'mean')
         
         now = datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
         user = "admin"
         
-        charts = self.generate_charts_for_report(df)
+        charts = self.generate_charts_for_report(summary['equipment_count_by_type'], df)
         
         
         table_rows = ""
-        for i, row in df.iterrows():
+        for i, row in enumerate(rows):
             bg = "#f3f4f6" if i % 2 == 0 else "white"
             table_rows += f"""
             <tr style="background-color: {bg};">
@@ -178,6 +203,7 @@ class ReportsPage(QWidget):
                 <td>{html.escape(str(row.get('Temperature', '')))}</td>
             </tr>
             """
+        shown = f"First {len(rows):,} of {count:,} records" if len(rows) < count else f"All {count:,} records"
 
         
         self.html_content = f"""
@@ -270,7 +296,8 @@ class ReportsPage(QWidget):
 
             <br>
             <br>
-            <h2>Full Dataset Data Table</h2>
+            <h2>Dataset Data Table</h2>
+            <p class="caption">{shown}; the downloaded PDF lists every record.</p>
             <table class="data-table" width="100%" cellspacing="0" cellpadding="8" style="border-collapse: collapse;">
                 <tr>
                     <th width="25%" style="background-color: #374151; color: white; padding: 10px; border: 1px solid #374151;">Equipment Name</th>
@@ -295,15 +322,42 @@ class ReportsPage(QWidget):
         if not self.dataset_id: return
         path, _ = QFileDialog.getSaveFileName(self, "Save Report", f"report_{self.dataset_id}.pdf", "PDF Files (*.pdf)")
         if path:
-            try:
-                printer = QPrinter()
-                printer.setOutputFormat(QPrinter.PdfFormat)
-                printer.setOutputFileName(path)
-                
-                doc = QTextDocument()
-                doc.setHtml(self.html_content)
-                doc.print_(printer)
-                
-                QMessageBox.information(self, "Success", f"Report saved successfully to {path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to save PDF: {str(e)}")
+            self.fetch_report(self.dataset_id, path)
+
+    def fetch_report(self, dataset_id, path):
+        try:
+            # cached on the server and written to disk as it arrives; 202 means it is
+            # still being rendered
+            res = requests.get(f"{API_BASE}/dataset/{dataset_id}/pdf/", auth=self.main_window.get_auth(), stream=True, timeout=(5, 120))
+            res.raise_for_status()
+            if res.status_code == 202:
+                self.report_job = (res.json()["job_id"], dataset_id, path, 0)
+                self.download_btn.setEnabled(False)
+                self.report_timer.start(REPORT_POLL_MS)
+                return
+            with open(path, 'wb') as f:
+                for chunk in res.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+
+            QMessageBox.information(self, "Success", f"Report saved successfully to {path}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save PDF: {str(e)}")
+
+    def poll_report(self):
+        job_id, dataset_id, path, polls = self.report_job
+        self.report_job = (job_id, dataset_id, path, polls + 1)
+        try:
+            job = requests.get(f"{API_BASE}/jobs/{job_id}/", auth=self.main_window.get_auth(), timeout=5).json()
+        except Exception:
+            job = {"stage": None}
+
+        if job["stage"] in ("queued", "parsing", "finalizing", None) and (polls + 1) * REPORT_POLL_MS < REPORT_TIMEOUT_MS:
+            return
+        self.report_timer.stop()
+        self.download_btn.setEnabled(True)
+        if job["stage"] == "done":
+            self.fetch_report(dataset_id, path)
+        elif job["stage"] == "failed":
+            QMessageBox.warning(self, "Failed", job['error'])
+        else:
+            QMessageBox.critical(self, "Error", "The report is taking too long; try again later.")
@@ -0,0 +1,32 @@
+import pandas as pd
+from .http_cache import cached_get
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Row pages of a dataset. With pyarrow installed the server is asked for Arrow IPC, which
+# arrives as columnar buffers with the paging in X-Total-Count and X-Next-Offset;
+# without it the pages come as JSON.
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def fetch_page(api_base, dataset_id, auth, offset=0, limit=None, timeout=10):
+    """One page of rows as (DataFrame, total rows, next offset or None)."""
+    params = {"offset": offset}
+    if limit is not None:
+        params["limit"] = limit
+    headers = {"Accept": ARROW_STREAM} if pa else {}
+    res = cached_get(f"{api_base}/dataset/{dataset_id}/data/", params=params, headers=headers, auth=auth, timeout=timeout)
+    res.raise_for_status()
+
+    if res.headers.get("Content-Type", "").startswith(ARROW_STREAM):
+        df = pa.ipc.open_stream(res.content).read_pandas()
+        next_offset = res.headers.get("X-Next-Offset")
+        total = int(res.headers.get("X-Total-Count", len(df)))
+        return df, total, int(next_offset) if next_offset else None
+
+    page = res.json()
+    df = pd.DataFrame(page.get('data', []), columns=page.get('columns'))
+    return df, page.get('total', len(df)), page.get('next_offset')
@@ -1,8 +1,11 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QStackedWidget
-from components.auth import LoginPage, SignupPage
+from PyQt5.QtCore import QTimer
+import requests
+from components.auth import LoginPage, SignupPage, TokenAuth, API_BASE
 from components.main_window import MainContent
 from components.styles import STYLES
+from components import http_cache
 
 class DesktopApp(QWidget):
     def __init__(self):
@@ -10,7 +13,10 @@ class DesktopApp(QWidget):
         self.setWindowTitle("Chemical Equipment Visualizer")
         self.resize(1400, 900)
         self.user = None
-        self.password = None
+        self.token = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh_token)
 
         self.layout = QVBoxLayout()
         self.layout.setContentsMargins(0,0,0,0)
@@ -46,9 +52,33 @@ class DesktopApp(QWidget):
         self.main_content.set_user(self.user)
         self.stack.setCurrentWidget(self.main_content)
 
+    def set_token(self, token, expires_in):
+        self.token = token
+        # renew well before expiry so long sessions never hit a 401
+        self.refresh_timer.start(int(expires_in * 0.8) * 1000)
+
+    def refresh_token(self):
+        try:
+            res = requests.post(f"{API_BASE}/token/refresh/", auth=TokenAuth(self.token), timeout=5)
+            if res.status_code == 200:
+                data = res.json()
+                self.set_token(data["token"], data["expires_in"])
+                return
+        except requests.RequestException:
+            pass
+        # server unreachable: try again shortly while the current token is still valid
+        self.refresh_timer.start(60 * 1000)
+
     def logout(self):
+        self.refresh_timer.stop()
+        if self.token:
+            try:
+                requests.post(f"{API_BASE}/logout/", auth=TokenAuth(self.token), timeout=5)
+            except requests.RequestException:
+                pass
         self.user = None
-        self.password = None
+        self.token = None
+        http_cache.clear()
         self.stack.setCurrentWidget(self.auth_container)
         self.show_auth_page("login")
 
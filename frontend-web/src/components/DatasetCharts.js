@@ -28,91 +28,53 @@ ChartJS.register(
     ArcElement
 );
 
-const DatasetCharts = ({ datasetId, authHeader }) => {
-    const [chartData, setChartData] = useState([]);
-    const [flowChartType, setFlowChartType] = useState('bar');
-    const [tempChartType, setTempChartType] = useState('line');
-    const [pressureChartType, setPressureChartType] = useState('bar');
-    const [distChartType, setDistChartType] = useState('pie');
+const POINT_BUDGET = 200;
 
-    const [errorMessage, setErrorMessage] = useState("");
-    const [isLoading, setIsLoading] = useState(true);
+// Fetches a render-ready, server-downsampled series for one chart
+const useChartSeries = (datasetId, authHeader, metric, kind) => {
+    const [series, setSeries] = useState(null);
+    const [error, setError] = useState("");
 
     useEffect(() => {
         if (!datasetId) return;
 
-        const fetchData = async () => {
-            setIsLoading(true);
+        const fetchSeries = async () => {
             try {
-                const res = await axios.get(`${config.API_BASE_URL}/dataset/${datasetId}/data/`, {
-                    headers: { Authorization: authHeader }
+                const res = await axios.get(`${config.API_BASE_URL}/dataset/${datasetId}/chart/${metric}/`, {
+                    headers: { Authorization: authHeader },
+                    params: { kind, points: POINT_BUDGET }
                 });
-                setChartData(res.data.data);
-                setErrorMessage("");
+                setSeries(res.data);
+                setError("");
             } catch (err) {
-                console.error("Error fetching chart data:", err);
-                setErrorMessage("Unable to load chart data. Please try again later.");
-            } finally {
-                setIsLoading(false);
+                console.error(`Error fetching ${metric} chart:`, err);
+                setError("Unable to load chart data. Please try again later.");
             }
         };
 
-        fetchData();
-    }, [datasetId, authHeader]);
+        fetchSeries();
+    }, [datasetId, authHeader, metric, kind]);
 
-    if (!datasetId) return null;
-    if (errorMessage) return <div className="error-message">{errorMessage}</div>;
-    if (isLoading) return <div className="loading-message">Loading visualization...</div>;
-    if (chartData.length === 0) return <div className="empty-message">No data available for visualization.</div>;
-
-    const equipmentNames = chartData.map((item) => item["Equipment Name"]);
-    const flowRates = chartData.map((item) => item["Flowrate"]);
-    const temperatures = chartData.map((item) => item["Temperature"]);
-    const pressures = chartData.map((item) => item["Pressure"]);
-
-    const equipmentTypeCounts = {};
-    chartData.forEach((item) => {
-        const type = item["Type"];
-        equipmentTypeCounts[type] = (equipmentTypeCounts[type] || 0) + 1;
-    });
-
-
-    const calculateHistogram = (data, binCount = 10) => {
-        if (!data || data.length === 0) return { labels: [], count: [] };
-        const min = Math.min(...data);
-        const max = Math.max(...data);
-        const step = (max - min) / binCount || 10;
-
-        const bins = Array(binCount).fill(0);
-        const labels = Array(binCount).fill(0).map((_, i) => {
-            const start = (min + i * step).toFixed(1);
-            const end = (min + (i + 1) * step).toFixed(1);
-            return `${start} - ${end}`;
-        });
-
-        data.forEach(val => {
-            const index = Math.min(Math.floor((val - min) / step), binCount - 1);
-            bins[index]++;
-        });
-
-        return { labels, data: bins };
-    };
+    return [series, error];
+};
 
-    const flowHistogram = calculateHistogram(flowRates);
-    const tempHistogram = calculateHistogram(temperatures);
+const DatasetCharts = ({ datasetId, authHeader }) => {
+    const [flowChartType, setFlowChartType] = useState('bar');
+    const [tempChartType, setTempChartType] = useState('line');
+    const [pressureChartType, setPressureChartType] = useState('bar');
+    const [distChartType, setDistChartType] = useState('pie');
 
-    const requiredCols = ["Equipment Name", "Flowrate", "Temperature", "Type"];
-    const hasRequiredCols = chartData.length > 0 && requiredCols.every(col => Object.keys(chartData[0]).includes(col));
+    const [flowSeries, flowError] = useChartSeries(datasetId, authHeader, "flowrate", flowChartType);
+    const [tempSeries, tempError] = useChartSeries(datasetId, authHeader, "temperature", tempChartType);
+    const [pressureSeries, pressureError] = useChartSeries(datasetId, authHeader, "pressure", pressureChartType);
+    const [distSeries, distError] = useChartSeries(datasetId, authHeader, "type", distChartType);
 
-    if (!hasRequiredCols) {
-        return (
-            <div style={{ width: "100%", display: "flex", flexDirection: "column", alignItems: "center" }}>
-                <div className="container-card" style={{ textAlign: "center", color: "var(--text-secondary)" }}>
-                    <p>Visualizations unavailable. Missing required columns.</p>
-                </div>
-            </div>
-        );
-    }
+    const errorMessage = flowError || tempError || pressureError || distError;
+
+    if (!datasetId) return null;
+    if (errorMessage) return <div className="error-message">{errorMessage}</div>;
+    if (!flowSeries || !tempSeries || !pressureSeries || !distSeries) return <div className="loading-message">Loading visualization...</div>;
+    if (distSeries.total === 0) return <div className="empty-message">No data available for visualization.</div>;
 
     const commonOptions = {
         responsive: true,
@@ -161,13 +123,13 @@ const DatasetCharts = ({ datasetId, authHeader }) => {
                     </div>
                     {flowChartType === 'histogram' ? (
                         <Bar
-                            data={{ labels: flowHistogram.labels, datasets: [{ label: "Frequency", data: flowHistogram.data, backgroundColor: "rgba(34, 211, 238, 0.6)", barPercentage: 1.0, categoryPercentage: 1.0 }] }}
+                            data={{ labels: flowSeries.labels, datasets: [{ label: "Frequency", data: flowSeries.values, backgroundColor: "rgba(34, 211, 238, 0.6)", barPercentage: 1.0, categoryPercentage: 1.0 }] }}
                             options={commonOptions}
                         />
                     ) : flowChartType === 'bar' ? (
-                        <Bar data={{ labels: equipmentNames, datasets: [{ label: "Flowrate (m³/h)", data: flowRates, backgroundColor: "rgba(34, 211, 238, 0.6)", borderColor: "rgba(34, 211, 238, 1)", borderWidth: 1 }] }} options={commonOptions} />
+                        <Bar data={{ labels: flowSeries.labels, datasets: [{ label: "Flowrate (m³/h)", data: flowSeries.values, backgroundColor: "rgba(34, 211, 238, 0.6)", borderColor: "rgba(34, 211, 238, 1)", borderWidth: 1 }] }} options={commonOptions} />
                     ) : (
-                        <Line data={{ labels: equipmentNames, datasets: [{ label: "Flowrate (m³/h)", data: flowRates, borderColor: "rgba(34, 211, 238, 1)", backgroundColor: "rgba(34, 211, 238, 0.2)", tension: 0.4 }] }} options={commonOptions} />
+                        <Line data={{ labels: flowSeries.labels, datasets: [{ label: "Flowrate (m³/h)", data: flowSeries.values, borderColor: "rgba(34, 211, 238, 1)", backgroundColor: "rgba(34, 211, 238, 0.2)", tension: 0.4 }] }} options={commonOptions} />
                     )}
                 </div>
 
@@ -182,13 +144,13 @@ const DatasetCharts = ({ datasetId, authHeader }) => {
                     </div>
                     {tempChartType === 'histogram' ? (
                         <Bar
-                            data={{ labels: tempHistogram.labels, datasets: [{ label: "Frequency", data: tempHistogram.data, backgroundColor: "rgba(248, 113, 113, 0.6)", barPercentage: 1.0, categoryPercentage: 1.0 }] }}
+                            data={{ labels: tempSeries.labels, datasets: [{ label: "Frequency", data: tempSeries.values, backgroundColor: "rgba(248, 113, 113, 0.6)", barPercentage: 1.0, categoryPercentage: 1.0 }] }}
                             options={commonOptions}
                         />
                     ) : tempChartType === 'line' ? (
-                        <Line data={{ labels: equipmentNames, datasets: [{ label: "Temperature (°C)", data: temperatures, borderColor: "#f87171", backgroundColor: "rgba(248, 113, 113, 0.2)", tension: 0.3, pointBackgroundColor: "#f87171" }] }} options={commonOptions} />
+                        <Line data={{ labels: tempSeries.labels, datasets: [{ label: "Temperature (°C)", data: tempSeries.values, borderColor: "#f87171", backgroundColor: "rgba(248, 113, 113, 0.2)", tension: 0.3, pointBackgroundColor: "#f87171" }] }} options={commonOptions} />
                     ) : (
-                        <Bar data={{ labels: equipmentNames, datasets: [{ label: "Temperature (°C)", data: temperatures, backgroundColor: "rgba(248, 113, 113, 0.6)", borderColor: "#f87171", borderWidth: 1 }] }} options={commonOptions} />
+                        <Bar data={{ labels: tempSeries.labels, datasets: [{ label: "Temperature (°C)", data: tempSeries.values, backgroundColor: "rgba(248, 113, 113, 0.6)", borderColor: "#f87171", borderWidth: 1 }] }} options={commonOptions} />
                     )}
                 </div>
 
@@ -202,9 +164,9 @@ const DatasetCharts = ({ datasetId, authHeader }) => {
                         </select>
                     </div>
                     {pressureChartType === 'bar' ? (
-                        <Bar data={{ labels: equipmentNames, datasets: [{ label: "Pressure (PSI)", data: pressures, backgroundColor: "rgba(167, 139, 250, 0.6)", borderColor: "rgba(167, 139, 250, 1)", borderWidth: 1 }] }} options={commonOptions} />
+                        <Bar data={{ labels: pressureSeries.labels, datasets: [{ label: "Pressure (PSI)", data: pressureSeries.values, backgroundColor: "rgba(167, 139, 250, 0.6)", borderColor: "rgba(167, 139, 250, 1)", borderWidth: 1 }] }} options={commonOptions} />
                     ) : (
-                        <Line data={{ labels: equipmentNames, datasets: [{ label: "Pressure (PSI)", data: pressures, borderColor: "rgba(167, 139, 250, 1)", backgroundColor: "rgba(167, 139, 250, 0.2)", tension: 0.4 }] }} options={commonOptions} />
+                        <Line data={{ labels: pressureSeries.labels, datasets: [{ label: "Pressure (PSI)", data: pressureSeries.values, borderColor: "rgba(167, 139, 250, 1)", backgroundColor: "rgba(167, 139, 250, 0.2)", tension: 0.4 }] }} options={commonOptions} />
                     )}
                 </div>
 
@@ -218,9 +180,9 @@ const DatasetCharts = ({ datasetId, authHeader }) => {
                         </select>
                     </div>
                     <div style={{ flex: 1, position: "relative", width: "100%", height: "100%" }}>
-                        {distChartType === 'pie' && <Pie data={{ labels: Object.keys(equipmentTypeCounts), datasets: [{ data: Object.values(equipmentTypeCounts), backgroundColor: ["#36A2EB", "#FF6384", "#FFCE56", "#4BC0C0", "#9966FF", "#FF9F40"], borderWidth: 0 }] }} options={{ responsive: true, maintainAspectRatio: false, plugins: { legend: { position: "right", labels: { color: "#c9d1d9", padding: 10, font: { size: 11 } } } } }} />}
-                        {distChartType === 'doughnut' && <Doughnut data={{ labels: Object.keys(equipmentTypeCounts), datasets: [{ data: Object.values(equipmentTypeCounts), backgroundColor: ["#36A2EB", "#FF6384", "#FFCE56", "#4BC0C0", "#9966FF", "#FF9F40"], borderWidth: 0 }] }} options={{ responsive: true, maintainAspectRatio: false, plugins: { legend: { position: "right", labels: { color: "#c9d1d9", padding: 10, font: { size: 11 } } } } }} />}
-                        {distChartType === 'bar' && <Bar data={{ labels: Object.keys(equipmentTypeCounts), datasets: [{ label: 'Count', data: Object.values(equipmentTypeCounts), backgroundColor: "#36A2EB" }] }} options={commonOptions} />}
+                        {distChartType === 'pie' && <Pie data={{ labels: distSeries.labels, datasets: [{ data: distSeries.values, backgroundColor: ["#36A2EB", "#FF6384", "#FFCE56", "#4BC0C0", "#9966FF", "#FF9F40"], borderWidth: 0 }] }} options={{ responsive: true, maintainAspectRatio: false, plugins: { legend: { position: "right", labels: { color: "#c9d1d9", padding: 10, font: { size: 11 } } } } }} />}
+                        {distChartType === 'doughnut' && <Doughnut data={{ labels: distSeries.labels, datasets: [{ data: distSeries.values, backgroundColor: ["#36A2EB", "#FF6384", "#FFCE56", "#4BC0C0", "#9966FF", "#FF9F40"], borderWidth: 0 }] }} options={{ responsive: true, maintainAspectRatio: false, plugins: { legend: { position: "right", labels: { color: "#c9d1d9", padding: 10, font: { size: 11 } } } } }} />}
+                        {distChartType === 'bar' && <Bar data={{ labels: distSeries.labels, datasets: [{ label: 'Count', data: distSeries.values, backgroundColor: "#36A2EB" }] }} options={commonOptions} />}
                     </div>
                 </div>
 
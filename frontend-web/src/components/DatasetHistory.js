@@ -3,6 +3,18 @@ import axios from "axios";
 import config from "../config";
 import "../App.css";
 
+const formatSize = (bytes) => {
+    if (bytes === null || bytes === undefined) return "Size unknown";
+    const units = ["B", "KB", "MB", "GB"];
+    let size = bytes;
+    let unit = 0;
+    while (size >= 1024 && unit < units.length - 1) {
+        size /= 1024;
+        unit++;
+    }
+    return unit === 0 ? `${size} B` : `${size.toFixed(1)} ${units[unit]}`;
+};
+
 const DatasetHistory = ({ onSelectDataset, refreshTrigger, authHeader }) => {
     const [history, setHistory] = useState([]);
 
@@ -43,7 +55,7 @@ const DatasetHistory = ({ onSelectDataset, refreshTrigger, authHeader }) => {
                             <div className="history-content">
                                 <div className="history-name">{item.name}</div>
                                 <div className="history-meta">
-                                    Uploaded {new Date(item.uploaded_at).toLocaleDateString()} • 2.4 MB
+                                    Uploaded {new Date(item.uploaded_at).toLocaleDateString()} • {formatSize(item.size)}
                                 </div>
                                 <p style={{ fontSize: "1rem", color: "#8b949e", marginTop: "8px", lineHeight: "1.4", maxWidth: "90%" }}>
                                     {item.summary}
@@ -3,11 +3,22 @@ import axios from "axios";
 import config from "../config";
 import "../App.css";
 
+const PAGE_SIZE = 100;
+
 const DatasetTable = ({ datasetId, authHeader }) => {
     const [tableData, setTableData] = useState([]);
+    const [columns, setColumns] = useState([]);
+    const [total, setTotal] = useState(0);
+    const [offset, setOffset] = useState(0);
+    const [sort, setSort] = useState(null);
     const [isLoading, setIsLoading] = useState(false);
     const [errorMessage, setErrorMessage] = useState("");
 
+    useEffect(() => {
+        setOffset(0);
+        setSort(null);
+    }, [datasetId]);
+
     useEffect(() => {
         if (!datasetId) return;
 
@@ -15,10 +26,14 @@ const DatasetTable = ({ datasetId, authHeader }) => {
             setIsLoading(true);
             setErrorMessage("");
             try {
-                const res = await axios.get(`${config.API_BASE_URL}/dataset/${datasetId}/data/`, {
-                    headers: { Authorization: authHeader }
-                });
+                // sorting and paging run on the server; only the visible page is downloaded
+                const res = await axios.post(`${config.API_BASE_URL}/dataset/${datasetId}/query/`,
+                    { offset, limit: PAGE_SIZE, ...(sort ? { sort } : {}) },
+                    { headers: { Authorization: authHeader } }
+                );
                 setTableData(res.data.data);
+                setColumns(res.data.columns);
+                setTotal(res.data.total);
             } catch (err) {
                 console.error("Error fetching table data:", err);
                 setErrorMessage("Failed to load dataset. Please check your connection.");
@@ -28,33 +43,40 @@ const DatasetTable = ({ datasetId, authHeader }) => {
         };
 
         fetchTableData();
-    }, [datasetId, authHeader]);
+    }, [datasetId, authHeader, offset, sort]);
+
+    const toggleSort = (col) => {
+        setSort(sort === col ? `-${col}` : col);
+        setOffset(0);
+    };
 
     if (!datasetId) return null;
-    if (isLoading) return <div className="loading-message">Loading data...</div>;
+    if (isLoading && tableData.length === 0) return <div className="loading-message">Loading data...</div>;
     if (errorMessage) return <div className="error-message">{errorMessage}</div>;
     if (tableData.length === 0) return <div className="empty-message">No records found.</div>;
 
-    const columns = Object.keys(tableData[0]);
+    const lastRow = Math.min(offset + tableData.length, total);
 
     return (
         <div className="table-container">
             <div style={{ display: "flex", justifyContent: "space-between", alignItems: "center" }}>
                 <h2 className="section-title">Dataset Overview</h2>
-                <span style={{ color: "var(--text-secondary)" }}>Total Records: {tableData.length}</span>
+                <span style={{ color: "var(--text-secondary)" }}>Total Records: {total}</span>
             </div>
             <div className="table-responsive">
                 <table className="data-table">
                     <thead>
                         <tr>
                             {columns.map((col) => (
-                                <th key={col}>{col}</th>
+                                <th key={col} onClick={() => toggleSort(col)} style={{ cursor: "pointer" }}>
+                                    {col}{sort === col ? " ▲" : sort === `-${col}` ? " ▼" : ""}
+                                </th>
                             ))}
                         </tr>
                     </thead>
                     <tbody>
                         {tableData.map((row, idx) => (
-                            <tr key={idx}>
+                            <tr key={offset + idx}>
                                 {columns.map((col) => (
                                     <td key={col}>{row[col]}</td>
                                 ))}
@@ -63,6 +85,11 @@ const DatasetTable = ({ datasetId, authHeader }) => {
                     </tbody>
                 </table>
             </div>
+            <div style={{ display: "flex", justifyContent: "flex-end", alignItems: "center", gap: "12px", marginTop: "15px" }}>
+                <span style={{ color: "var(--text-secondary)" }}>Rows {offset + 1}–{lastRow} of {total}</span>
+                <button className="btn-view" disabled={offset === 0 || isLoading} onClick={() => setOffset(Math.max(0, offset - PAGE_SIZE))}>Previous</button>
+                <button className="btn-view" disabled={lastRow >= total || isLoading} onClick={() => setOffset(offset + PAGE_SIZE)}>Next</button>
+            </div>
         </div>
     );
 };
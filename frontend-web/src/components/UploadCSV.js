@@ -2,6 +2,10 @@ import React, { useState } from "react";
 import axios from "axios";
 import config from "../config";
 
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 // Component for uploading CSV files
 const UploadCSV = ({ onUploadSuccess, authHeader }) => {
     const [file, setFile] = useState(null);
@@ -28,8 +32,23 @@ const UploadCSV = ({ onUploadSuccess, authHeader }) => {
                 },
             });
 
-            setMessage(res.data.message);
-            if (onUploadSuccess) onUploadSuccess(res.data.dataset_id);
+            // the server parses in the background; follow the ingest job until it settles
+            let job = res.data;
+            while (job.stage !== "done" && job.stage !== "failed") {
+                setMessage(`Processing... ${job.percent}% (${job.rows_parsed} rows)`);
+                await sleep(POLL_INTERVAL_MS);
+                const poll = await axios.get(`${config.API_BASE_URL}/jobs/${job.job_id}/`, {
+                    headers: { Authorization: authHeader }
+                });
+                job = poll.data;
+            }
+
+            if (job.stage === "failed") {
+                setMessage(job.error || "Upload failed.");
+                return;
+            }
+            setMessage("CSV uploaded and parsed successfully");
+            if (onUploadSuccess) onUploadSuccess(job.dataset_id);
         } catch (err) {
             console.error(err);
             if (err.response && err.response.data) {
@@ -50,7 +69,7 @@ const UploadCSV = ({ onUploadSuccess, authHeader }) => {
                 <input
                     id="fileInput"
                     type="file"
-                    accept=".csv,.xlsx"
+                    accept=".csv,.xlsx,.gz,.zst,.zip"
                     onChange={handleFileChange}
                     style={{ display: "none" }}
                 />
@@ -70,7 +89,7 @@ const UploadCSV = ({ onUploadSuccess, authHeader }) => {
                     or drag and drop file here
                 </p>
                 <p className="upload-text-limit">
-                    Supports .csv, .xlsx (Max 50MB)
+                    Supports .csv, .xlsx, .csv.gz, .csv.zst, .zip (Max 50MB)
                 </p>
 
                 {file && (